@@ -52,6 +52,13 @@
 #
 # In all cases the time reported is measured from the moment when the
 # operands are ready until all the results are ready.
+#
+# With --analyze-rounds the number of communication rounds and the
+# critical path of the operations are reported as well. This can be
+# used to compare variants of an operation, e.g., the ways to invert
+# bytes in AES:
+#
+#   benchmark.py -o aes_invert --exponentiation 0 --analyze-rounds ...
 
 import sys
 import time
@@ -62,7 +69,7 @@ import viff.reactor
 viff.reactor.install()
 from twisted.internet import reactor
 
-from viff.field import GF, FakeGF
+from viff.field import GF, FakeGF, GF256
 from viff.runtime import Runtime, create_runtime, make_runtime_class
 from viff.passive import PassiveRuntime
 from viff.active import (BasicActiveRuntime,
@@ -70,6 +77,7 @@ from viff.active import (BasicActiveRuntime,
 from viff.comparison import ComparisonToft05Mixin, ComparisonToft07Mixin
 from viff.equality import ProbabilisticEqualityMixin
 from viff.paillier import PaillierRuntime
+from viff.aes import AES
 from viff.config import load_config
 from viff.util import find_prime
 
@@ -95,7 +103,7 @@ else:
 from benchutil import (SelfcontainedBenchmarkStrategy,
                        NeededDataBenchmarkStrategy,
                        ParallelBenchmark, SequentialBenchmark,
-                       BinaryOperation, NullaryOperation)
+                       BinaryOperation, UnaryOperation, NullaryOperation)
 
 # Hack in order to avoid Maximum recursion depth exceeded
 # exception;
@@ -104,12 +112,24 @@ sys.setrecursionlimit(5000)
 
 last_timestamp = time.time()
 
+
+class AESInversionMixin:
+    """Inversion of bytes as done in the AES S-box, using the variant
+    given by the --exponentiation and --masking options."""
+
+    def invert(self, byte):
+        if not hasattr(self, "_aes"):
+            self._aes = AES(self, 128, quiet=True,
+                            use_exponentiation=self.options.exponentiation)
+        return self._aes.invert(byte)
+
 operations = {"mul"       : ("mul", [], BinaryOperation),
               "compToft05": ("greater_than_equal",
                              [ComparisonToft05Mixin], BinaryOperation),
               "compToft07": ("greater_than_equal",
                              [ComparisonToft07Mixin], BinaryOperation),
               "eq"        : ("eq", [ProbabilisticEqualityMixin], BinaryOperation),
+              "aes_invert": ("invert", [AESInversionMixin], UnaryOperation),
               "triple_gen": ("triple_gen", [], NullaryOperation)}
 
 runtimes = {"PassiveRuntime": PassiveRuntime,
@@ -148,6 +168,12 @@ parser.add_option("-s", "--sequential", action="store_false", dest="parallel",
                   help="execute operations in sequence")
 parser.add_option("-f", "--fake", action="store_true",
                   help="skip local computations using fake field elements")
+parser.add_option("--exponentiation", type="int", metavar="variant",
+                  help=("variant of exponentiation used by aes_invert: " +
+                        ", ".join(["%d: %s" % (i, s) for (i, s)
+                                   in enumerate(AES.exponentiation_variants)])))
+parser.add_option("--masking", action="store_false", dest="exponentiation",
+                  help="use masking in aes_invert")
 parser.add_option("--args", type="string",
                   help=("additional arguments to the runtime, the format is "
                         "a comma separated list of id=value pairs e.g. "
@@ -165,7 +191,7 @@ parser.add_option("--pc", type="string",
 parser.set_defaults(modulus=2**65, threshold=1, count=10,
                     runtime="PassiveRuntime", mixins="", num_players=2, prss=True,
                     operation="mul", parallel=True, fake=False,
-                    args="", needed_data="")
+                    exponentiation=1, args="", needed_data="")
 
 print "*" * 64
 
@@ -189,13 +215,19 @@ else:
     Field = GF
 
 
-Zp = Field(find_prime(options.modulus))
+if options.operation == "aes_invert":
+    Zp = GF256
+else:
+    Zp = Field(find_prime(options.modulus))
 print "Using field elements (%d bit modulus)" % log(Zp.modulus, 2)
 
 
 count = options.count
 print "I am player %d, will %s %d numbers" % (id, options.operation, count)
 
+if options.emulate_network:
+    print "Emulating network: %s" % "; ".join(options.emulate_network)
+
 
 # Identify the base runtime class.
 if options.runtime == "OrlandiRuntime" and not OrlandiRuntime:
@@ -254,7 +286,7 @@ if options.needed_data:
 
 if options.needed_data and options.pc:
     bases = (benchmark, NeededDataBenchmarkStrategy, operation_arity)
-    options.pc = eval(options.pc)
+    options.pc = tuple(eval(options.pc))
 else:
     bases = (benchmark, SelfcontainedBenchmarkStrategy, operation_arity)
 
@@ -23,6 +23,7 @@ from pprint import pformat
 from twisted.internet.defer import gatherResults
 
 from viff.runtime import gather_shares
+from viff.rounds import deepest, depth, critical_path, summarize_path
 from viff.util import rand
 
 start = 0
@@ -45,6 +46,24 @@ def record_stop(x, what, count):
     return x
 
 
+def record_rounds(x, rt, start_round, end_round, count):
+    """Print the communication rounds between *start_round* and
+    *end_round* when the rounds are analyzed, see :mod:`viff.rounds`."""
+    if rt.round_analyzer is not None:
+        rounds = depth(end_round) - depth(start_round)
+        messages = rt.round_analyzer.messages_per_round()
+        print
+        print "Communication rounds: %d" % rounds
+        if count > 1:
+            print "Rounds per operation: %.1f" % (rounds / float(count))
+        print "Messages received: %d" % \
+            sum(messages[depth(start_round):depth(end_round)])
+        print "Critical path:"
+        for label, n in summarize_path(critical_path(end_round, start_round)):
+            print "  %4d  %s" % (n, label)
+    return x
+
+
 class Benchmark(object):
     """Abstract base class for all Benchmarks.
 
@@ -111,13 +130,17 @@ class ParallelBenchmark(Benchmark):
         if self.pc is not None:
             self.rt.program_counter = self.pc
         else:
-            self.pc = list(self.rt.program_counter)
+            self.pc = self.rt.program_counter
         c_shares = []
         record_start("parallel test")
+        start_round = self.rt._round_context
         while not self.is_operation_done():
             c_shares.append(self.do_operation())
 
         done = gatherResults(c_shares)
+        done.addCallback(lambda x: record_rounds(
+                x, self.rt, start_round,
+                deepest([getattr(c, "_round", None) for c in c_shares]), 1))
         done.addCallback(record_stop, "parallel test", self.count)
         def f(x):
             needed_data = self.rt._needed_data
@@ -133,6 +156,7 @@ class SequentialBenchmark(Benchmark):
 
     def run_test(self, _, termination_function, d):
         record_start("sequential test")
+        self.start_round = self.rt._round_context
         self.single_operation(None, termination_function)
 
     def single_operation(self, _, termination_function):
@@ -140,6 +164,8 @@ class SequentialBenchmark(Benchmark):
             c = self.do_operation()
             self.rt.schedule_callback(c, self.single_operation, termination_function)
         else:
+            record_rounds(None, self.rt, self.start_round,
+                          self.rt._round_context, self.count)
             record_stop(None, "sequential test", self.count)
             self.finished(None, termination_function)
 
@@ -201,6 +227,30 @@ class BinaryOperation(Operation):
         return self.operation(a, b)
 
 
+class UnaryOperation(Operation):
+    """A unary operation."""
+
+    def generate_operation_arguments(self, _):
+        print "Runtime ready, generating shares"
+        self.a_shares = []
+        for i in range(self.count):
+            inputter = (i % len(self.rt.players)) + 1
+            if inputter == self.rt.id:
+                a = rand.randint(0, self.field.modulus)
+            else:
+                a = None
+            self.a_shares.append(self.rt.input([inputter], self.field, a))
+        shares_ready = gather_shares(self.a_shares)
+        return shares_ready
+
+    def is_operation_done(self):
+        return not self.a_shares
+
+    def do_operation(self):
+        a = self.a_shares.pop()
+        return self.operation(a)
+
+
 class NullaryOperation(Operation):
     """A nullary operation."""
 
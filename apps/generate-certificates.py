@@ -39,7 +39,7 @@ def save_key(key, filename):
     fp.write(crypto.dump_privatekey(crypto.FILETYPE_PEM, key))
     fp.close()
 
-def create_request(pk, common_name, digest="sha1"):
+def create_request(pk, common_name, digest="sha256"):
     """Create a certificate request."""
     req = crypto.X509Req()
     subj = req.get_subject()
@@ -49,7 +49,7 @@ def create_request(pk, common_name, digest="sha1"):
     req.sign(pk, digest)
     return req
 
-def create_cert(req, issuer_cert, issuer_sk, serial, valid=365, digest="sha1"):
+def create_cert(req, issuer_cert, issuer_sk, serial, valid=365, digest="sha256"):
     """Generate a certificate given a certificate request."""
     cert = crypto.X509()
     cert.set_serial_number(serial)
@@ -77,7 +77,7 @@ if __name__ == "__main__":
                       help="key size")
     parser.add_option("-n", "--players", dest="n", type="int",
                       help="number of players")
-    parser.set_defaults(n=3, key_size=1024, prefix='player')
+    parser.set_defaults(n=3, key_size=2048, prefix='player')
 
     (options, args) = parser.parse_args()
 
@@ -50,7 +50,7 @@ class BrachaBroadcastMixin:
         self.increment_pc()
 
         result = Deferred()
-        pc = tuple(self.program_counter)
+        pc = self.program_counter
         n = self.num_players
         t = self.threshold
 
@@ -223,7 +223,7 @@ class TriplesHyperinvertibleMatricesMixin:
 
     def _exchange_single(self, svec, rvec, T, field, degree):
         """Exchange and (if possible) verify shares."""
-        pc = tuple(self.program_counter)
+        pc = self.program_counter
         inputters = range(1, self.num_players + 1)
 
         # We send our shares to the verifying players.
@@ -253,7 +253,7 @@ class TriplesHyperinvertibleMatricesMixin:
     def _exchange_double(self, shares, rvec1, rvec2, T, field, d1, d2):
         """Exchange and (if possible) verify shares."""
         svec1, svec2 = shares
-        pc = tuple(self.program_counter)
+        pc = self.program_counter
         inputters = range(1, self.num_players + 1)
 
         # We send our shares to the verifying players.
@@ -18,9 +18,11 @@
 import struct
 
 from twisted.internet.defer import gatherResults
-from viff.runtime import Share
+from viff.runtime import Share, ShareExchanger
 
-from viff.bedoza.util import _send, fast_pow
+from viff.wire import encode_integers, decode_integers
+
+from viff.bedoza.util import _send, fast_pows
 from viff.bedoza.keylist import BeDOZaKeyList
 from viff.bedoza.maclist import BeDOZaMACList
 
@@ -43,40 +45,74 @@ def add_macs(runtime, field, u_bound, alpha, random, paillier, partial_shares):
         """The transmission_restraint_constant is the number of
         encrypted shares we can safely transmit in one call to
         sendData. The sendData method can only transmit up to
-        65536 bytes.
+        65536 bytes, unless all players support frames with 32-bit
+        length prefixes.
         The constant has been imperically determined by running
-        TripleGenerator.generate_triples.
-        TODO: How can we allow a user of the runtime to adjust this
-        constraint at a higher level of abstraction?
+        TripleGenerator.generate_triples with 64 KiB frames and is
+        scaled by the frame size actually available.
         """
-        transmission_restraint_constant = 50
+        transmission_restraint_constant = \
+            50 * runtime.max_payload() // ShareExchanger.max_payload
         
         num_players = runtime.num_players
 
-        list_of_player_to_enc_shares_lists = []
-        
         player_to_mac_keys = [ [] for x in runtime.players]
-        player_to_enc_shares = [ [] for x in runtime.players]
-        for inx, partial_share_content in enumerate(partial_share_contents):
-            if inx % transmission_restraint_constant == 0:
-                player_to_enc_shares = [ [] for x in runtime.players]
-                list_of_player_to_enc_shares_lists.append(player_to_enc_shares)
+        player_to_betas = [ [] for x in runtime.players]
+        player_to_random_elms = [ [] for x in runtime.players]
+        for partial_share_content in partial_share_contents:
             for j in xrange(num_players):
                 # TODO: This is probably not the fastes way to generate
                 # the betas.
                 beta = random.randint(0, u_bound)
                 if random.choice([True, False]):
                     beta = -beta
-                enc_beta = paillier.encrypt(beta, player_id = j + 1)
-                c_j = partial_share_content.enc_shares[ j ]
-                n2 = paillier.get_modulus_square( j + 1 )
-                c = (fast_pow(c_j, alpha, n2) * enc_beta) % n2
-                player_to_enc_shares[j].append(c)
+                player_to_betas[j].append(beta)
+                # The random elements are drawn in the same order as
+                # when each beta was encrypted right away.
+                player_to_random_elms[j].append(
+                    paillier.random_elm(player_id = j + 1))
                 player_to_mac_keys[j].append(field(beta))
 
-        received_cs = []
-        for ls in list_of_player_to_enc_shares_lists:
-            received_cs.append(_send(runtime, ls, deserialize=eval))
+        # The encryptions and exponentiations do not depend on each
+        # other, so they can be done in worker processes.
+        enc_betas = [paillier.encrypt_all(betas, player_id = j + 1,
+                                          random_elms = random_elms)
+                     for j, (betas, random_elms)
+                     in enumerate(zip(player_to_betas,
+                                      player_to_random_elms))]
+        powers = []
+        for j in xrange(num_players):
+            c_js = [c.enc_shares[j] for c in partial_share_contents]
+            n2 = paillier.get_modulus_square(j + 1)
+            powers.append(runtime.run_in_worker(fast_pows, c_js,
+                                                [alpha] * len(c_js), n2))
+
+        def send_enc_shares(results):
+            powers = results[:num_players]
+            player_to_enc_betas = results[num_players:]
+            player_to_enc_shares = []
+            for j in xrange(num_players):
+                n2 = paillier.get_modulus_square(j + 1)
+                player_to_enc_shares.append(
+                    [(c * enc_beta) % n2
+                     for c, enc_beta in zip(powers[j],
+                                            player_to_enc_betas[j])])
+
+            received_cs = []
+            for start in xrange(0, len(partial_share_contents),
+                                transmission_restraint_constant):
+                end = start + transmission_restraint_constant
+                ls = [cs[start:end] for cs in player_to_enc_shares]
+                received_cs.append(_send(runtime, ls,
+                                         serialize=encode_integers,
+                                         deserialize=decode_integers))
+
+            runtime.schedule_callback(gatherResults(received_cs),
+                                      finish_sharing,
+                                      partial_share_contents,
+                                      player_to_mac_keys,
+                                      result_shares)
+            return received_cs
 
         def merge(received_cs):
             r = [ [] for x in xrange(len(received_cs[0]))]
@@ -88,13 +124,20 @@ def add_macs(runtime, field, u_bound, alpha, random, paillier, partial_shares):
         def finish_sharing(recevied_cs, partial_share_contents,
                            lists_of_mac_keys, result_shares):
             recevied_cs = merge(recevied_cs)
-            shares = []               
+            decrypted = gatherResults([paillier.decrypt_all(c_list)
+                                       for c_list in recevied_cs])
+            decrypted.addCallback(make_shares, partial_share_contents,
+                                  lists_of_mac_keys, result_shares)
+            return decrypted
+
+        def make_shares(decrypted, partial_share_contents,
+                        lists_of_mac_keys, result_shares):
+            shares = []
             for inx in xrange(0, len(partial_share_contents)):
                 mac_keys = []
                 decrypted_cs = []
-                for c_list, mkeys in zip(recevied_cs,
-                                         lists_of_mac_keys):
-                    decrypted_cs.append(field(paillier.decrypt(c_list[inx])))
+                for d_list, mkeys in zip(decrypted, lists_of_mac_keys):
+                    decrypted_cs.append(field(d_list[inx]))
                     mac_keys.append(mkeys[inx])
                 partial_share = partial_share_contents[inx]
                 mac_key_list = BeDOZaKeyList(alpha, mac_keys)
@@ -105,12 +148,8 @@ def add_macs(runtime, field, u_bound, alpha, random, paillier, partial_shares):
                                         mac_msg_list))
             return shares
 
-        runtime.schedule_callback(gatherResults(received_cs),
-                                  finish_sharing,
-                                  partial_share_contents,
-                                  player_to_mac_keys,
-                                  result_shares)
-        return received_cs
+        return runtime.schedule_callback(gatherResults(powers + enc_betas),
+                                         send_enc_shares)
 
     result_shares = [Share(runtime, field)
                      for x in xrange(len(partial_shares))]
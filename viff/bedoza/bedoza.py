@@ -23,6 +23,7 @@ from viff.util import rand
 from viff.runtime import Share, ShareList, gather_shares
 from viff.field import FieldElement
 from viff.constants import TEXT
+from viff.wire import share_codec
 from viff.simplearithmetic import SimpleArithmeticRuntime
 
 from viff.hash_broadcast import HashBroadcastMixin
@@ -92,24 +93,23 @@ class BeDOZaMixin(HashBroadcastMixin, ShareGenerator):
         
         def exchange(ls, receivers):
             # Send share to all receivers.
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
+            # The values and MACs are sent as pairs of field elements.
+            codec = share_codec(field, True)
             keyLists = []
             for other_id in receivers:
-                message_string = ""
+                elements = []
                 for inx, beDOZaContents in enumerate(ls):
                     keyLists.append(beDOZaContents.get_keys())
-                    message_string += "%s:%s;" % \
-                           (beDOZaContents.get_value().value,
-                            beDOZaContents.get_mac(other_id - 1).value)
-                self.protocols[other_id].sendData(pc, TEXT, message_string)
+                    elements.append(beDOZaContents.get_value())
+                    elements.append(beDOZaContents.get_mac(other_id - 1))
+                self.protocols[other_id].sendData(pc, TEXT,
+                                                  codec.encode_list(elements))
 
             if self.id in receivers:
                 def deserialize(s):
-                    def field_long(x):
-                        return field(long(x))
-                    xs = s[0:-1].split(';')
-                    ys = [x.split(':') for x in xs]
-                    return [map(field_long, xs) for xs in ys]
+                    xs = codec.decode_list(s)
+                    return [xs[i:i + 2] for i in xrange(0, len(xs), 2)]
                 num_players = len(self.players.keys())
                 values = num_players * [None]
                 for inx, other_id in enumerate(self.players.keys()):
@@ -184,7 +184,7 @@ class BeDOZaMixin(HashBroadcastMixin, ShareGenerator):
         
         def exchange((a, b), receivers):
             # Send share to all receivers.
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             for other_id in receivers:
                 self.protocols[other_id].sendShare(pc, a.get_value())
                 self.protocols[other_id].sendShare(pc, a.get_mac(other_id - 1))
@@ -257,7 +257,7 @@ class BeDOZaMixin(HashBroadcastMixin, ShareGenerator):
 
         def exchange(shareContent, receivers):
             # Send share to all receivers.
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             for other_id in receivers:
                 self.protocols[other_id].sendShare(
                     pc, shareContent.get_value())
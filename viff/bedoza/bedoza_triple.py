@@ -24,10 +24,11 @@ import hashlib
 
 from twisted.internet.defer import Deferred, gatherResults, succeed
 
-from viff.runtime import Runtime, ShareList, gather_shares
+from viff.runtime import Runtime, ShareList, ShareExchanger, gather_shares
 from viff.field import FieldElement, GF
 from viff.constants import TEXT
 from viff.util import rand
+from viff.wire import encode_integers, decode_integers
 from viff.bedoza.shares import BeDOZaShare, BeDOZaShareContents, PartialShare
 from viff.bedoza.shares import PartialShareContents
 from viff.bedoza.share_generators import PartialShareGenerator
@@ -35,7 +36,7 @@ from viff.bedoza.keylist import BeDOZaKeyList
 from viff.bedoza.maclist import BeDOZaMACList
 from viff.bedoza.add_macs import add_macs
 from viff.bedoza.modified_paillier import ModifiedPaillier
-from viff.bedoza.util import fast_pow
+from viff.bedoza.util import fast_pows
 from viff.bedoza.util import _convolute
 from viff.bedoza.share import generate_partial_share_contents
 
@@ -187,8 +188,7 @@ class TripleGenerator(object):
             return Triple(a, b, c)
 
         def prepare_verification(rs_serialized, results):
-            # Repr/eval deserialization.
-            rs = [eval(rss) for rss in rs_serialized]
+            rs = [decode_integers(rss) for rss in rs_serialized]
 
             for i in xrange(n):
                 a = triple_candidates[i]
@@ -222,11 +222,9 @@ class TripleGenerator(object):
         results = [Deferred() for _ in xrange(n)]
 
         ri = [self.random.randint(0, self.p - 1) for _ in xrange(n)]
-        # TODO: We use repr/eval as simple marshalling. Should be
-        # factored out and maybe optimized by using better compression
-        # here.
         ris = self.runtime.broadcast(
-            self.runtime.players.keys(), self.runtime.players.keys(), repr(ri))
+            self.runtime.players.keys(), self.runtime.players.keys(),
+            encode_integers(ri))
         ris = gatherResults(ris)
         self.runtime.schedule_callback(ris, prepare_verification, results)     
         ris.addErrback(err_handler)
@@ -262,14 +260,14 @@ class TripleGenerator(object):
         """The transmission_restraint_constant is the number of
         encrypted shares we can safely transmit in one call to
         sendData. The sendData method can only transmit up to
-        65536 bytes.
+        65536 bytes, unless all players support frames with 32-bit
+        length prefixes.
         The constant has been imperically determined by running
-        TripleGenerator.generate_triples.
-        TODO: How can we allow a user of the runtime to adjust this
-        constraint at a higher level of abstraction?
-
+        TripleGenerator.generate_triples with 64 KiB frames and is
+        scaled by the frame size actually available.
         """
-        transmission_restraint_constant = 425
+        transmission_restraint_constant = \
+            425 * self.runtime.max_payload() // ShareExchanger.max_payload
 
         number_of_packets = n / transmission_restraint_constant
         if n % transmission_restraint_constant != 0:
@@ -277,25 +275,38 @@ class TripleGenerator(object):
         
         self.runtime.increment_pc()
 
-        pc = tuple(self.runtime.program_counter)
+        pc = self.runtime.program_counter
 
         deferred = []
         zis = []
         if self.runtime.id == inx:
             Nj_square = self.paillier.get_modulus_square(jnx)
-            all_cs = []
-            for iny, (ai, cj) in enumerate(zip(ais, cjs)):
-                if iny % transmission_restraint_constant == 0:
-                    cs = []
-                    all_cs.append(cs)
+            us = []
+            for _ in zip(ais, cjs):
                 u = rand.randint(0, self.u_bound)
-                Ej_u = self.paillier.encrypt(u, jnx)
-                cs.append( (fast_pow(cj, ai.value, Nj_square) * Ej_u) % Nj_square )
+                us.append(u)
                 zi = self.Zp(-u)
                 zis.append(zi)
-                
-            for cs in all_cs:
-                self.runtime.protocols[jnx].sendData(pc, CKIND, str(cs))
+
+            def send_cs((powers, Ej_us)):
+                cs = [(p * Ej_u) % Nj_square
+                      for p, Ej_u in zip(powers, Ej_us)]
+                for start in xrange(0, len(cs),
+                                    transmission_restraint_constant):
+                    end = start + transmission_restraint_constant
+                    self.runtime.protocols[jnx].sendData(
+                        pc, CKIND, encode_integers(cs[start:end]))
+                return zis
+
+            # The data is sent with the saved program counter, so the
+            # encryptions and exponentiations can be done in worker
+            # processes. The zis are returned once the data is sent,
+            # so a failure in the workers reaches the caller.
+            Ej_us = self.paillier.encrypt_all(us, jnx)
+            powers = self.runtime.run_in_worker(
+                fast_pows, cjs, [ai.value for ai in ais], Nj_square)
+            zis_deferred = gatherResults([powers, Ej_us])
+            zis_deferred.addCallback(send_cs)
 
         if self.runtime.id == jnx:
             all_cs = []
@@ -304,24 +315,30 @@ class TripleGenerator(object):
                 self.runtime._expect_data(inx, CKIND, cs)
                 all_cs.append(cs)
                 
-            def decrypt(all_cs, pc, zis):
-                zjs = []
-                cs = reduce(lambda x, y: x + eval(y), all_cs, [])
-                for iny, c in enumerate(cs):
-                    t = self.paillier.decrypt(c)
-                    zj = self.Zp(t)
-                    zjs.append(zj)
+            def decrypt(all_cs):
+                cs = reduce(lambda x, y: x + decode_integers(y), all_cs, [])
+                return self.paillier.decrypt_all(cs)
+
+            def add_zis(ts, zis):
+                zjs = [self.Zp(t) for t in ts]
                 if not zis == []:
                     return [x + y for x, y in zip(zis, zjs)]
                 else:
-                    return zjs 
+                    return zjs
             all_cs_d = gatherResults(all_cs)
-            all_cs_d.addCallback(decrypt, pc, zis)
-            deferred = all_cs_d
-        else:
-            zis_deferred = Deferred()
-            zis_deferred.callback(zis)
+            all_cs_d.addCallback(decrypt)
+            all_cs_d.addCallback(add_zis, zis)
+            if self.runtime.id == inx:
+                # The data is sent to ourselves, so wait for the
+                # sending too.
+                zis_deferred.addCallback(lambda _: all_cs_d)
+                deferred = zis_deferred
+            else:
+                deferred = all_cs_d
+        elif self.runtime.id == inx:
             deferred = zis_deferred
+        else:
+            deferred = succeed(zis)
 
         return deferred
 
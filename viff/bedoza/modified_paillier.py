@@ -25,6 +25,33 @@ except ImportError:
     print "Error: The pypaillier module or one of the used functions " \
         "are not available."
 
+def _encrypt_all(values, random_elms, pubkey):
+    """Encrypt the list *values* under *pubkey*, using the
+    corresponding element of *random_elms* as randomness.
+
+    The values must already be mapped to Z_n. This is a module level
+    function so that it can be passed to
+    :meth:`viff.runtime.Runtime.run_in_worker`.
+    """
+    return [pypaillier.encrypt_r(value, random_elm, pubkey)
+            for value, random_elm in zip(values, random_elms)]
+
+
+def _decrypt_all(enc_values, seckey, n):
+    """Decrypt the list *enc_values* using *seckey*.
+
+    This is a module level function so that it can be passed to
+    :meth:`viff.runtime.Runtime.run_in_worker`.
+    """
+    values = []
+    for enc_value in enc_values:
+        y = pypaillier.decrypt(enc_value, seckey)
+        if y > (n - 1) / 2:
+            y -= n
+        values.append(y)
+    return values
+
+
 class ModifiedPaillier(object):
     """A slight modification of the Paillier cryptosystem.
 
@@ -80,10 +107,7 @@ class ModifiedPaillier(object):
         # this, since for large n = pq, it is extremely unlikely that
         # a random element in Zn is not also a member of Zn*.
         if random_elm == None:
-            while True:
-                random_elm = self.random.randint(1, long(n))
-                if gcd(random_elm, n) == 1:
-                    break
+            random_elm = self.random_elm(player_id)
         elif not gcd(random_elm, n) == 1:
             raise Exception("Random element must be an element in Zn*")
 
@@ -102,6 +126,54 @@ class ModifiedPaillier(object):
                               random_elm=random_elm)[1]
 
 
+    def random_elm(self, player_id=None):
+        """Draw a random element in Zn* for the public key of
+        player_id, or of the player itself if player_id is not given.
+
+        The element is generated using the pseudo-random generator
+        given when the ModifiedPaillier object was constructed.
+        """
+        if not player_id:
+            player_id = self.runtime.id
+        n = self.runtime.players[player_id].pubkey['n']
+        while True:
+            random_elm = self.random.randint(1, long(n))
+            if gcd(random_elm, n) == 1:
+                return random_elm
+
+    def encrypt_all(self, values, player_id=None, random_elms=None):
+        """Encrypt a list of values.
+
+        Works like :meth:`encrypt`, but returns a deferred which will
+        yield the list of encrypted values. If random_elms is given,
+        its elements are used as random elements. Otherwise they are
+        drawn here using :meth:`random_elm`. The encryptions are done
+        in a worker process if the runtime has any, see
+        :meth:`viff.runtime.Runtime.run_in_worker`.
+        """
+        if not player_id:
+            player_id = self.runtime.id
+        pubkey = self.runtime.players[player_id].pubkey
+        n = pubkey['n']
+        min = -(n - 1) / 2
+        max = (n - 1) / 2
+        plaintexts = []
+        draw_random_elms = random_elms is None
+        if draw_random_elms:
+            random_elms = []
+        for value in values:
+            assert isinstance(value, int) or isinstance(value, long), \
+                "paillier: encrypts only integers and longs, got %s" % \
+                    value.__class__
+            assert min <= value <= max, \
+                "paillier: plaintext %d outside legal range [-(n-1)/2 " \
+                "; (n-1)/2] = [%d ; %d]"  % (value, min, max)
+            plaintexts.append(self._f(value, n))
+            if draw_random_elms:
+                random_elms.append(self.random_elm(player_id))
+        return self.runtime.run_in_worker(_encrypt_all, plaintexts,
+                                          random_elms, pubkey)
+
     def decrypt(self, enc_value):
         """Decrypt using own private key."""
         assert isinstance(enc_value, int) or isinstance(enc_value, long), \
@@ -114,6 +186,22 @@ class ModifiedPaillier(object):
         seckey = self.runtime.players[self.runtime.id].seckey
         return self._f_inverse(pypaillier.decrypt(enc_value, seckey), n)
 
+    def decrypt_all(self, enc_values):
+        """Decrypt a list of values using own private key.
+
+        Returns a deferred which will yield the list of plaintexts.
+        The decryptions are done in a worker process if the runtime
+        has any, see :meth:`viff.runtime.Runtime.run_in_worker`.
+        """
+        n = self.runtime.players[self.runtime.id].pubkey['n']
+        n_square = self.runtime.players[self.runtime.id].pubkey['n_square']
+        for enc_value in enc_values:
+            assert 0 <= enc_value < n_square, \
+                "paillier: ciphertext %d not in range [0 ; n^2] = [0 ; %d]" \
+                % (enc_value, n_square)
+        seckey = self.runtime.players[self.runtime.id].seckey
+        return self.runtime.run_in_worker(_decrypt_all, enc_values, seckey, n)
+
     def get_modulus(self, player_id):
         return self.runtime.players[player_id].pubkey['n']
 
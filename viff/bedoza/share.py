@@ -19,6 +19,7 @@ from gmpy import mpz
 
 from twisted.internet.defer import gatherResults
 
+from viff.wire import encode_integers, decode_integers
 from viff.bedoza.zero_knowledge import ZKProof
 from viff.bedoza.shares import PartialShareContents
 
@@ -61,7 +62,7 @@ def generate_partial_share_contents(field_elements, runtime, paillier, k, random
        
     list_of_enc_shares = runtime.broadcast(
         runtime.players.keys(), runtime.players.keys(),
-        str(list_of_enc_shares))
+        encode_integers(list_of_enc_shares))
 
     def construct_partial_shares(zk_results, list_of_enc_shares, field_elements):
         if False in zk_results:
@@ -79,7 +80,7 @@ def generate_partial_share_contents(field_elements, runtime, paillier, k, random
 
     def do_zk_proofs(list_of_enc_shares, field_elements):
         zk_results = []
-        list_of_enc_shares = [eval(x) for x in list_of_enc_shares]
+        list_of_enc_shares = [decode_integers(x) for x in list_of_enc_shares]
 
         # We expect all players to broadcast the same number of
         # encrypted shares.
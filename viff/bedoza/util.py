@@ -20,16 +20,25 @@ from twisted.internet.defer import Deferred, gatherResults
 from gmpy import mpz
 
 from viff.constants import TEXT
+from viff.wire import share_codec, encode_integer, decode_integer
 
-def _send(runtime, vals, serialize=str, deserialize=int):
+def _decode_integer(string):
+    value, offset = decode_integer(string, 0)
+    if offset != len(string):
+        raise ValueError("Trailing data after integer")
+    return value
+
+def _send(runtime, vals, serialize=encode_integer,
+          deserialize=_decode_integer):
     """Send vals[i] to player i + 1. Returns deferred list.
 
-    Works as default for integers. If other stuff has to be
-    sent, supply another serialization, deserialition.
+    Works as default for integers, which are sent in the binary
+    encoding from :mod:`viff.wire`. If other stuff has to be sent,
+    supply another serialization, deserialition.
     """
     runtime.increment_pc()
     
-    pc = tuple(runtime.program_counter)
+    pc = runtime.program_counter
     for p in runtime.players:
         msg = serialize(vals[p - 1])
         runtime.protocols[p].sendData(pc, TEXT, msg)
@@ -44,24 +53,36 @@ def _send(runtime, vals, serialize=str, deserialize=int):
     result = gatherResults(values)
     return result
 
-def _convolute(runtime, val, serialize=str, deserialize=int):
+def _convolute(runtime, val, serialize=encode_integer,
+               deserialize=_decode_integer):
     """As send, but sends the same val to all players."""
     return _send(runtime, [val] * runtime.num_players,
                  serialize=serialize, deserialize=deserialize)
 
 def _convolute_gf_elm(runtime, gf_elm):
+    codec = share_codec(gf_elm.field, True)
     return _convolute(runtime, gf_elm,
-                      serialize=lambda x: str(x.value),
-                      deserialize=lambda x: gf_elm.field(int(x)))
+                      serialize=codec.encode,
+                      deserialize=codec.decode)
 
 def _send_gf_elm(runtime, vals):
+    codec = share_codec(vals[0].field, True)
     return _send(runtime, vals, 
-                 serialize=lambda x: str(x.value),
-                 deserialize=lambda x: gf_elm.field(int(x)))
+                 serialize=codec.encode,
+                 deserialize=codec.decode)
 
 def fast_pow(a, b, modulus):
     return long(pow(mpz(a), b, modulus))
 
+def fast_pows(bases, exponents, modulus):
+    """Returns the list of fast_pow(a, b, modulus) for the pairs of
+    bases and exponents.
+
+    This is suitable for :meth:`viff.runtime.Runtime.run_in_worker`.
+    """
+    modulus = mpz(modulus)
+    return [long(pow(mpz(a), b, modulus)) for a, b in zip(bases, exponents)]
+
 
 def rand_int_signed(random, lim):
     """Returns a pseudo-uniformly distributed random integer a
@@ -20,6 +20,7 @@ from gmpy import mpz, digits
 import hashlib
 
 from viff.runtime import gatherResults
+from viff.wire import encode_integers, decode_integers
 from viff.bedoza.util import rand_int_signed
 
 class ZKProof(object):
@@ -130,14 +131,16 @@ class ZKProof(object):
         return deferred_proof
 
     def _serialize_proof(self):
-        return repr([self.d, self.Z, self.W])
+        return encode_integers(self.d + self.Z + self.W)
 
     def _deserialize_proof(self, serialized_proof):
-        # We remove quotes before evaluation in order to get a list.
-        proof = eval(serialized_proof[1:-1])
-        self.d = proof[0]
-        self.Z = proof[1]
-        self.W = proof[2]
+        proof = decode_integers(serialized_proof)
+        m = self.m
+        # The prover hashes d as mpz values in _generate_e, so we must
+        # do the same.
+        self.d = [mpz(d) for d in proof[:m]]
+        self.Z = proof[m:2 * m]
+        self.W = proof[2 * m:]
 
     def _extract_bits(self, string, no_of_bits):
         """Returns list of first no_of_bits from the given string."""
@@ -176,7 +179,7 @@ class ZKProof(object):
         self.e = self._extract_bits(hash, self.s)
 
     def _broadcast(self, values):
-        msg = repr(values) if self.prover_id == self.runtime.id else None
+        msg = values if self.prover_id == self.runtime.id else None
         return self.runtime.broadcast(
             [self.prover_id], self.runtime.players.keys(), message=msg)
 
@@ -0,0 +1,404 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Recorded arithmetic circuits. A straight-line protocol, that is,
+a protocol where no operation depends on an opened value, can be
+recorded once with :func:`record` and then evaluated many times with
+:meth:`Circuit.run`.
+
+The protocol is called with a :class:`RecordingRuntime` instead of a
+:class:`~viff.runtime.Runtime`. It supports inputs, additions,
+subtractions, multiplications, linear combinations and openings, and
+the operators on the :class:`Wire` objects it returns work like those
+on :class:`~viff.runtime.Share` objects:
+
+>>> from viff.field import GF
+>>> Zp = GF(1031)
+>>> def protocol(rt):
+...     a = rt.input([1], Zp)
+...     b = rt.input([2], Zp)
+...     c = a * b + 3 * a
+...     rt.open(c * c)
+>>> circuit = record(protocol)
+>>> len(circuit.gates)
+7
+>>> circuit.depth
+4
+
+The gates are grouped in layers by their multiplicative depth. When
+the circuit is run, all inputs, multiplications and openings in a
+layer are done with a single :class:`~viff.runtime.ShareVector`
+operation for each field, so a layer is one round of communication.
+The additions and multiplications by constants are computed directly
+on the local shares between the rounds, without any
+:class:`~twisted.internet.defer.Deferred` objects.
+
+The runtime must support vectors of shares like the
+:class:`~viff.passive.PassiveRuntime` does.
+"""
+
+from twisted.internet.defer import gatherResults, maybeDeferred
+
+from viff.field import GF256, FieldElement
+from viff.runtime import ShareVector
+
+#: Kinds of gates, see :class:`Circuit`.
+INPUT, LINEAR, MUL, OPEN = range(4)
+
+
+def _element(field, value):
+    """Convert *value* to an element of *field*."""
+    if isinstance(value, FieldElement):
+        return value
+    return field(value)
+
+
+class Wire(object):
+    """The output of a gate in a circuit being recorded.
+
+    The arithmetic operators record gates like the operators on
+    :class:`~viff.runtime.Share` objects call the runtime.
+    """
+
+    def __init__(self, recorder, index, field):
+        self.recorder = recorder
+        #: Index of the gate with this output.
+        self.index = index
+        self.field = field
+
+    def __add__(self, other):
+        return self.recorder.add(self, other)
+
+    def __radd__(self, other):
+        return self.recorder.add(self, other)
+
+    def __sub__(self, other):
+        return self.recorder.sub(self, other)
+
+    def __rsub__(self, other):
+        return self.recorder.sub(other, self)
+
+    def __mul__(self, other):
+        return self.recorder.mul(self, other)
+
+    def __rmul__(self, other):
+        return self.recorder.mul(self, other)
+
+    def __pow__(self, exponent):
+        return self.recorder.pow(self, exponent)
+
+    def __xor__(self, other):
+        return self.recorder.xor(self, other)
+
+    def __rxor__(self, other):
+        return self.recorder.xor(self, other)
+
+    def __neg__(self):
+        return self.recorder.lin_comb([-1], [self])
+
+    def _compare(self, other):
+        raise TypeError("Comparisons cannot be recorded in a circuit")
+
+    __lt__ = __le__ = __gt__ = __ge__ = _compare
+
+
+class RecordingRuntime(object):
+    """A runtime which records the operations of a protocol as the
+    gates of a :class:`Circuit`.
+
+    The recording is done locally, no data is exchanged.
+    """
+
+    def __init__(self):
+        #: The recorded gates, see :class:`Circuit`.
+        self.gates = []
+        #: Program counter of the recorded operations. It is
+        #: incremented for every gate.
+        self.program_counter = (0,)
+
+    def _gate(self, kind, field, *args):
+        self.program_counter = self.program_counter[:-1] + \
+            (self.program_counter[-1] + 1,)
+        self.gates.append((kind, self.program_counter) + args)
+        return Wire(self, len(self.gates) - 1, field)
+
+    def _check(self, wire):
+        assert wire.recorder is self, "Wire from another circuit."
+        assert self.gates[wire.index][0] != OPEN, \
+            "Opened values cannot be used in a circuit."
+
+    def input(self, inputters, field, number=None):
+        """Record an input from each of the *inputters*.
+
+        A single :class:`Wire` is returned if there is one inputter,
+        otherwise a list of wires. The *number* is ignored, the
+        inputs are given when the circuit is run.
+        """
+        wires = [self._gate(INPUT, field, inputter, field)
+                 for inputter in inputters]
+        if len(wires) == 1:
+            return wires[0]
+        return wires
+
+    shamir_share = input
+
+    def lin_comb(self, coefficients, wires, constant=0):
+        """Record the linear combination of *wires* with the given
+        *coefficients* plus *constant*."""
+        field = wires[0].field
+        for wire in wires:
+            self._check(wire)
+        coefficients = tuple([_element(field, c) for c in coefficients])
+        indices = tuple([wire.index for wire in wires])
+        return self._gate(LINEAR, field, coefficients, indices,
+                          _element(field, constant))
+
+    def add(self, wire_a, wire_b):
+        """Record an addition."""
+        if not isinstance(wire_b, Wire):
+            return self.lin_comb([1], [wire_a], wire_b)
+        return self.lin_comb([1, 1], [wire_a, wire_b])
+
+    def sub(self, wire_a, wire_b):
+        """Record a subtraction. One of the arguments may be a
+        constant."""
+        if not isinstance(wire_a, Wire):
+            return self.lin_comb([-1], [wire_b], wire_a)
+        if not isinstance(wire_b, Wire):
+            return self.lin_comb([1], [wire_a],
+                                 -_element(wire_a.field, wire_b))
+        return self.lin_comb([1, -1], [wire_a, wire_b])
+
+    def mul(self, wire_a, wire_b):
+        """Record a multiplication. Multiplications by constants are
+        recorded as linear combinations."""
+        if not isinstance(wire_b, Wire):
+            return self.lin_comb([wire_b], [wire_a])
+        self._check(wire_a)
+        self._check(wire_b)
+        return self._gate(MUL, wire_a.field, wire_a.index, wire_b.index)
+
+    def pow(self, wire, exponent):
+        """Record exponentiation by square-and-multiply."""
+        assert isinstance(exponent, (int, long)), "Exponent must be an integer"
+        assert exponent > 0, "Exponent must be positive"
+
+        if exponent == 1:
+            return wire
+        elif exponent % 2 == 0:
+            tmp = wire ** (exponent // 2)
+            return tmp * tmp
+        else:
+            return wire * (wire ** (exponent - 1))
+
+    def xor(self, wire_a, wire_b):
+        """Record an exclusive-or of bits."""
+        if wire_a.field is GF256:
+            return wire_a + wire_b
+        else:
+            return wire_a + wire_b - 2 * wire_a * wire_b
+
+    def open(self, wire, receivers=None):
+        """Record the opening of *wire* to *receivers*.
+
+        The default is to open the wire to all players. The opened
+        values are the results of the circuit.
+        """
+        self._check(wire)
+        if receivers is not None:
+            receivers = tuple(sorted(receivers))
+        return self._gate(OPEN, wire.field, wire.index, receivers)
+
+    output = open
+
+
+def record(protocol, *args, **kwargs):
+    """Record the circuit of *protocol*.
+
+    The protocol is called with a :class:`RecordingRuntime` and the
+    extra arguments.
+    """
+    recorder = RecordingRuntime()
+    protocol(recorder, *args, **kwargs)
+    return Circuit(recorder.gates)
+
+
+class Layer(object):
+    """The gates at a multiplicative depth of a :class:`Circuit`.
+
+    The inputs, multiplications and openings are grouped so that each
+    group can be done with a single vector operation. The groups are
+    lists of pairs of a key and a list of gate indices, in the order
+    the gates were recorded. This order is the same for all players.
+    """
+
+    def __init__(self):
+        #: Inputs grouped by inputter and field.
+        self.inputs = []
+        #: Multiplications grouped by field.
+        self.muls = []
+        #: Openings grouped by field and receivers.
+        self.opens = []
+        #: Linear gates computed when the other gates are done.
+        self.linear = []
+        self._groups = {}
+
+    def add(self, kind, key, index):
+        """Add gate *index* to the group of its *kind* and *key*."""
+        group = self._groups.get((kind, key))
+        if group is None:
+            group = self._groups[(kind, key)] = []
+            {INPUT: self.inputs, MUL: self.muls,
+             OPEN: self.opens}[kind].append((key, group))
+        group.append(index)
+
+
+class Circuit(object):
+    """A recorded arithmetic circuit.
+
+    Each gate is a tuple with the kind of gate, the program counter
+    at which it was recorded, and the arguments of the gate:
+
+    * ``(INPUT, pc, inputter, field)``
+    * ``(LINEAR, pc, coefficients, wires, constant)``
+    * ``(MUL, pc, wire_a, wire_b)``
+    * ``(OPEN, pc, wire, receivers)``
+
+    A wire is the index of the gate with that output.
+    """
+
+    def __init__(self, gates):
+        self.gates = gates
+        #: The layers of the circuit, see :class:`Layer`.
+        self.layers = []
+        #: Indices of the open gates, whose values are the results.
+        self.outputs = [i for i, gate in enumerate(gates)
+                        if gate[0] == OPEN]
+
+        depths = []
+        fields = []
+        for index, gate in enumerate(gates):
+            kind = gate[0]
+            if kind == INPUT:
+                depth = 1
+                field = gate[3]
+            elif kind == LINEAR:
+                depth = max([depths[i] for i in gate[3]])
+                field = gate[4].field
+            elif kind == MUL:
+                depth = max(depths[gate[2]], depths[gate[3]]) + 1
+                field = fields[gate[2]]
+            else:
+                depth = depths[gate[2]] + 1
+                field = fields[gate[2]]
+            depths.append(depth)
+            fields.append(field)
+
+            while len(self.layers) < depth:
+                self.layers.append(Layer())
+            layer = self.layers[depth - 1]
+            if kind == INPUT:
+                layer.add(INPUT, (gate[2], field), index)
+            elif kind == LINEAR:
+                layer.linear.append(index)
+            elif kind == MUL:
+                layer.add(MUL, field, index)
+            else:
+                layer.add(OPEN, (field, gate[3]), index)
+
+    @property
+    def depth(self):
+        """The number of layers, i.e., rounds of communication."""
+        return len(self.layers)
+
+    def inputs(self, player_id):
+        """Return the number of inputs given by *player_id*."""
+        return len([gate for gate in self.gates
+                    if gate[0] == INPUT and gate[2] == player_id])
+
+    def run(self, runtime, inputs=()):
+        """Evaluate the circuit with *runtime*.
+
+        The *inputs* are the values this player inputs, in the order
+        they were recorded. Returns a
+        :class:`~twisted.internet.defer.Deferred` which is triggered
+        with a list of the opened values. Values opened to other
+        players are given as :const:`None`.
+        """
+        assert len(inputs) == self.inputs(runtime.id), \
+            "Wrong number of inputs."
+        gates = self.gates
+        values = [None] * len(gates)
+        # Position of each of our input gates in the recorded order.
+        positions = {}
+        for index, gate in enumerate(gates):
+            if gate[0] == INPUT and gate[2] == runtime.id:
+                positions[index] = len(positions)
+
+        def store(result, indices):
+            for index, value in zip(indices, result):
+                values[index] = value
+
+        def compute_linear(_, indices):
+            for index in indices:
+                kind, pc, coefficients, wires, value = gates[index]
+                for coefficient, wire in zip(coefficients, wires):
+                    value = value + coefficient * values[wire]
+                values[index] = value
+
+        def vector(field, wires):
+            return ShareVector(runtime, field, [values[w] for w in wires])
+
+        def run_layer(_, number):
+            if number == len(self.layers):
+                return [values[index] for index in self.outputs]
+            layer = self.layers[number]
+
+            exchanges = []
+            for (inputter, field), indices in layer.inputs:
+                if inputter == runtime.id:
+                    numbers = [_element(field,
+                                        inputs[positions[index]]).value
+                               for index in indices]
+                else:
+                    numbers = [None] * len(indices)
+                shares = runtime.shamir_share_vector([inputter], field,
+                                                     numbers)
+                exchanges.append(shares.addCallback(store, indices))
+            for field, indices in layer.muls:
+                products = runtime.mul(
+                    vector(field, [gates[i][2] for i in indices]),
+                    vector(field, [gates[i][3] for i in indices]))
+                exchanges.append(products.addCallback(store, indices))
+            for (field, receivers), indices in layer.opens:
+                opened = runtime.open(
+                    vector(field, [gates[i][2] for i in indices]),
+                    receivers and list(receivers))
+                if opened is not None:
+                    exchanges.append(opened.addCallback(store, indices))
+
+            result = gatherResults(exchanges)
+            result.addCallback(compute_linear, layer.linear)
+            runtime.schedule_callback(result, run_layer, number + 1)
+            return result
+
+        return maybeDeferred(run_layer, None, 0)
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
@@ -39,11 +39,13 @@ from viff import paillierutil
 class Player:
     """Wrapper for information about a player in the protocol."""
 
-    def __init__(self, id, host, port, pubkey, seckey=None, keys=None, dealer_keys=None):
+    def __init__(self, id, host, port, pubkey, seckey=None, keys=None,
+                 dealer_keys=None, unix_socket=None):
         """Initialize a player."""
         self.id = id
         self.host = host
         self.port = port
+        self.unix_socket = unix_socket
         self.pubkey = pubkey
         self.seckey = seckey
         self.keys = keys
@@ -91,6 +93,8 @@ class Player:
 
     def __repr__(self):
         """Simple string representation of the player."""
+        if self.unix_socket:
+            return "<Player %d: %s>" % (self.id, self.unix_socket)
         return "<Player %d: %s:%d>" % (self.id, self.host, self.port)
 
 
@@ -99,7 +103,9 @@ def load_config(source):
 
     Configuration files are simple INI-files containing information
     (hostname and port number) about the other players in the
-    protocol.
+    protocol. A player can optionally be given the path of a Unix
+    domain socket with the ``unix_socket`` key. It is then reached
+    through that socket instead of TCP.
 
     One of the players own the config file and for this player
     additional information on PRSS keys is available.
@@ -130,6 +136,7 @@ def load_config(source):
         id = p_unstr(player)
         host = config[player]['host']
         port = int(config[player]['port'])
+        unix_socket = config[player].get('unix_socket')
 
         if 'paillier' in config[player]:
             paillier_type = config[player]['paillier']['type']
@@ -160,12 +167,14 @@ def load_config(source):
                 for subset in config[player]['prss_dealer_keys'][dealer]:
                     dealer_keys[d][s_unstr(subset)] = config[player]['prss_dealer_keys'][dealer][subset]
 
-            players[id] = Player(id, host, port, pubkey, seckey, keys, dealer_keys)
+            players[id] = Player(id, host, port, pubkey, seckey, keys,
+                                 dealer_keys, unix_socket)
 
             # ID of player for which this config file was made
             owner_id = id
         else:
-            players[id] = Player(id, host, port, pubkey)
+            players[id] = Player(id, host, port, pubkey,
+                                 unix_socket=unix_socket)
 
     return owner_id, players
 
@@ -24,9 +24,17 @@ READY    = 2
 SEND     = 3
 PAILLIER = 4
 TEXT     = 5
+SHARES   = 10
+SHARE_BATCH = 11
 
 # Used by the HashBroadcastMixin
 INCONSISTENTHASH = 6
 OK               = 7
 HASH             = 8
 SIGNAL           = 9
+
+# Wire features announced in the handshake between players.
+BINARY_SHARES = "binary-shares"
+WIDE_FRAMES   = "wide-frames"
+PC_DICTIONARY = "pc-dictionary"
+SHARE_BATCHES = "share-batches"
@@ -102,7 +102,7 @@ class HashBroadcastMixin:
 
         self.increment_pc()
 
-        pc = tuple(self.program_counter)
+        pc = self.program_counter
         if self.id in receivers or self.id in senders:
             results = [None] * len(senders)
         else:
@@ -114,9 +114,8 @@ class HashBroadcastMixin:
         if self.id in receivers:
             for x in xrange(len(senders)):
                 sender = senders[x]
-                new_pc = list(self.program_counter)
-                new_pc.append(x)
-                results[x] = self._receive_broadcast(pc, tuple(new_pc), sender, receivers)
+                new_pc = pc + (x,)
+                results[x] = self._receive_broadcast(pc, new_pc, sender, receivers)
 
         if self.id in senders and self.id not in receivers:
             d = Deferred()
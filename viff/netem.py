@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Network emulation. The connections between players can be slowed
+down to behave like a wide area network, even when all players run on
+the same host or are connected by the loopback used in the unit
+tests. This makes it possible to predict how a protocol performs with
+a given round-trip time and bandwidth.
+
+The links are described with the ``--emulate-network`` option, see
+:func:`parse_link_profile`. Each :class:`~viff.runtime.ShareExchanger`
+then wraps its transport in a :class:`ShapedTransport` when the peer
+has been identified. The delay is added by the sender, so both players
+must use the option to get the full round-trip time.
+"""
+
+from __future__ import division
+
+from collections import deque
+
+from twisted.internet import reactor
+
+from viff.util import rand
+
+
+class LinkProfile(object):
+    """Properties of an emulated link between two players.
+
+    Times are given in seconds and the bandwidth in bytes per second.
+    A bandwidth of :const:`None` means unlimited bandwidth.
+    """
+
+    def __init__(self, rtt=0.0, bandwidth=None, jitter=0.0, batch=0.0):
+        #: Round-trip time. Data is delayed by half of this in each
+        #: direction.
+        self.rtt = rtt
+        #: Bandwidth in bytes per second.
+        self.bandwidth = bandwidth
+        #: Maximal extra delay added at random to each write.
+        self.jitter = jitter
+        #: Data is delivered in batches at multiples of this interval.
+        self.batch = batch
+
+    def __repr__(self):
+        return "<LinkProfile rtt=%g bandwidth=%r jitter=%g batch=%g>" \
+            % (self.rtt, self.bandwidth, self.jitter, self.batch)
+
+
+def parse_link_profile(spec):
+    """Parse a link description.
+
+    The description is a comma separated list of ``key=value`` pairs.
+    The keys are ``rtt``, ``jitter``, and ``batch`` in milliseconds,
+    ``bandwidth`` in Mbit/s, and ``peer`` which restricts the
+    description to the link to one player. The result is a pair of
+    the peer ID, or :const:`None` for all peers, and a
+    :class:`LinkProfile`:
+
+    >>> parse_link_profile("rtt=40,bandwidth=8")
+    (None, <LinkProfile rtt=0.04 bandwidth=1000000.0 jitter=0 batch=0>)
+    >>> parse_link_profile("peer=3,rtt=80,jitter=5")
+    (3, <LinkProfile rtt=0.08 bandwidth=None jitter=0.005 batch=0>)
+    >>> parse_link_profile("latency=10")
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown link property: latency
+    """
+    peer = None
+    profile = LinkProfile()
+    for pair in spec.split(","):
+        key, value = pair.split("=", 1)
+        key = key.strip()
+        if key == "peer":
+            peer = int(value)
+        elif key in ("rtt", "jitter", "batch"):
+            setattr(profile, key, float(value) / 1000)
+        elif key == "bandwidth":
+            profile.bandwidth = float(value) * 10**6 / 8
+        else:
+            raise ValueError("unknown link property: %s" % key)
+    return peer, profile
+
+
+def link_profiles(specs):
+    """Return a mapping from peer IDs to :class:`LinkProfile`
+    objects for a list of link descriptions.
+
+    The profile for all other peers is stored under :const:`None`.
+    """
+    profiles = {}
+    for spec in specs:
+        peer, profile = parse_link_profile(spec)
+        profiles[peer] = profile
+    return profiles
+
+
+class ShapedTransport(object):
+    """Transport which delays the data written to another transport.
+
+    Each write is delayed until the emulated link has had time to
+    send it, plus half the round-trip time and a random jitter. The
+    data stays in order, like on a TCP connection. Data which becomes
+    due at the same time is written in one go. All other methods are
+    passed on to the wrapped transport.
+
+    The delays are scheduled with *clock*, which defaults to the
+    reactor.
+    """
+
+    def __init__(self, transport, profile, clock=reactor):
+        self.transport = transport
+        self.profile = profile
+        self.clock = clock
+        # Data waiting to be written and the time it is due.
+        self._queue = deque()
+        # Time when the emulated link is done sending the data
+        # written so far, and when the last data is due.
+        self._link_free = 0.0
+        self._last_due = 0.0
+        self._pending = None
+        self._disconnect = False
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def write(self, data):
+        profile = self.profile
+        now = self.clock.seconds()
+        self._link_free = max(now, self._link_free)
+        if profile.bandwidth:
+            self._link_free += len(data) / profile.bandwidth
+        due = self._link_free + profile.rtt / 2
+        if profile.jitter:
+            due += rand.uniform(0, profile.jitter)
+        if profile.batch:
+            due = (int(due / profile.batch) + 1) * profile.batch
+        due = max(due, self._last_due)
+        self._last_due = due
+        self._queue.append((due, data))
+        if self._pending is None:
+            self._schedule(now)
+
+    def writeSequence(self, iovec):
+        self.write("".join(iovec))
+
+    def loseConnection(self):
+        """Close the connection once all data has been written."""
+        if self._queue:
+            self._disconnect = True
+        else:
+            self.transport.loseConnection()
+
+    def close(self):
+        self._cancel()
+        return self.transport.close()
+
+    def _schedule(self, now):
+        due = self._queue[0][0]
+        self._pending = self.clock.callLater(max(0, due - now), self._deliver)
+
+    def _cancel(self):
+        if self._pending is not None and self._pending.active():
+            self._pending.cancel()
+        self._pending = None
+
+    def _deliver(self):
+        self._pending = None
+        now = self.clock.seconds()
+        queue = self._queue
+        chunks = []
+        while queue and queue[0][0] <= now:
+            chunks.append(queue.popleft()[1])
+        if chunks:
+            self.transport.write("".join(chunks))
+        if queue:
+            self._schedule(now)
+        elif self._disconnect:
+            self.transport.loseConnection()
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
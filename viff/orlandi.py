@@ -200,7 +200,7 @@ class OrlandiMixin(HashBroadcastMixin):
         results = []
         for peer_id in inputters:
             if peer_id == self.id:
-                pc = tuple(self.program_counter)
+                pc = self.program_counter
                 shares, rho = additive_shares_with_rho(number)
                 Cx = commitment.commit(number, rho[0].value, rho[1].value)
                 # Distribute the shares
@@ -877,7 +877,7 @@ class OrlandiMixin(HashBroadcastMixin):
             # (c) P_j do, towards every other party:
             dijs = [None] * len(self.players.keys())
             results = [None] * len(self.players.keys())
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             p3 = field.modulus**3
             bjvalue = bj.value
             for pi in self.players.keys():
@@ -1164,7 +1164,7 @@ class OrlandiMixin(HashBroadcastMixin):
                 ds_c = [None] * len(self.players)
                 ds_alpha_randomness = [None] * len(self.players)
                 ds_dijs = [None] * len(self.players)
-                pc = tuple(self.program_counter)
+                pc = self.program_counter
 
                 for player_id in xrange(1, len(self.players.keys()) + 1):
                     if player_id == self.id:
@@ -98,7 +98,7 @@ class PaillierRuntime(Runtime):
         prfs = self.players[self.id].prfs(field.modulus)
         # There can only be one PRF in the dictionary.
         prf = prfs.values()[0]
-        share = field(prf(tuple(self.program_counter)))
+        share = field(prf(self.program_counter))
         return Share(self, field, share)
 
     def input(self, inputters, field, number=None):
@@ -122,7 +122,7 @@ class PaillierRuntime(Runtime):
                 b = number - a
 
                 results.append(Share(self, a.field, a))
-                pc = tuple(self.program_counter)
+                pc = self.program_counter
                 self.protocols[self.peer.id].sendShare(pc, b)
             else:
                 share = self._expect_share(peer_id, field)
@@ -141,7 +141,7 @@ class PaillierRuntime(Runtime):
         """Open *share* to *receivers* (defaults to both players)."""
 
         def exchange(a):
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             self.protocols[self.peer.id].sendShare(pc, a)
             result = self._expect_share(self.peer.id, share.field)
             result.addCallback(lambda b: a + b)
@@ -181,7 +181,7 @@ class PaillierRuntime(Runtime):
             share_b = Share(self, field, share_b)
 
         def finish_mul((a, b)):
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             send_data = self.protocols[self.peer.id].sendData
 
             if hash(pc) % 2 == self.id:
@@ -23,7 +23,9 @@ import operator
 
 from viff import shamir
 from viff.runtime import Runtime, Share, ShareList, gather_shares, preprocess
+from viff.runtime import ShareVector, share_value
 from viff.prss import prss, prss_lsb, prss_zero, prss_multi
+from viff.prss import random_replicated_sharings, convert_replicated_shamir_bulk
 from viff.field import GF256, FieldElement
 from viff.util import rand, profile
 
@@ -53,6 +55,8 @@ class PassiveRuntime(Runtime):
     def __init__(self, player, threshold, options=None):
         """Initialize runtime."""
         Runtime.__init__(self, player, threshold, options)
+        # Products waiting to be reshared by flush_batch.
+        self._reshare_batch = []
 
     def output(self, share, receivers=None, threshold=None):
         return self.open(share, receivers, threshold)
@@ -65,9 +69,21 @@ class PassiveRuntime(Runtime):
         result. By default the :attr:`threshold` + 1 shares are
         reconstructed, but *threshold* can be used to override this.
 
+        If *share* is a list of shares from the same field, a list of
+        opened shares is returned. All the shares are then sent to
+        each receiver in a single message. A
+        :class:`~viff.runtime.ShareVector` is opened the same way, but
+        the result is a single :class:`~viff.runtime.ShareVector`
+        holding the opened values.
+
         Communication cost: every player sends one share to each
         receiving player.
         """
+        if isinstance(share, ShareVector):
+            return self._open_vector(share, receivers, threshold)
+        if isinstance(share, list):
+            return self._open_list(share, receivers, threshold)
+
         assert isinstance(share, Share)
         # all players receive result by default
         if receivers is None:
@@ -92,8 +108,8 @@ class PassiveRuntime(Runtime):
             # Send share to all receivers.
             for peer_id in receivers:
                 if peer_id != self.id:
-                    pc = tuple(self.program_counter)
-                    self.protocols[peer_id].sendShare(pc, share)
+                    pc = self.program_counter
+                    self._send_share(peer_id, pc, share)
             # Receive and recombine shares if this player is a receiver.
             if self.id in receivers:
                 deferreds = []
@@ -115,12 +131,187 @@ class PassiveRuntime(Runtime):
         if self.id in receivers:
             return result
 
+    def _open_list(self, shares, receivers=None, threshold=None):
+        """Open a list of secret sharings, see :meth:`open`."""
+        for share in shares:
+            assert isinstance(share, Share)
+        if receivers is None:
+            receivers = self.players.keys()
+        if threshold is None:
+            threshold = self.threshold
+        if not shares:
+            # There is nothing to send.
+            if self.id in receivers:
+                return []
+            return None
+        field = shares[0].field
+        count = len(shares)
+
+        def filter_good_shares(results):
+            return [result[1] for result in results
+                    if result is not None and result[0]][:threshold+1]
+
+        def exchange(values):
+            # Send all shares to each receiver in one go.
+            pc = self.program_counter
+            for peer_id in receivers:
+                if peer_id != self.id:
+                    self.protocols[peer_id].sendShares(pc, values)
+            if self.id in receivers:
+                received = {}
+                for peer_id in self.players:
+                    if peer_id == self.id:
+                        received[peer_id] = [Share(self, field, value)
+                                             for value in values]
+                    else:
+                        received[peer_id] = self._expect_shares(peer_id,
+                                                                field, count)
+                for i in range(count):
+                    pairs = []
+                    for peer_id in self.players:
+                        d = received[peer_id][i]
+                        d.addCallback(lambda s, x: (x, s), field(peer_id))
+                        pairs.append(d)
+                    opened = ShareList(pairs, threshold+1)
+                    opened.addCallback(filter_good_shares)
+                    opened.addCallback(shamir.recombine)
+                    opened.chainDeferred(results[i])
+
+        results = [Share(self, field) for _ in range(count)]
+        self.schedule_callback(gather_shares(shares), exchange)
+
+        # do actual communication
+        self.activate_reactor()
+
+        if self.id in receivers:
+            return results
+
+    def _open_vector(self, vector, receivers=None, threshold=None):
+        """Open a vector of secret sharings, see :meth:`open`."""
+        if receivers is None:
+            receivers = self.players.keys()
+        if threshold is None:
+            threshold = self.threshold
+        field = vector.field
+        size = len(vector)
+        if size == 0:
+            # There is nothing to send.
+            if self.id in receivers:
+                return ShareVector(self, field, [])
+            return None
+
+        def filter_good_shares(results):
+            return [result[1] for result in results
+                    if result is not None and result[0]][:threshold+1]
+
+        def exchange(values):
+            # Send the whole vector to each receiver in one go.
+            pc = self.program_counter
+            for peer_id in receivers:
+                if peer_id != self.id:
+                    self.protocols[peer_id].sendShares(pc, values)
+            if self.id in receivers:
+                vectors = []
+                for peer_id in self.players:
+                    if peer_id == self.id:
+                        d = ShareVector(self, field, values)
+                    else:
+                        d = self._expect_vector(peer_id, field, size)
+                    d.addCallback(lambda v, x: (x, v), field(peer_id))
+                    vectors.append(d)
+                opened = ShareList(vectors, threshold+1)
+                opened.addCallback(filter_good_shares)
+                opened.addCallback(shamir.recombine_vector)
+                return opened
+
+        result = vector.clone()
+        self.schedule_callback(result, exchange)
+
+        # do actual communication
+        self.activate_reactor()
+
+        if self.id in receivers:
+            return result
+
+    def _repeat_share(self, share, size):
+        """Return a :class:`~viff.runtime.ShareVector` with *size*
+        copies of *share*."""
+        if self.eager:
+            value = share_value(share)
+            if value is not None:
+                return ShareVector(self, share.field, [value] * size)
+        result = ShareVector(self, share.field, size=size)
+        copies = share.clone()
+        copies.addCallback(lambda value: [value] * size)
+        copies.chainDeferred(result)
+        return result
+
+    def _elementwise(self, op, vector_a, vector_b):
+        """Apply *op* elementwise to two vectors.
+
+        At least one of the arguments is a
+        :class:`~viff.runtime.ShareVector`. The other may also be a
+        list of constants, a single constant or a single
+        :class:`~viff.runtime.Share` which is used for every element.
+        """
+        vectors = [v for v in (vector_a, vector_b)
+                   if isinstance(v, ShareVector)]
+        field = vectors[0].field
+        size = len(vectors[0])
+        if len(vectors) == 1:
+            # Use a vector of copies of a single share.
+            if isinstance(vector_a, Share) \
+                    and not isinstance(vector_a, ShareVector):
+                vector_a = self._repeat_share(vector_a, size)
+            if isinstance(vector_b, Share) \
+                    and not isinstance(vector_b, ShareVector):
+                vector_b = self._repeat_share(vector_b, size)
+            vectors = [v for v in (vector_a, vector_b)
+                       if isinstance(v, ShareVector)]
+        for v in (vector_a, vector_b):
+            if isinstance(v, (ShareVector, list)):
+                assert len(v) == size, "Vectors must have equal length."
+
+        def computation(values):
+            values = iter(values)
+            args = []
+            for v in (vector_a, vector_b):
+                if isinstance(v, ShareVector):
+                    v = values.next()
+                elif not isinstance(v, list):
+                    v = [v] * size
+                args.append(v)
+            return map(op, *args)
+
+        if self.eager:
+            values = map(share_value, vectors)
+            if None not in values:
+                return ShareVector(self, field, computation(values))
+
+        result = ShareVector(self, field, size=size)
+        values = gather_shares(vectors)
+        values.addCallback(computation)
+        values.chainDeferred(result)
+        return result
+
     @profile
     def add(self, share_a, share_b):
         """Addition of shares.
 
         Communication cost: none.
         """
+        if isinstance(share_a, ShareVector) or isinstance(share_b, ShareVector):
+            return self._elementwise(operator.add, share_a, share_b)
+
+        if self.eager:
+            a = share_value(share_a)
+            if a is not None:
+                if not isinstance(share_b, Share):
+                    return Share(self, share_a.field, share_b + a)
+                b = share_value(share_b)
+                if b is not None:
+                    return Share(self, share_a.field, a + b)
+
         if not isinstance(share_b, Share):
             # Addition with constant. share_a always is a Share by
             # operator overloading in Share. Clone share_a to avoid
@@ -138,7 +329,22 @@ class PassiveRuntime(Runtime):
 
         Communication cost: none.
         """
+        if isinstance(share_a, ShareVector) or isinstance(share_b, ShareVector):
+            return self._elementwise(operator.sub, share_a, share_b)
+
         field = getattr(share_a, "field", getattr(share_b, "field", None))
+        if self.eager:
+            if isinstance(share_a, Share):
+                a = share_value(share_a)
+            else:
+                a = share_a
+            if isinstance(share_b, Share):
+                b = share_value(share_b)
+            else:
+                b = share_b
+            if a is not None and b is not None:
+                return Share(self, field, a - b)
+
         if not isinstance(share_a, Share):
             share_a = Share(self, field, share_a)
         if not isinstance(share_b, Share):
@@ -152,6 +358,9 @@ class PassiveRuntime(Runtime):
     def lin_comb(self, coefficients, shares):
         """Linear combination of shares.
 
+        The shares can also be :class:`~viff.runtime.ShareVector`
+        objects of equal length, the result is then a vector.
+
         Communication cost: none. Saves the construction of unnecessary shares
         compared to using add() and mul()."""
 
@@ -166,19 +375,69 @@ class PassiveRuntime(Runtime):
         assert len(coefficients) == len(shares), \
             "Number of coefficients and shares should be equal."
 
+        if shares and isinstance(shares[0], ShareVector):
+            return self._lin_comb_vector(coefficients, shares)
+
         def computation(shares, coefficients):
             return sum(map(operator.mul, coefficients, shares))
 
+        if self.eager and shares:
+            values = map(share_value, shares)
+            for value in values:
+                if value is None:
+                    break
+            else:
+                return Share(self, shares[0].field,
+                             computation(values, coefficients))
+
         result = gather_shares(shares)
         result.addCallback(computation, coefficients)
         return result
 
+    def _lin_comb_vector(self, coefficients, vectors):
+        """Linear combination of vectors, see :meth:`lin_comb`."""
+        field = vectors[0].field
+        size = len(vectors[0])
+        for vector in vectors:
+            assert isinstance(vector, ShareVector) and len(vector) == size, \
+                "Vectors must have equal length."
+
+        def computation(values):
+            result = [coefficients[0] * x for x in values[0]]
+            for coefficient, column in zip(coefficients[1:], values[1:]):
+                result = [r + coefficient * x for r, x in zip(result, column)]
+            return result
+
+        if self.eager:
+            values = map(share_value, vectors)
+            if None not in values:
+                return ShareVector(self, field, computation(values))
+
+        result = ShareVector(self, field, size=size)
+        values = gather_shares(vectors)
+        values.addCallback(computation)
+        values.chainDeferred(result)
+        return result
+
     @profile
     def mul(self, share_a, share_b):
         """Multiplication of shares.
 
+        If *share_a* and *share_b* are lists of equal length, the
+        elementwise products are returned as a list. The resharing is
+        then done with a single message to each player. The same holds
+        for :class:`~viff.runtime.ShareVector` objects, where the
+        products are returned as a vector.
+
         Communication cost: 1 Shamir sharing.
         """
+        if isinstance(share_a, ShareVector):
+            return self._mul_vector(share_a, share_b)
+        if isinstance(share_b, ShareVector):
+            return self._mul_vector(share_b, share_a)
+        if isinstance(share_a, list):
+            return self._mul_list(share_a, share_b)
+
         assert isinstance(share_a, Share), \
             "share_a must be a Share."
 
@@ -186,6 +445,10 @@ class PassiveRuntime(Runtime):
             # Local multiplication. share_a always is a Share by
             # operator overloading in Share. We clone share_a first
             # to avoid changing it.
+            if self.eager:
+                a = share_value(share_a)
+                if a is not None:
+                    return Share(self, share_a.field, share_b * a)
             result = share_a.clone()
             result.addCallback(lambda a: share_b * a)
             return result
@@ -209,7 +472,178 @@ class PassiveRuntime(Runtime):
 
         result = gather_shares([share_a, share_b])
         result.addCallback(lambda (a, b): a * b)
-        self.schedule_callback(result, share_recombine)
+        if self.batch_shares:
+            self.schedule_callback(result, self._batch_reshare)
+        else:
+            self.schedule_callback(result, share_recombine)
+
+        # do actual communication
+        self.activate_reactor()
+
+        return result
+
+    def _batch_reshare(self, product):
+        """Reshare *product* together with the other products which
+        become ready before the next :meth:`flush_batch`.
+
+        The shares are received as usual, only the sending is
+        postponed.
+        """
+        field = product.field
+        own_share = Share(self, field)
+        exchanged = []
+        for peer_id in range(1, self.num_players + 1):
+            if peer_id == self.id:
+                d = own_share
+            else:
+                d = self._expect_share(peer_id, field)
+            d.addCallback(lambda share, x: (x, share), field(peer_id))
+            exchanged.append(d)
+        self._reshare_batch.append((self.program_counter, product,
+                                    own_share))
+        self._schedule_batch()
+
+        # Recombine the first 2t+1 shares.
+        result = gather_shares(exchanged[:2*self.threshold+1])
+        result.addCallback(shamir.recombine)
+        return result
+
+    def flush_batch(self):
+        """Reshare the collected products and send all shares.
+
+        The products are shared with one call to
+        :func:`~viff.shamir.share_vector` per field. The shares for
+        each peer are then sent in one batch, ordered by program
+        counter.
+        """
+        batch = self._reshare_batch
+        self._reshare_batch = []
+        batch.sort(key=lambda (pc, _, __): pc)
+
+        by_field = {}
+        for entry in batch:
+            by_field.setdefault(entry[1].field, []).append(entry)
+
+        own_shares = []
+        for entries in by_field.itervalues():
+            products = [product for _, product, _ in entries]
+            shares = shamir.share_vector(products, self.threshold,
+                                         self.num_players)
+            for peer_id, outgoing in shares:
+                peer_id = peer_id.value
+                for (pc, _, own_share), share in zip(entries, outgoing):
+                    if peer_id == self.id:
+                        own_shares.append((own_share, share))
+                    else:
+                        self._send_share(peer_id, pc, share)
+
+        Runtime.flush_batch(self)
+
+        for own_share, share in own_shares:
+            own_share.callback(share)
+
+    def _mul_list(self, shares_a, shares_b):
+        """Elementwise multiplication of lists of shares, see :meth:`mul`."""
+        assert len(shares_a) == len(shares_b), \
+            "Lists of shares must have equal length."
+        if not shares_a:
+            return []
+
+        for share_a, share_b in zip(shares_a, shares_b):
+            if not (isinstance(share_a, Share) and isinstance(share_b, Share)):
+                # Multiplications with constants need no resharing,
+                # so there is nothing to gain from batching.
+                return [self.mul(a, b) for a, b in zip(shares_a, shares_b)]
+
+        field = shares_a[0].field
+        count = len(shares_a)
+
+        def multiply(values):
+            return [a * b for a, b in zip(values[:count], values[count:])]
+
+        def share_recombine(products):
+            shares = [shamir.share(product, self.threshold, self.num_players)
+                      for product in products]
+
+            pc = self.program_counter
+            exchanged = {}
+            for peer_id in self.players:
+                # The shares destined for peer_id, one per product.
+                outgoing = [s[peer_id - 1][1] for s in shares]
+                if peer_id == self.id:
+                    exchanged[peer_id] = [Share(self, field, share)
+                                          for share in outgoing]
+                else:
+                    exchanged[peer_id] = self._expect_shares(peer_id, field,
+                                                             count)
+                    self.protocols[peer_id].sendShares(pc, outgoing)
+
+            # Recombine the first 2t+1 shares of each product.
+            for i in range(count):
+                pairs = []
+                for peer_id in range(1, 2*self.threshold + 2):
+                    d = exchanged[peer_id][i]
+                    d.addCallback(lambda s, x: (x, s), field(peer_id))
+                    pairs.append(d)
+                result = gather_shares(pairs)
+                result.addCallback(shamir.recombine)
+                result.chainDeferred(results[i])
+
+        results = [Share(self, field) for _ in range(count)]
+        products = gather_shares(shares_a + shares_b)
+        products.addCallback(multiply)
+        self.schedule_callback(products, share_recombine)
+
+        # do actual communication
+        self.activate_reactor()
+
+        return results
+
+    def _mul_vector(self, vector_a, vector_b):
+        """Elementwise multiplication of vectors, see :meth:`mul`.
+
+        A single :class:`~viff.runtime.Share` is multiplied with
+        every element of the vector.
+        """
+        if not isinstance(vector_b, Share):
+            # Multiplication with constants needs no resharing.
+            return self._elementwise(operator.mul, vector_a, vector_b)
+        if not isinstance(vector_b, ShareVector):
+            vector_b = self._repeat_share(vector_b, len(vector_a))
+
+        assert len(vector_a) == len(vector_b), \
+            "Vectors must have equal length."
+        field = vector_a.field
+        size = len(vector_a)
+        if size == 0:
+            return ShareVector(self, field, [])
+
+        def share_recombine(products):
+            shares = shamir.share_vector(products, self.threshold,
+                                         self.num_players)
+
+            pc = self.program_counter
+            exchanged = []
+            for peer_id, outgoing in shares:
+                peer_id = peer_id.value
+                if peer_id == self.id:
+                    d = ShareVector(self, field, outgoing)
+                else:
+                    d = self._expect_vector(peer_id, field, size)
+                    self.protocols[peer_id].sendShares(pc, outgoing)
+                d.addCallback(lambda v, x: (x, v), field(peer_id))
+                exchanged.append(d)
+
+            # Recombine the first 2t+1 shares of each product.
+            result = gather_shares(exchanged[:2*self.threshold+1])
+            result.addCallback(shamir.recombine_vector)
+            return result
+
+        result = ShareVector(self, field, size=size)
+        products = gather_shares([vector_a, vector_b])
+        products.addCallback(lambda (a, b): map(operator.mul, a, b))
+        self.schedule_callback(products, share_recombine)
+        products.chainDeferred(result)
 
         # do actual communication
         self.activate_reactor()
@@ -261,7 +695,7 @@ class PassiveRuntime(Runtime):
                "PRSS functions have higher threshold than the runtime."
 
         self.increment_pc()
-        return tuple(self.program_counter)
+        return self.program_counter
 
     def prss_share(self, inputters, field, element=None):
         """Creates pseudo-random secret sharings.
@@ -309,7 +743,7 @@ class PassiveRuntime(Runtime):
             correction = element - shared
             # if this player is inputter then broadcast correction value
             # TODO: more efficient broadcast?
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             for peer_id in self.players:
                 if self.id != peer_id:
                     self.protocols[peer_id].sendShare(pc, correction)
@@ -355,21 +789,22 @@ class PassiveRuntime(Runtime):
         # Open the square and compute a square-root
         result = self.open(Share(self, field, share*share),
                            threshold=2*self.threshold)
-
-        def finish(square, share, binary):
-            if square == 0:
-                # We were unlucky, try again...
-                return self.prss_share_random(field, binary)
-            else:
-                # We can finish the calculation
-                root = square.sqrt()
-                # When the root is computed, we divide the share and
-                # convert the resulting -1/1 share into a 0/1 share.
-                return Share(self, field, (share/root + 1) / 2)
-
-        self.schedule_callback(result, finish, share, binary)
+        self.schedule_callback(result, self._finish_random_bit, share, field)
         return result
 
+    def _finish_random_bit(self, square, share, field):
+        """Turn the random *share* into a 0/1 share using its opened
+        *square*."""
+        if square == 0:
+            # We were unlucky, try again...
+            return self.prss_share_random(field, True)
+        else:
+            # We can finish the calculation
+            root = square.sqrt()
+            # When the root is computed, we divide the share and
+            # convert the resulting -1/1 share into a 0/1 share.
+            return Share(self, field, (share/root + 1) / 2)
+
     def prss_share_random_multi(self, field, quantity, binary=False):
         """Does the same as calling *quantity* times :meth:`prss_share_random`,
         but with less calls to the PRF. Sampling of a binary element is only
@@ -392,6 +827,60 @@ class PassiveRuntime(Runtime):
                             modulus, quantity)
         return [Share(self, field, share) for share in shares]
 
+    def prss_share_random_bulk(self, field, quantity, binary=False):
+        """Does the same as calling *quantity* times
+        :meth:`prss_share_random`, but evaluates each PRF for all the
+        shares in one go.
+
+        With the ``--worker-processes`` option, the PRFs are split
+        over the worker processes, see
+        :meth:`~viff.runtime.Runtime.run_in_worker`.
+
+        Communication cost: none if binary=False, *quantity* opens
+        otherwise.
+        """
+        if field is GF256 and binary:
+            modulus = 2
+        else:
+            modulus = field.modulus
+
+        # Key used for PRSS.
+        prss_key = self.prss_key()
+        keys = [(prss_key, i) for i in xrange(quantity)]
+        prfs = self.players[self.id].prfs(modulus)
+        subsets = [subset for subset in prfs if self.id in subset]
+
+        if self.worker_pool is None:
+            workers = 1
+        else:
+            workers = self.options.worker_processes
+        parts = []
+        for i in xrange(workers):
+            part = dict([(subset, prfs[subset])
+                         for subset in subsets[i::workers]])
+            parts.append(self.run_in_worker(random_replicated_sharings,
+                                            self.id, part, keys))
+
+        results = [Share(self, field) for _ in xrange(quantity)]
+
+        def finish(parts):
+            rep_sharings = reduce(operator.add, parts, [])
+            shares = convert_replicated_shamir_bulk(self.num_players,
+                                                    self.id, field,
+                                                    rep_sharings, quantity)
+            for share, result in zip(shares, results):
+                if field is GF256 or not binary:
+                    result.callback(share)
+                else:
+                    square = self.open(Share(self, field, share*share),
+                                       threshold=2*self.threshold)
+                    self.schedule_callback(square, self._finish_random_bit,
+                                           share, field)
+                    square.chainDeferred(result)
+
+        self.schedule_callback(gatherResults(parts), finish)
+        return results
+
     def prss_share_zero(self, field, quantity):
         """Generate *quantity* shares of the zero element from the
         field given.
@@ -492,6 +981,14 @@ class PassiveRuntime(Runtime):
         """
         return self.shamir_share(inputters, field, number, threshold)
 
+    def input_vector(self, inputters, field, numbers, threshold=None):
+        """Input the list *numbers* to the computation as a vector.
+
+        The list is shared using the :meth:`shamir_share_vector`
+        method.
+        """
+        return self.shamir_share_vector(inputters, field, numbers, threshold)
+
     def shamir_share(self, inputters, field, number=None, threshold=None):
         """Secret share *number* over *field* using Shamir's method.
 
@@ -526,8 +1023,22 @@ class PassiveRuntime(Runtime):
 
         which might be practical in some cases.
 
+        Each inputter can also share a list of numbers. Every player
+        then gets a list of shares per inputter and all shares from an
+        inputter arrive in a single message. Players who are not
+        inputters give a list of :const:`None` of the same length::
+
+            if runtime.id == 1:
+                xs = runtime.shamir_share([1], Zp, [x, y, z])
+            else:
+                xs = runtime.shamir_share([1], Zp, [None] * 3)
+
         Communication cost: n elements transmitted.
         """
+        if isinstance(number, list):
+            return self._shamir_share_list(inputters, field, number,
+                                           threshold)
+
         assert number is None or self.id in inputters
         if threshold is None:
             threshold = self.threshold
@@ -538,7 +1049,7 @@ class PassiveRuntime(Runtime):
             self.increment_pc()
 
             if peer_id == self.id:
-                pc = tuple(self.program_counter)
+                pc = self.program_counter
                 shares = shamir.share(field(number), threshold,
                                       self.num_players)
                 for other_id, share in shares:
@@ -557,3 +1068,96 @@ class PassiveRuntime(Runtime):
             return results[0]
         else:
             return results
+
+    def _shamir_share_list(self, inputters, field, numbers, threshold=None):
+        """Secret share a list of numbers, see :meth:`shamir_share`."""
+        assert self.id in inputters or numbers == [None] * len(numbers)
+        if threshold is None:
+            threshold = self.threshold
+        count = len(numbers)
+        if count == 0:
+            # There is nothing to send.
+            if len(inputters) == 1:
+                return []
+            return [[] for _ in inputters]
+
+        results = []
+        for peer_id in inputters:
+            # Unique program counter per input.
+            self.increment_pc()
+
+            if peer_id == self.id:
+                pc = self.program_counter
+                shares = [shamir.share(field(number), threshold,
+                                       self.num_players)
+                          for number in numbers]
+                for other_id in self.players:
+                    outgoing = [s[other_id - 1][1] for s in shares]
+                    if other_id == self.id:
+                        results.append([Share(self, field, share)
+                                        for share in outgoing])
+                    else:
+                        self.protocols[other_id].sendShares(pc, outgoing)
+            else:
+                results.append(self._expect_shares(peer_id, field, count))
+
+        # do actual communication
+        self.activate_reactor()
+
+        # Unpack a singleton list.
+        if len(results) == 1:
+            return results[0]
+        else:
+            return results
+
+    def shamir_share_vector(self, inputters, field, numbers, threshold=None):
+        """Secret share a list of numbers as a vector.
+
+        This works like sharing a list with :meth:`shamir_share`, but
+        the shares from each inputter are returned as a single
+        :class:`~viff.runtime.ShareVector`. Players who are not
+        inputters give a list of :const:`None` of the same length::
+
+            if runtime.id == 1:
+                xs = runtime.shamir_share_vector([1], Zp, [x, y, z])
+            else:
+                xs = runtime.shamir_share_vector([1], Zp, [None] * 3)
+
+        Communication cost: n elements transmitted per number.
+        """
+        assert self.id in inputters or numbers == [None] * len(numbers)
+        if threshold is None:
+            threshold = self.threshold
+        size = len(numbers)
+        if size == 0:
+            # There is nothing to send.
+            if len(inputters) == 1:
+                return ShareVector(self, field, [])
+            return [ShareVector(self, field, []) for _ in inputters]
+
+        results = []
+        for peer_id in inputters:
+            # Unique program counter per input.
+            self.increment_pc()
+
+            if peer_id == self.id:
+                pc = self.program_counter
+                shares = shamir.share_vector([field(n) for n in numbers],
+                                             threshold, self.num_players)
+                for other_id, outgoing in shares:
+                    if other_id.value == self.id:
+                        results.append(ShareVector(self, field, outgoing))
+                    else:
+                        self.protocols[other_id.value].sendShares(pc,
+                                                                  outgoing)
+            else:
+                results.append(self._expect_vector(peer_id, field, size))
+
+        # do actual communication
+        self.activate_reactor()
+
+        # Unpack a singleton list.
+        if len(results) == 1:
+            return results[0]
+        else:
+            return results
@@ -63,6 +63,20 @@ def random_replicated_sharing(j, prfs, key):
     # the subset before using it.
     return [(s, prf(key)) for (s, prf) in prfs.iteritems() if j in s]
 
+def random_replicated_sharings(j, prfs, keys):
+    """Return replicated sharings of random numbers, one for each key.
+
+    This does the same as calling :func:`random_replicated_sharing`
+    for each of the *keys*, but evaluates each PRF for all the keys in
+    one go. The result is a list of ``(subset, shares)`` pairs where
+    *shares* has a share for each key.
+
+    The PRFs can be pickled, so the evaluation can be split over
+    worker processes by giving each a part of *prfs*.
+    """
+    return [(s, prf.evaluate_all(keys))
+            for (s, prf) in prfs.iteritems() if j in s]
+
 #: Cache the coefficients used to construct the share. They depend on the field,
 #: the player concerned, the total number of players, and the subset.
 _f_in_j_cache = {}
@@ -86,6 +100,21 @@ def convert_replicated_shamir(n, j, field, rep_shares):
         result += share * f_in_j
     return result
 
+@fake(lambda n, j, field, rep_sharings, quantity: [field(7)] * quantity)
+def convert_replicated_shamir_bulk(n, j, field, rep_sharings, quantity):
+    """Convert *quantity* replicated sharings to Shamir shares.
+
+    The *rep_sharings* are ``(subset, shares)`` pairs as returned by
+    :func:`random_replicated_sharings`. Each sharing is converted for
+    player *j* (out of *n*) using :func:`convert_replicated_shamir`.
+    """
+    rep_shares_list = [[] for _ in xrange(quantity)]
+    for subset, shares in rep_sharings:
+        for rep_shares, share in zip(rep_shares_list, shares):
+            rep_shares.append((subset, share))
+    return [convert_replicated_shamir(n, j, field, rep_shares)
+            for rep_shares in rep_shares_list]
+
 @fake(lambda n, j, field, prfs, key: field(7))
 def prss(n, j, field, prfs, key):
     """Return a pseudo-random secret share for a random number.
@@ -127,6 +156,27 @@ def prss_multi(n, j, field, prfs, key, modulus, quantity):
     return [convert_replicated_shamir(n, j, field, rep_shares)
             for rep_shares in rep_shares_list]
 
+@fake(lambda n, j, field, prfs, keys: [field(7)] * len(keys))
+def prss_bulk(n, j, field, prfs, keys):
+    """Return pseudo-random secret shares for a random number for
+    each of the *keys*.
+
+    The result is the same as calling :func:`prss` for each key:
+
+    >>> from field import GF
+    >>> Zp = GF(31)
+    >>> prfs = {frozenset([1,2]): PRF("a", 31),
+    ...         frozenset([1,3]): PRF("b", 31),
+    ...         frozenset([2,3]): PRF("c", 31)}
+    >>> prss_bulk(3, 1, Zp, prfs, ["key", "foo"])
+    [{22}, {23}]
+    >>> prss(3, 1, Zp, prfs, "foo")
+    {23}
+    """
+    rep_sharings = random_replicated_sharings(j, prfs, keys)
+    return convert_replicated_shamir_bulk(n, j, field, rep_sharings,
+                                          len(keys))
+
 @fake(lambda n, j, field, prfs, key: (field(7), GF256(1)))
 def prss_lsb(n, j, field, prfs, key):
     """Share a pseudo-random number and its least significant bit.
@@ -328,6 +378,7 @@ class PRF(object):
         >>> [f(i) for i in range(100)] == [g(i) for i in range(100)]
         False
         """
+        self.key = key
         self.max = max
 
         # Number of bits needed for a number in the range [0, max-1].
@@ -425,6 +476,51 @@ class PRF(object):
                 # inputs which give the same output value.
                 input += digest[-1]
 
+    def evaluate_all(self, inputs):
+        """Return a list with the numbers for all the *inputs*.
+
+        This gives the same numbers as calling the PRF on each input,
+        but avoids most of the overhead per call:
+
+        >>> prf = PRF("key", 1000)
+        >>> prf.evaluate_all([1, 2, 3])
+        [501L, 432L, 133L]
+        """
+        sha1s = self.sha1s
+        bytes = self.bytes
+        shift = 8 - self.bits if self.bits else 0
+        max = self.max
+
+        results = []
+        append = results.append
+        for input in inputs:
+            if not isinstance(input, str):
+                input = str(input)
+            digests = []
+            for sha1 in sha1s:
+                copy = sha1.copy()
+                copy.update(input)
+                digests.append(copy.digest())
+            result = long(hexlify(''.join(digests)[:bytes]), 16) >> shift
+            if result < max:
+                append(result)
+            else:
+                # Rare case, let __call__ find the next candidate.
+                append(self(input))
+        return results
+
+    def __reduce__(self):
+        """Pickle the PRF by its key and maximum.
+
+        This allows sending PRFs to worker processes:
+
+        >>> import pickle
+        >>> prf = PRF("key", 1000)
+        >>> pickle.loads(pickle.dumps(prf))(1)
+        501L
+        """
+        return (PRF, (self.key, self.max))
+
 if __name__ == "__main__":
     import doctest    #pragma NO COVER
     doctest.testmod() #pragma NO COVER
@@ -17,37 +17,144 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
 
-"""VIFF reactor to have control over the scheduling."""
+"""VIFF reactor to have control over the scheduling.
+
+The VIFF reactor is available on top of the :func:`select.select`,
+:func:`select.poll`, and :func:`select.epoll` system calls. The
+select based reactor is used by default. It is limited to file
+descriptors below 1024 and it looks at every descriptor in each
+iteration. The epoll based reactor has neither limitation and can be
+selected with the :envvar:`VIFF_REACTOR` environment variable or the
+argument to :func:`install`.
+"""
+
+import os
 
 from twisted.internet.selectreactor import SelectReactor
 
 
-class ViffReactor(SelectReactor):
-    """VIFF reactor.
+class ViffReactorMixin:
+    """Add a loop call to a Twisted reactor.
 
-    The only difference to the SelectReactor is the loop call.
-    From there, doIteration() can be called recursively."""
+    The loop call is run after every iteration of the reactor, and
+    :meth:`doIteration` can be called recursively from there. The
+    class providing the actual I/O multiplexing is given by
+    :attr:`base`.
+
+    Unless :attr:`reentrant` is set, an iteration started from
+    within the loop call only sends and receives data and runs timed
+    calls. The loop call is not entered again, so the work it finds
+    waits for the outer loop call, which runs until its queues are
+    empty. This keeps the stack flat.
+    """
+
+    #: Reactor class which is extended.
+    base = None
+
+    #: Whether the loop call is run by nested iterations too.
+    reentrant = False
 
     def __init__(self):
-        SelectReactor.__init__(self)
+        self.base.__init__(self)
         self.loopCall = lambda: None
-   
+        #: Number of iterations done.
+        self.iterations = 0
+        #: Number of iterations done from within the loop call.
+        self.nested_iterations = 0
+        self._in_loop_call = False
+
     def setLoopCall(self, f):
         self.loopCall = f
 
     def doIteration(self, t):
         # Do the same as in mainLoop() first.
         self.runUntilCurrent()
+        # Timed calls may have delivered data, which must be processed
+        # before we wait for the network.
+        self._run_loop_call()
         t2 = self.timeout()
 
         if t2 is not None:
-            t = min(t, self.running and t2)
+            if t is None:
+                t = self.running and t2
+            else:
+                t = min(t, self.running and t2)
+
+        self.base.doIteration(self, t)
+        self.iterations += 1
+        if self._in_loop_call:
+            self.nested_iterations += 1
+        self._run_loop_call()
+
+    def _run_loop_call(self):
+        if self._in_loop_call:
+            if self.reentrant:
+                self.loopCall()
+        else:
+            self._in_loop_call = True
+            try:
+                self.loopCall()
+            finally:
+                self._in_loop_call = False
+
+
+class ViffReactor(ViffReactorMixin, SelectReactor):
+    """VIFF reactor.
+
+    The only difference to the SelectReactor is the loop call.
+    From there, doIteration() can be called recursively."""
+
+    base = SelectReactor
+
+
+#: VIFF reactor classes by the name of the system call they use.
+reactor_classes = {"select": ViffReactor}
+
+try:
+    from twisted.internet.pollreactor import PollReactor
+except ImportError:
+    pass
+else:
+    class PollViffReactor(ViffReactorMixin, PollReactor):
+        """VIFF reactor using :func:`select.poll`."""
+
+        base = PollReactor
+
+    reactor_classes["poll"] = PollViffReactor
+
+try:
+    from twisted.internet.epollreactor import EPollReactor
+except ImportError:
+    pass
+else:
+    class EPollViffReactor(ViffReactorMixin, EPollReactor):
+        """VIFF reactor using :func:`select.epoll`."""
+
+        base = EPollReactor
+
+    reactor_classes["epoll"] = EPollViffReactor
+
+
+def default_kind():
+    """Return the kind of reactor used by :func:`install` by default.
+
+    This is the value of the :envvar:`VIFF_REACTOR` environment
+    variable if it is set, and otherwise ``"select"``.
+    """
+    return os.environ.get("VIFF_REACTOR") or "select"
+
 
-        SelectReactor.doIteration(self, t)
-        self.loopCall()
+def install(kind=None):
+    """Use the VIFF reactor.
 
-def install():
-    """Use the VIFF reactor."""
-    reactor = ViffReactor()
+    The *kind* selects the system call used to wait for the network:
+    ``"select"``, ``"poll"``, or ``"epoll"``. The default is given by
+    :func:`default_kind`.
+    """
+    if kind is None:
+        kind = default_kind()
+    if kind not in reactor_classes:
+        raise ValueError("Unknown or unsupported reactor kind: %r" % kind)
+    reactor = reactor_classes[kind]()
     from twisted.internet.main import installReactor
     installReactor(reactor)
@@ -0,0 +1,165 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Analysis of the round complexity of a program. When the
+``--analyze-rounds`` option is given, the
+:class:`~viff.runtime.Runtime` records every exchange of data with
+the other players in a :class:`RoundAnalyzer` and prints a report on
+shutdown.
+
+Each exchange is a node which knows its round and the exchange it
+depends on. The round of an exchange is one more than the round of
+the data available to the code which started it, so the round of a
+:class:`~viff.runtime.Share` is the number of exchanges on its
+dependency chain. Following the nodes back from the last round gives
+the critical path of the program:
+
+>>> analyzer = RoundAnalyzer()
+>>> a = analyzer.exchange(None, "open")
+>>> b = analyzer.exchange(a, "mul")
+>>> c = analyzer.exchange(a, "mul")
+>>> d = analyzer.exchange(c, "open")
+>>> analyzer.rounds()
+3
+>>> analyzer.messages_per_round()
+[1, 2, 1]
+>>> critical_path(analyzer.deepest)
+['open', 'mul', 'open']
+
+All players are assumed to run the same program, which is the case
+for the protocols in VIFF. The round of received data is then one more
+than the round of the code which asks for it, since the sender is at
+the same point of the program.
+
+The rounds are followed through :meth:`Runtime.schedule_callback
+<viff.runtime.Runtime.schedule_callback>` and
+:class:`~viff.runtime.ShareList`. A :class:`~twisted.internet.defer.Deferred`
+which is triggered in other ways, for example by
+:meth:`chainDeferred`, gets the round of the code which scheduled its
+callbacks, so the result is a lower bound.
+"""
+
+#: Round of data which does not depend on any exchange.
+ROOT = None
+
+
+def depth(node):
+    """Return the round of *node*."""
+    if node is None:
+        return 0
+    return node[0]
+
+
+def deepest(nodes):
+    """Return the node with the highest round among *nodes*.
+
+    >>> a = (1, "open", None)
+    >>> deepest([a, None, (2, "mul", a)])
+    (2, 'mul', (1, 'open', None))
+    """
+    result = None
+    for node in nodes:
+        if node is not None and (result is None or node[0] > result[0]):
+            result = node
+    return result
+
+
+def critical_path(node, start=None):
+    """Return the labels of the exchanges leading to *node*.
+
+    The labels are given in the order of the rounds. The path stops
+    at the round of *start*.
+    """
+    path = []
+    stop = depth(start)
+    while node is not None and node[0] > stop:
+        path.append(node[1])
+        node = node[2]
+    path.reverse()
+    return path
+
+
+def summarize_path(path):
+    """Count consecutive rounds with the same label in *path*.
+
+    >>> summarize_path(["open", "mul", "mul", "open"])
+    [('open', 1), ('mul', 2), ('open', 1)]
+    """
+    result = []
+    for label in path:
+        if result and result[-1][0] == label:
+            result[-1] = (label, result[-1][1] + 1)
+        else:
+            result.append((label, 1))
+    return result
+
+
+class RoundAnalyzer(object):
+    """Records the exchanges of data made by a player."""
+
+    def __init__(self):
+        #: Maps each round to the number of messages received in it.
+        self.messages = {}
+        #: The exchange with the highest round seen.
+        self.deepest = ROOT
+
+    def exchange(self, parent, label):
+        """Record an exchange which depends on the node *parent*.
+
+        The *label* names the operation which made the exchange.
+        Returns the node of the exchange.
+        """
+        node = (depth(parent) + 1, label, parent)
+        self.messages[node[0]] = self.messages.get(node[0], 0) + 1
+        if node[0] > depth(self.deepest):
+            self.deepest = node
+        return node
+
+    def rounds(self):
+        """Return the total number of rounds."""
+        return depth(self.deepest)
+
+    def messages_per_round(self):
+        """Return a list with the number of messages in each round."""
+        return [self.messages.get(i, 0) for i in range(1, self.rounds() + 1)]
+
+    def as_dict(self):
+        """Return the analysis as a dictionary.
+
+        The critical path is given as a list of pairs of a label and
+        a number of consecutive rounds, see :func:`summarize_path`.
+        """
+        return {"rounds": self.rounds(),
+                "messages": self.messages_per_round(),
+                "critical_path": summarize_path(critical_path(self.deepest))}
+
+    def report(self):
+        """Print the analysis."""
+        messages = self.messages_per_round()
+        print "Communication rounds: %d" % self.rounds()
+        if messages:
+            print "Messages per round: %d to %d, %.1f on average" % \
+                  (min(messages), max(messages),
+                   sum(messages) / float(len(messages)))
+        print "Critical path:"
+        for label, count in summarize_path(critical_path(self.deepest)):
+            print "  %4d  %s" % (count, label)
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
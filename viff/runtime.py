@@ -35,21 +35,36 @@ import time
 import struct
 from optparse import OptionParser, OptionGroup
 from collections import deque
+from itertools import chain
 import os
 import sys
+import signal
+import multiprocessing
 
 from viff.field import GF256, FieldElement
 from viff.util import wrapper, rand, track_memory_usage, begin, end
-from viff.constants import SHARE
+from viff.constants import SHARE, SHARES, SHARE_BATCH, BINARY_SHARES, \
+    WIDE_FRAMES, PC_DICTIONARY, SHARE_BATCHES
+from viff.wire import share_codec, ProgramCounterEncoder, \
+    ProgramCounterDecoder, encode_varint, decode_varint, encode_pc_delta, \
+    decode_pc_delta
+from viff.statistics import TransferStatistics, SENT, RECEIVED
+from viff.trace import Tracer
+from viff.rounds import RoundAnalyzer, deepest
+from viff.netem import ShapedTransport, link_profiles
 import viff.reactor
 
 from twisted.internet import reactor
 from twisted.internet.task import LoopingCall
-from twisted.internet.error import ConnectionDone, CannotListenError
+from twisted.internet.error import ConnectionDone, ConnectionLost, \
+    CannotListenError
 from twisted.internet.defer import Deferred, DeferredList, gatherResults
 from twisted.internet.defer import maybeDeferred
+from twisted.python.failure import Failure
 from twisted.internet.protocol import ReconnectingClientFactory, ServerFactory
-from twisted.protocols.basic import Int16StringReceiver
+from twisted.protocols.basic import Int16StringReceiver, StringTooLongError
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implements
 
 
 class Share(Deferred):
@@ -66,6 +81,10 @@ class Share(Deferred):
     that runtime.
     """
 
+    #: Node of the last exchange this share depends on when the
+    #: rounds are analyzed, see :mod:`viff.rounds`.
+    _round = None
+
     def __init__(self, runtime, field, value=None):
         """Initialize a share.
 
@@ -86,7 +105,7 @@ class Share(Deferred):
 
         def __init__(self, *a, **kw):
             self.old_init(*a, **kw)
-            self.pc = self.runtime.program_counter[:]
+            self.pc = self.runtime.program_counter
             begin(None, self.label())
 
         def __del__(self):
@@ -169,6 +188,7 @@ class Share(Deferred):
         """
 
         def split_result(result):
+            clone._round = self._round
             clone.callback(result)
             return result
         clone = Share(self.runtime, self.field)
@@ -176,6 +196,14 @@ class Share(Deferred):
         return clone
 
 
+# Helper methods which are left out of the operation names in the
+# round analysis.
+_ROUND_PLUMBING = frozenset(["schedule_callback", "schedule_complex_callback",
+                             "_expect_data", "_expect_data_with_pc",
+                             "_expect_share", "_expect_shares",
+                             "_expect_vector", "_exchange_shares"])
+
+
 class ShareList(Share):
     """Create a share that waits on a number of other shares.
 
@@ -222,6 +250,10 @@ class ShareList(Share):
         Share.__init__(self, shares[0].runtime, shares[0].field)
 
         self.results = [None] * len(shares)
+        # The shares are kept for the round analysis, see viff.rounds.
+        self._round_inputs = None
+        if getattr(self.runtime, "round_analyzer", None) is not None:
+            self._round_inputs = shares
         if threshold is None:
             self.missing_shares = len(shares)
         else:
@@ -236,6 +268,10 @@ class ShareList(Share):
         self.results[index] = (success, result)
         self.missing_shares -= 1
         if not self.called and self.missing_shares == 0:
+            if self._round_inputs is not None:
+                self._round = deepest([getattr(share, "_round", None)
+                                       for share in self._round_inputs])
+                self._round_inputs = None
             self.callback(self.results)
         return result
 
@@ -267,6 +303,179 @@ def gather_shares(shares):
     return share_list
 
 
+class ShareVector(Share):
+    """A vector of shared numbers.
+
+    The vector is a single :class:`Share` whose value is a list of
+    field elements. Arithmetic works elementwise, so ``x = a * b``
+    multiplies the elements of the vectors *a* and *b* pairwise. The
+    other operand can also be a list of constants or a single constant
+    which is used for every element.
+
+    Compared to a list of :class:`Share` objects, a vector uses one
+    :class:`Deferred` for all the elements, and operations which need
+    communication send one message to each player for the whole
+    vector.
+
+    >>> from viff.field import GF256
+    >>> a = ShareVector(None, GF256, size=2)
+    >>> len(a)
+    2
+    >>> a.callback([GF256(1), GF256(2)])
+    >>> share_value(a.sum())
+    [3]
+    """
+
+    def __init__(self, runtime, field, values=None, size=None):
+        """Initialize a share vector.
+
+        If *values* are given, they are passed to :meth:`callback`
+        right away. Otherwise the *size* of the vector must be given.
+        """
+        if size is None:
+            assert values is not None, "Cannot construct vector without a size."
+            size = len(values)
+        #: Number of elements in the vector.
+        self.size = size
+        Share.__init__(self, runtime, field, values)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """Element or slice of the vector.
+
+        An integer index gives a :class:`Share`, a slice gives a new
+        :class:`ShareVector`.
+        """
+        if isinstance(index, slice):
+            result = ShareVector(self.runtime, self.field,
+                                 size=len(xrange(*index.indices(self.size))))
+        else:
+            result = Share(self.runtime, self.field)
+        self.clone().addCallback(lambda values: values[index]).chainDeferred(
+            result)
+        return result
+
+    def clone(self):
+        """Clone a share vector, see :meth:`Share.clone`."""
+
+        def split_result(result):
+            clone._round = self._round
+            clone.callback(result)
+            return result
+        clone = ShareVector(self.runtime, self.field, size=self.size)
+        self.addCallback(split_result)
+        return clone
+
+    def sum(self):
+        """Sum of the elements as a :class:`Share`.
+
+        Communication cost: none.
+        """
+        values = share_value(self)
+        if values is not None:
+            return Share(self.runtime, self.field, sum(values))
+        result = Share(self.runtime, self.field)
+        self.clone().addCallback(sum).chainDeferred(result)
+        return result
+
+
+def share_value(share):
+    """Return the value of *share* if it is already known.
+
+    A share has a known value when it has been called back and all
+    its callbacks have run. :const:`None` is returned for shares which
+    are still waiting for their value:
+
+    >>> from viff.field import GF256
+    >>> a = Share(None, GF256)
+    >>> print share_value(a)
+    None
+    >>> a.callback(GF256(10))
+    >>> share_value(a)
+    [10]
+
+    Local operations use this to compute their result right away
+    instead of waiting on the shares with callbacks.
+    """
+    if share.called and not share.callbacks and not share.paused:
+        result = share.result
+        if not isinstance(result, (Failure, Deferred)):
+            return result
+    return None
+
+
+#: Cache of compiled structs for program counters. Maps the number of
+#: components to a :class:`struct.Struct`.
+_pc_structs = {}
+
+
+def _init_worker():
+    """Restore the default handling of SIGTERM in a worker process.
+
+    The workers are forked from a process running the reactor, whose
+    SIGTERM handler would keep :meth:`multiprocessing.Pool.terminate`
+    from stopping them.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _call_in_worker(func, args):
+    """Call *func* with *args* in a worker process.
+
+    Exceptions cannot be passed back by :class:`multiprocessing.Pool`
+    callbacks, so the result is returned as a pair of a success flag
+    and the result or the exception.
+    """
+    try:
+        return True, func(*args)
+    except Exception, e:
+        return False, e
+
+
+def _pc_struct(size):
+    """Return a :class:`struct.Struct` for a program counter with
+    *size* components."""
+    try:
+        return _pc_structs[size]
+    except KeyError:
+        _pc_structs[size] = result = struct.Struct("!%dI" % size)
+        return result
+
+
+class SendThrottle(object):
+    """Tell a :class:`ShareExchanger` when its transport has too much
+    data waiting to be sent.
+
+    The throttle is registered as a streaming producer with the
+    transport, which pauses it when the send buffer grows beyond
+    ``transport.bufferSize`` bytes and resumes it when the buffer has
+    been written to the network. The protocol itself cannot be used
+    as producer since pausing it would stop reading from the
+    connection.
+    """
+
+    implements(IPushProducer)
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+
+    def pauseProducing(self):
+        protocol = self.protocol
+        protocol.send_paused = True
+        protocol.send_pauses += 1
+        protocol.factory.runtime.throttled.add(protocol)
+
+    def resumeProducing(self):
+        protocol = self.protocol
+        protocol.send_paused = False
+        protocol.factory.runtime.throttled.discard(protocol)
+
+    def stopProducing(self):
+        self.resumeProducing()
+
+
 class ShareExchanger(Int16StringReceiver):
     """Send and receive shares.
 
@@ -275,23 +484,216 @@ class ShareExchanger(Int16StringReceiver):
     receive shares from one other player.
     """
 
+    #: Maximum number of data bytes sent in a single frame by
+    #: :meth:`sendShares`. This leaves room for the header and a long
+    #: program counter within the 64 KiB limit of
+    #: :class:`Int16StringReceiver`.
+    max_payload = 60000
+
+    #: Maximum number of data bytes sent in a single frame when both
+    #: players support frames with 32-bit length prefixes.
+    wide_max_payload = 2**24
+
+    #: Header of each frame, see :meth:`sendData`.
+    header = struct.Struct("!HHB")
+
+    #: Length prefix of each frame. This must match
+    #: :attr:`structFormat`.
+    length_prefix = struct.Struct("!H")
+
+    #: Number of program counter prefixes remembered when program
+    #: counters are compressed, see :meth:`sendData`.
+    pc_dictionary_size = 4096
+
     def __init__(self):
         self.peer_id = None
         self.lost_connection = Deferred()
+        #: Set when we have started closing the connection.
+        self.closing = False
         #: Data expected to be received in the future.
         self.incoming_data = {}
         self.waiting_deferreds = {}
+        #: Wire features used on this connection. These are the
+        #: features announced by both sides in the handshake.
+        self.features = set()
+        #: Whether shares are sent in the binary encoding.
+        self.binary_shares = False
+        #: Whether program counters are compressed.
+        self.compress_pcs = False
+        #: Whether the peer understands batches of shares, see
+        #: :meth:`sendShareBatch`.
+        self.share_batches = False
+        #: Number of connections to the peer, see :attr:`stripes`.
+        self.connections = 1
+        #: All connections to the peer. Frames are distributed over
+        #: the connections by the hash of their program counter, so
+        #: frames with the same program counter stay in order. The
+        #: connections share :attr:`incoming_data` and
+        #: :attr:`waiting_deferreds`.
+        self.stripes = [self]
         #: Statistics
         self.sent_packets = 0
         self.sent_bytes = 0
+        #: Time when the connection was made.
+        self.connect_time = None
+        #: Seconds from the connection was made until the peer was
+        #: identified. This includes the TLS handshake, if any.
+        self.handshake_time = None
+        #: Protocol version and cipher of the TLS connection, recorded
+        #: when the peer is identified. See
+        #: :func:`viff.tls.describe_connection`.
+        self.tls_description = None
+        #: Number of writes to the transport.
+        self.sent_writes = 0
+        #: Whether the send buffer of the transport is full, see
+        #: :class:`SendThrottle`.
+        self.send_paused = False
+        #: Number of times the send buffer became full.
+        self.send_pauses = 0
+        #: The :class:`SendThrottle` registered with the transport.
+        self.throttle = None
+        #: The :class:`~viff.statistics.TransferStatistics` of the
+        #: runtime, if frames are counted.
+        self.statistics = None
+        #: The :class:`~viff.trace.Tracer` of the runtime, if
+        #: tracing is enabled.
+        self.tracer = None
+        #: Whether outgoing frames are coalesced, see :meth:`sendString`.
+        self.coalesce = False
+        self.coalesce_max_bytes = 0
+        self.coalesce_max_frames = 0
+        self._write_buffer = []
+        self._write_buffer_size = 0
+        self._pending_flush = None
+        # Receive buffer and offset of the next frame in it.
+        self._buffer = ""
+        self._offset = 0
+        # Data received after the buffer, and the number of bytes
+        # needed from the offset before the next frame is complete.
+        self._chunks = []
+        self._chunks_size = 0
+        self._needed = 0
+
+    def local_features(self):
+        """Return the set of wire features supported by this player."""
+        features = set()
+        if self.factory.runtime.options.binary_shares:
+            features.add(BINARY_SHARES)
+        if self.factory.runtime.options.wide_frames:
+            features.add(WIDE_FRAMES)
+        if self.factory.runtime.options.pc_compression:
+            features.add(PC_DICTIONARY)
+        # Batches are always understood, the option only controls
+        # whether we send them.
+        features.add(SHARE_BATCHES)
+        return features
+
+    def negotiate(self, peer_features):
+        """Select the wire features used on this connection.
+
+        Only features supported by both players are used.
+        """
+        self.features = self.local_features() & set(peer_features)
+        self.binary_shares = BINARY_SHARES in self.features
+        if WIDE_FRAMES in self.features:
+            # The handshake is always sent with a 16-bit length
+            # prefix. All later frames use a 32-bit length prefix and
+            # a 32-bit data size in the header.
+            self.structFormat = "!I"
+            self.prefixLength = 4
+            self.length_prefix = struct.Struct("!I")
+            self.MAX_LENGTH = self.wide_max_payload + 65536
+            self.max_payload = self.wide_max_payload
+            self.header = struct.Struct("!HIB")
+        self.compress_pcs = PC_DICTIONARY in self.features
+        self.share_batches = SHARE_BATCHES in self.features
+        if self.compress_pcs:
+            self._pc_encoder = ProgramCounterEncoder(self.pc_dictionary_size)
+            self._pc_decoder = ProgramCounterDecoder()
 
     def connectionMade(self):
-        self.sendString(str(self.factory.runtime.id))
+        self.connect_time = time.time()
+        options = self.factory.runtime.options
+        self.statistics = self.factory.runtime.transfer_statistics
+        self.tracer = self.factory.runtime.tracer
+        self.coalesce = options.coalesce_writes
+        self.coalesce_max_bytes = options.coalesce_max_bytes
+        self.coalesce_max_frames = options.coalesce_max_frames
+        if options.send_buffer_limit > 0:
+            if hasattr(self.transport, "bufferSize"):
+                self.transport.bufferSize = options.send_buffer_limit
+            self.throttle = SendThrottle(self)
+            self.transport.registerProducer(self.throttle, True)
+        # The handshake consists of our player ID followed by the wire
+        # features we support, separated by spaces.
+        hello = [str(self.factory.runtime.id)] + sorted(self.local_features())
+        if options.connections > 1:
+            hello.append("connections=%d" % options.connections)
+        self.sendString(" ".join(hello))
 
     def connectionLost(self, reason):
-        reason.trap(ConnectionDone)
+        self._cancel_flush()
+        if self.closing:
+            # Both players close the connection at the same time on
+            # shutdown, which Unix domain sockets may report as an
+            # unclean close.
+            reason.trap(ConnectionDone, ConnectionLost)
+        else:
+            reason.trap(ConnectionDone)
         self.lost_connection.callback(self)
 
+    def dataReceived(self, data):
+        """Split the incoming data into frames.
+
+        This works like :meth:`Int16StringReceiver.dataReceived`, but
+        it can be re-entered from :meth:`frameReceived` (which happens
+        when the VIFF reactor is used) and it picks up changes to the
+        length prefix made during the handshake.
+
+        Frames are parsed in place in the receive buffer. Data for a
+        frame which is not yet complete is collected in a list and
+        only joined once the frame can be processed.
+        """
+        self._chunks.append(data)
+        self._chunks_size += len(data)
+        if len(self._buffer) - self._offset + self._chunks_size < self._needed:
+            return
+        while not self.paused:
+            if self._chunks:
+                rest = self._buffer[self._offset:]
+                if not rest and len(self._chunks) == 1:
+                    self._buffer = self._chunks[0]
+                else:
+                    self._buffer = "".join([rest] + self._chunks)
+                self._offset = 0
+                self._chunks = []
+                self._chunks_size = 0
+            buffer = self._buffer
+            offset = self._offset
+            start = offset + self.prefixLength
+            if len(buffer) < start:
+                self._needed = self.prefixLength
+                break
+            length, = self.length_prefix.unpack_from(buffer, offset)
+            if length > self.MAX_LENGTH:
+                self.lengthLimitExceeded(length)
+                return
+            end = start + length
+            if len(buffer) < end:
+                self._needed = end - offset
+                break
+            # Consume the frame before handing it on, a nested call
+            # will then continue after it.
+            self._needed = 0
+            self._offset = end
+            if self.peer_id is None:
+                self.stringReceived(buffer[start:end])
+            else:
+                self.frameReceived(buffer, start, end)
+        if self._offset:
+            self._buffer = self._buffer[self._offset:]
+            self._offset = 0
+
     def stringReceived(self, string):
         """Called when a share is received.
 
@@ -299,12 +701,21 @@ class ShareExchanger(Int16StringReceiver):
         a data part. The data is passed the appropriate Deferred in
         :class:`self.incoming_data`.
         """
-        # needed to make VIFF reactor work with later versions of Twisted
-        if 'recvd' not in self.__dict__:
-            self._unprocessed = self._unprocessed[self._compatibilityOffset:]
         if self.peer_id is None:
             # TODO: Handle ValueError if the string cannot be decoded.
-            self.peer_id = int(string)
+            hello = string.split()
+            self.peer_id = int(hello[0])
+            if self.connect_time is not None:
+                self.handshake_time = time.time() - self.connect_time
+            self.negotiate(hello[1:])
+            # The player with the lowest ID opens the connections and
+            # decides how many there are.
+            if self.factory.runtime.id < self.peer_id:
+                self.connections = self.factory.runtime.options.connections
+            else:
+                for parameter in hello[1:]:
+                    if parameter.startswith("connections="):
+                        self.connections = int(parameter[12:])
             try:
                 cert = self.transport.getPeerCertificate()
             except AttributeError:
@@ -317,31 +728,100 @@ class ShareExchanger(Int16StringReceiver):
                     print "Peer %s claims to be %d, aborting!" \
                         % (cert.get_subject(), self.peer_id)
                     self.transport.loseConnection()
+                # The connection details are gone when the connection
+                # is closed, so they are recorded now.
+                from viff.tls import describe_connection
+                self.tls_description = describe_connection(self.transport)
+            profiles = self.factory.runtime.link_profiles
+            profile = profiles.get(self.peer_id, profiles.get(None))
+            if profile is not None:
+                self.transport = ShapedTransport(self.transport, profile)
             self.factory.identify_peer(self)
         else:
-            try:
-                pc_size, data_size, data_type = struct.unpack("!HHB", string[:5])
-                fmt = "!%dI%ds" % (pc_size, data_size)
-                unpacked = struct.unpack(fmt, string[5:])
+            self.frameReceived(string, 0, len(string))
+
+    def frameReceived(self, buffer, start, end):
+        """Called when a frame is found in *buffer* between *start*
+        and *end*.
+
+        The header and program counter are unpacked directly from the
+        receive buffer using cached :class:`struct.Struct` objects,
+        so the only copy made is of the data itself.
+        """
+        try:
+            if self.compress_pcs:
+                data_type = ord(buffer[start])
+                program_counter, offset = \
+                    self._pc_decoder.decode(buffer, start + 1)
+            else:
+                pc_size, data_size, data_type = \
+                    self.header.unpack_from(buffer, start)
+                offset = start + self.header.size
+                program_counter = \
+                    _pc_struct(pc_size).unpack_from(buffer, offset)
+                offset += 4 * pc_size
+                if end - offset != data_size:
+                    raise struct.error("expected %d bytes of data, got %d"
+                                       % (data_size, end - offset))
+            data = buffer[offset:end]
+        except (struct.error, ValueError, IndexError), e:
+            self.factory.runtime.abort(self, e)
+            return
 
-                program_counter = unpacked[:pc_size]
-                data = unpacked[-1]
+        if self.statistics is not None:
+            self.statistics.record(RECEIVED, self.peer_id, data_type,
+                                   program_counter, end - start)
+        if self.tracer is not None:
+            self.tracer.receive(self.peer_id, data_type, program_counter,
+                                end - start)
 
-                key = (program_counter, data_type)
+        if data_type == SHARE_BATCH:
+            self.batchReceived(data)
+        else:
+            self.deliver(program_counter, data_type, data)
 
-                if key in self.waiting_deferreds:
-                    deq = self.waiting_deferreds[key]
-                    deferred = deq.popleft()
-                    if not deq:
-                        del self.waiting_deferreds[key]
-                    self.factory.runtime.handle_deferred_data(deferred, data)
-                else:
-                    deq = self.incoming_data.setdefault(key, deque())
-                    deq.append(data)
-            except struct.error, e:
-                self.factory.runtime.abort(self, e)
-        if 'recvd' not in self.__dict__:
-            self.recvd = self._unprocessed
+    def batchReceived(self, data):
+        """Split a batch of shares made by :meth:`sendShareBatch`.
+
+        Each share is delivered as if it had arrived in a frame of
+        its own.
+        """
+        entries = []
+        try:
+            offset = 0
+            program_counter = ()
+            while offset < len(data):
+                program_counter, offset = \
+                    decode_pc_delta(data, offset, program_counter)
+                share_size, offset = decode_varint(data, offset)
+                if offset + share_size > len(data):
+                    raise ValueError("truncated share in batch")
+                entries.append((program_counter,
+                                data[offset:offset + share_size]))
+                offset += share_size
+        except ValueError, e:
+            self.factory.runtime.abort(self, e)
+            return
+
+        for program_counter, share in entries:
+            self.deliver(program_counter, SHARE, share)
+
+    def deliver(self, program_counter, data_type, data):
+        """Pass *data* to the Deferred waiting for it, or store it in
+        :attr:`incoming_data` until somebody asks for it."""
+        key = (program_counter, data_type)
+
+        if key in self.waiting_deferreds:
+            deq = self.waiting_deferreds[key]
+            deferred = deq.popleft()
+            if not deq:
+                del self.waiting_deferreds[key]
+            if self.tracer is not None:
+                self.tracer.wait_end(self.peer_id, program_counter, data_type)
+            self.factory.runtime.handle_deferred_data(deferred, data)
+        else:
+            deq = self.incoming_data.setdefault(key, deque())
+            deq.append(data)
 
     def sendData(self, program_counter, data_type, data):
         """Send data to the peer.
@@ -357,28 +837,169 @@ class ShareExchanger(Int16StringReceiver):
             2 bytes   2 bytes      1 byte     varies      varies
 
         The program counter takes up ``4 * pc_size`` bytes, the data
-        takes up ``data_size`` bytes.
+        takes up ``data_size`` bytes. If both players support frames
+        with 32-bit length prefixes, the *data_size* field takes up 4
+        bytes instead of 2.
+
+        If both players support program counter compression, the
+        frame instead consists of the data type, the program counter
+        encoded by a :class:`~viff.wire.ProgramCounterEncoder`, and
+        the data, which extends to the end of the frame::
+
+          +-----------+------------+--------------+
+          | data_type |     pc     |     data     |
+          +-----------+------------+--------------+
+             1 byte      varies         varies
+
+        The encoded program counter usually takes up two bytes.
+
+        If there are several connections to the peer, the frame is
+        sent on the one selected by the hash of the program counter,
+        see :attr:`stripes`.
+        """
+        protocol = self
+        if len(self.stripes) > 1:
+            protocol = self.stripes[hash(program_counter) % len(self.stripes)]
+        if protocol.compress_pcs:
+            packet = chr(data_type) + \
+                protocol._pc_encoder.encode(program_counter) + data
+        else:
+            pc_size = len(program_counter)
+            packet = protocol.header.pack(pc_size, len(data), data_type) + \
+                _pc_struct(pc_size).pack(*program_counter) + data
+        protocol.sendString(packet)
+        protocol.sent_packets += 1
+        protocol.sent_bytes += len(packet)
+        if protocol.statistics is not None:
+            protocol.statistics.record(SENT, self.peer_id, data_type,
+                                       program_counter, len(packet))
+        if protocol.tracer is not None:
+            protocol.tracer.send(self.peer_id, data_type, program_counter,
+                                 len(packet))
+
+    def sendString(self, string):
+        """Send a length-prefixed string to the peer.
+
+        If coalescing is enabled, the framed string is buffered and
+        all frames sent during one reactor iteration are written to
+        the transport in one go by :meth:`flush`. The frames are
+        self-delimiting, so the peer splits them as usual. The buffer
+        is flushed early if it holds :attr:`coalesce_max_bytes` bytes
+        or :attr:`coalesce_max_frames` frames.
         """
-        pc_size = len(program_counter)
-        data_size = len(data)
-        fmt = "!HHB%dI%ds" % (pc_size, data_size)
-        t = (pc_size, data_size, data_type) + program_counter + (data,)
-        packet = struct.pack(fmt, *t)
-        self.sendString(packet)
-        self.sent_packets += 1
-        self.sent_bytes += len(packet)
+        if not self.coalesce:
+            Int16StringReceiver.sendString(self, string)
+            self.sent_writes += 1
+            return
+
+        if len(string) >= 2 ** (8 * self.prefixLength):
+            raise StringTooLongError("Cannot send %d bytes in one frame"
+                                     % len(string))
+        frame = struct.pack(self.structFormat, len(string)) + string
+        self._write_buffer.append(frame)
+        self._write_buffer_size += len(frame)
+        if self._write_buffer_size >= self.coalesce_max_bytes or \
+                len(self._write_buffer) >= self.coalesce_max_frames:
+            self.flush()
+        elif self._pending_flush is None:
+            self._pending_flush = reactor.callLater(0, self.flush)
+
+    def flush(self):
+        """Write all buffered frames to the transport."""
+        self._cancel_flush()
+        if self._write_buffer:
+            self.transport.write("".join(self._write_buffer))
+            self.sent_writes += 1
+            self._write_buffer = []
+            self._write_buffer_size = 0
+
+    def _cancel_flush(self):
+        if self._pending_flush is not None:
+            if self._pending_flush.active():
+                self._pending_flush.cancel()
+            self._pending_flush = None
 
     def sendShare(self, program_counter, share):
         """Send a share.
 
         The program counter and the share are converted to bytes and
-        sent to the peer.
+        sent to the peer. The share is encoded using the binary
+        encoding if both players support it, see :mod:`viff.wire`.
         """
-        self.sendData(program_counter, SHARE, hex(share.value))
+        codec = share_codec(share.field, self.binary_shares)
+        self.sendData(program_counter, SHARE, codec.encode(share))
+
+    def shares_per_frame(self, codec):
+        """Return the number of shares encoded with *codec* which
+        :meth:`sendShares` puts in a single frame."""
+        return max(1, self.max_payload // codec.max_size)
+
+    def sendShares(self, program_counter, shares):
+        """Send a list of shares.
+
+        The shares must all belong to the same field. They are packed
+        into as few frames as possible, see :meth:`shares_per_frame`.
+        The shares are received with :meth:`Runtime._expect_shares`.
+        """
+        codec = share_codec(shares[0].field, self.binary_shares)
+        size = self.shares_per_frame(codec)
+        for i in xrange(0, len(shares), size):
+            self.sendData(program_counter, SHARES,
+                          codec.encode_list(shares[i:i + size]))
+
+    def sendShareBatch(self, shares):
+        """Send a list of ``(program counter, share)`` pairs.
+
+        The shares are packed into as few frames as possible. Each
+        entry in a frame holds the program counter, encoded relative
+        to the one of the previous entry in the frame by
+        :func:`~viff.wire.encode_pc_delta`, the size of the encoded
+        share as a varint, and the share::
+
+          +--------+------------+--------------+
+          |   pc   | share_size |    share     |
+          +--------+------------+--------------+
+            varies    varies        varies
+
+        The shares are usually sorted by program counter, so most
+        program counters take up three bytes.
+
+        The receiver delivers every share as if it had been sent with
+        :meth:`sendShare`, so it is received with
+        :meth:`Runtime._expect_share` as usual.
+        """
+        entries = []
+        size = 0
+        previous = ()
+        for program_counter, share in shares:
+            data = share_codec(share.field, self.binary_shares).encode(share)
+            data = encode_varint(len(data)) + data
+            entry = encode_pc_delta(program_counter, previous) + data
+            if entries and size + len(entry) > self.max_payload:
+                self.sendData(shares[0][0], SHARE_BATCH, "".join(entries))
+                entries = []
+                size = 0
+                # Each frame is decoded on its own.
+                entry = encode_pc_delta(program_counter, ()) + data
+            entries.append(entry)
+            size += len(entry)
+            previous = program_counter
+        if entries:
+            self.sendData(shares[0][0], SHARE_BATCH, "".join(entries))
 
     def loseConnection(self):
-        """Disconnect this protocol instance."""
-        self.transport.loseConnection()
+        """Disconnect this protocol instance and the other connections
+        to the peer."""
+        for protocol in self.stripes:
+            protocol.closing = True
+            if protocol.throttle is not None:
+                # A TLS transport is not closed while it has a
+                # producer.
+                protocol.transport.unregisterProducer()
+                protocol.throttle.stopProducing()
+                protocol.throttle = None
+            protocol.flush()
+            protocol.transport.loseConnection()
 
 class SelfShareExchanger(ShareExchanger):
 
@@ -386,6 +1007,7 @@ class SelfShareExchanger(ShareExchanger):
         ShareExchanger.__init__(self)
         self.peer_id = id
         self.factory = factory
+        self.negotiate(self.local_features())
 
     def stringReceived(self, program_counter, data_type, data):
         """Called when a share is received.
@@ -444,8 +1066,11 @@ class ShareExchangerFactory(ReconnectingClientFactory, ServerFactory):
     """Factory for creating ShareExchanger protocols."""
 
     protocol = ShareExchanger
-    maxDelay = 3
-    factor = 1.234567 # About half of the Twisted default
+    # Players are usually started at about the same time, so failed
+    # connections are retried quickly at first.
+    initialDelay = 0.05
+    maxDelay = 1
+    factor = 1.5
 
     def __init__(self, runtime, players, protocols_ready):
         """Initialize the factory."""
@@ -453,15 +1078,109 @@ class ShareExchangerFactory(ReconnectingClientFactory, ServerFactory):
         self.players = players
         self.needed_protocols = len(players) - 1
         self.protocols_ready = protocols_ready
+        # Maps peer IDs to the connections identified so far.
+        self.stripes = {}
+        # Maps connectors to the delay before their next retry, the
+        # number of retries so far, and the pending retry.
+        self.retry_delays = {}
+        self.retry_counts = {}
+        self.retry_calls = {}
+        # The pending attempt to listen, see start_listening.
+        self.listen_call = None
+        self.start_time = time.time()
+
+    def clientConnectionFailed(self, connector, reason):
+        """Retry the failed connection attempt later.
+
+        Each connection has its own exponential back-off and retry
+        count, so a peer which is slow to start does not delay the
+        connections to the other peers. Nothing is retried after
+        :meth:`stopTrying` or after :attr:`maxRetries` retries of the
+        connection.
+        """
+        if not self.continueTrying:
+            return
+        retries = self.retry_counts.get(connector, 0) + 1
+        if self.maxRetries is not None and retries > self.maxRetries:
+            return
+        self.retry_counts[connector] = retries
+        delay = self.retry_delays.get(connector, self.initialDelay)
+        self.retry_delays[connector] = min(delay * self.factor, self.maxDelay)
+
+        def reconnect():
+            del self.retry_calls[connector]
+            connector.connect()
+        clock = self.clock or reactor
+        self.retry_calls[connector] = clock.callLater(delay, reconnect)
+
+    def stopTrying(self):
+        """Stop retrying connections and cancel the pending retries."""
+        for call in self.retry_calls.values():
+            call.cancel()
+        self.retry_calls.clear()
+        if self.listen_call is not None:
+            self.listen_call.cancel()
+            self.listen_call = None
+        ReconnectingClientFactory.stopTrying(self)
+
+    def start_listening(self, listen, address, delay=0.5, retry=False):
+        """Start listening for the other players by calling *listen*.
+
+        The port is stored in the :attr:`port` of the runtime. If the
+        port is in use, we keep trying to listen, but with an
+        exponentially increasing delay between each attempt. The
+        attempts are scheduled with the reactor, so the connections to
+        the other players are made in the meantime. Nothing is retried
+        after :meth:`stopTrying`.
+
+        With the ``--no-socket-retry`` option, a first failed attempt
+        raises the :exc:`CannotListenError`. A failed retry passes it
+        to the errback of the Deferred for the protocols instead, since
+        the reactor would only log it.
+        """
+        self.listen_call = None
+        try:
+            self.runtime.port = listen()
+        except CannotListenError, e:
+            if self.runtime.options.no_socket_retry:
+                if not retry:
+                    raise
+                if not self.protocols_ready.called:
+                    self.protocols_ready.errback(e)
+                return
+            if not self.continueTrying:
+                return
+            delay *= 1 + rand.random()
+            print "Error listening on %s: %s" % (address, e)
+            print "Will try again in %.1f seconds" % delay
+            clock = self.clock or reactor
+            self.listen_call = clock.callLater(delay, self.start_listening,
+                                               listen, address, delay, True)
+        else:
+            print "Listening on %s" % address
 
     def identify_peer(self, protocol):
+        if protocol.peer_id not in self.runtime.connect_latency:
+            self.runtime.connect_latency[protocol.peer_id] = \
+                time.time() - self.start_time
+        stripes = self.stripes.setdefault(protocol.peer_id, [])
+        if stripes:
+            # All connections to a peer deliver into the same queues.
+            protocol.incoming_data = stripes[0].incoming_data
+            protocol.waiting_deferreds = stripes[0].waiting_deferreds
+        stripes.append(protocol)
+        if len(stripes) < protocol.connections:
+            return
+        protocol = stripes[0]
+        protocol.stripes = stripes
         self.runtime.add_player(self.players[protocol.peer_id], protocol)
         self.needed_protocols -= 1
         if self.needed_protocols == 0:
             self.protocols_ready.callback(self.runtime)
 
     def clientConnectionLost(self, connector, reason):
-        reason.trap(ConnectionDone)
+        # Unclean closes are reported by the protocol.
+        reason.trap(ConnectionDone, ConnectionLost)
 
 
 def preprocess(generator):
@@ -484,7 +1203,7 @@ def preprocess(generator):
         @wrapper(method)
         def preprocess_wrapper(self, *args, **kwargs):
             self.increment_pc()
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             try:
                 return self._pool.pop(pc), True
             except KeyError:
@@ -508,6 +1227,11 @@ class Runtime:
     as the program counter, the list of other players, etc.
     """
 
+    #: Number of batched shares which are sent even when the deferred
+    #: queue is processed in a nested reactor iteration, see
+    #: :meth:`flush_batch`.
+    batch_limit = 4096
+
     @staticmethod
     def add_options(parser):
         group = OptionGroup(parser, "VIFF Runtime Options")
@@ -524,14 +1248,85 @@ class Runtime:
         group.add_option("--ssl", action="store_true",
                          help=("Enable the use of secure SSL connections "
                                "(if the OpenSSL bindings are available)."))
+        group.add_option("--ssl-cert", metavar="FILE",
+                         help="Certificate used for SSL. A %d is replaced "
+                         "by the player ID (default: %default).")
+        group.add_option("--ssl-key", metavar="FILE",
+                         help="Private key used for SSL. A %d is replaced "
+                         "by the player ID (default: %default).")
+        group.add_option("--ssl-ca", metavar="FILE",
+                         help="CA certificate used to verify the other "
+                         "players (default: %default).")
         group.add_option("--deferred-debug", action="store_true",
                          help="Enable extra debug output for deferreds.")
         group.add_option("--profile", action="store_true",
                          help="Collect and print profiling information.")
         group.add_option("--track-memory", action="store_true",
                          help="Track memory usage over time.")
+        group.add_option("--recursive-reactor", action="store_true",
+                         help="Process received data in nested reactor "
+                         "iterations. This needs a high recursion limit.")
+        group.add_option("--worker-processes", type="int", metavar="N",
+                         help="Do heavy local computations, such as "
+                         "Paillier encryptions, in N worker processes. "
+                         "Use 0 to do them in the main process "
+                         "(default: %default).")
+        group.add_option("--no-eager", action="store_false", dest="eager",
+                         help="Always wait on shares with callbacks in local "
+                         "operations, even when their values are known.")
         group.add_option("--statistics", action="store_true",
                          help="Print statistics on shutdown.")
+        group.add_option("--statistics-file", metavar="FILE",
+                         help="Write statistics on the transferred data "
+                         "to FILE as JSON on shutdown.")
+        group.add_option("--trace", metavar="FILE",
+                         help="Record a trace of the execution and write "
+                         "it to FILE in the Chrome trace event format on "
+                         "shutdown. A %d is replaced by the player ID.")
+        group.add_option("--trace-buffer", type="int", metavar="N",
+                         help="Keep the last N events of the trace "
+                         "(default: %default).")
+        group.add_option("--analyze-rounds", action="store_true",
+                         help="Count the communication rounds and print "
+                         "the critical path on shutdown.")
+        group.add_option("--no-binary-shares", action="store_false",
+                         dest="binary_shares",
+                         help="Send shares as hexadecimal strings instead "
+                         "of using the compact binary encoding.")
+        group.add_option("--no-wide-frames", action="store_false",
+                         dest="wide_frames",
+                         help="Limit messages to 64 KiB by using 16-bit "
+                         "length prefixes.")
+        group.add_option("--no-pc-compression", action="store_false",
+                         dest="pc_compression",
+                         help="Send full program counters with every "
+                         "message instead of compressing them.")
+        group.add_option("--coalesce-writes", action="store_true",
+                         help="Buffer outgoing messages and write them to "
+                         "the network once per reactor iteration.")
+        group.add_option("--coalesce-max-bytes", type="int", metavar="BYTES",
+                         help="Write buffered messages when this many bytes "
+                         "are buffered (default: %default).")
+        group.add_option("--coalesce-max-frames", type="int", metavar="N",
+                         help="Write buffered messages when this many "
+                         "messages are buffered (default: %default).")
+        group.add_option("--batch-shares", action="store_true",
+                         help="Collect the shares sent by multiplications "
+                         "and openings during one reactor iteration and "
+                         "send them to each player in a single message.")
+        group.add_option("--send-buffer-limit", type="int", metavar="BYTES",
+                         help="Wait for the network when more than BYTES "
+                         "bytes are waiting to be sent to a player. This "
+                         "only has an effect with the VIFF reactor. Use 0 "
+                         "for no limit (default: %default).")
+        group.add_option("--emulate-network", action="append",
+                         metavar="SPEC", help="Delay the data sent to the "
+                         "other players to emulate a slower network. SPEC "
+                         "is a comma separated list of rtt=MS, "
+                         "bandwidth=MBIT, jitter=MS, batch=MS, and "
+                         "optionally peer=ID to describe only the link to "
+                         "that player. You can use this option multiple "
+                         "times.")
         group.add_option("--no-socket-retry", action="store_true",
                          default=False, help="Fail rather than keep retrying "
                          "to connect if port is already in use.")
@@ -541,6 +1336,15 @@ class Runtime:
                          "multiple times on the command line; the first will "
                          "override host and port of player 1, the second that "
                          "of player 2, and so forth.")
+        group.add_option("--connections", type="int", metavar="K",
+                         help="Open K connections to each player and "
+                         "distribute the messages over them. The player "
+                         "with the lowest ID decides the number of "
+                         "connections (default: %default).")
+        group.add_option("--unix-socket-dir", metavar="DIR",
+                         help="Connect to the players through Unix domain "
+                         "sockets in DIR instead of TCP. This only works "
+                         "when all players run on the same host.")
         group.add_option("--computation-id", type="int", metavar="ID",
                          help="Set the (positive, integer) ID for this "
                          "computation. All IDs for runs using the same set "
@@ -558,10 +1362,31 @@ class Runtime:
         parser.set_defaults(bit_length=32,
                             security_parameter=30,
                             ssl=have_openssl,
+                            ssl_cert="player-%d.cert",
+                            ssl_key="player-%d.key",
+                            ssl_ca="ca.cert",
                             deferred_debug=False,
                             profile=False,
                             track_memory=False,
+                            recursive_reactor=False,
+                            worker_processes=0,
+                            eager=True,
                             statistics=False,
+                            statistics_file=None,
+                            trace=None,
+                            trace_buffer=100000,
+                            analyze_rounds=False,
+                            binary_shares=True,
+                            wide_frames=True,
+                            pc_compression=True,
+                            coalesce_writes=False,
+                            coalesce_max_bytes=16384,
+                            coalesce_max_frames=256,
+                            batch_shares=False,
+                            send_buffer_limit=2**20,
+                            emulate_network=None,
+                            connections=1,
+                            unix_socket_dir=None,
                             computation_id=None)
 
     def __init__(self, player, threshold, options=None):
@@ -596,12 +1421,16 @@ class Runtime:
         self._needed_data = {}
 
         #: Current program counter.
+        #:
+        #: The program counter is an immutable tuple which is replaced
+        #: as it changes. It can therefore be saved and used directly
+        #: as a dictionary key without copying it.
         __comp_id = self.options.computation_id
         if __comp_id is None:
             __comp_id = 0
         else:
             assert __comp_id > 0, "Non-positive ID: %d." % __comp_id
-        self.program_counter = [__comp_id, 0]
+        self.program_counter = (__comp_id, 0)
 
         #: Connections to the other players.
         #:
@@ -609,6 +1438,43 @@ class Runtime:
         #: objects.
         self.protocols = {}
 
+        #: Time in seconds from the start of the bootstrap until the
+        #: connection to each player was ready.
+        #:
+        #: Mapping from Player ID to seconds.
+        self.connect_latency = {}
+
+        #: Counters for the data sent to and received from each
+        #: player, see :mod:`viff.statistics`. This is :const:`None`
+        #: unless the ``--statistics`` or ``--statistics-file``
+        #: option is given.
+        self.transfer_statistics = None
+        if self.options.statistics or self.options.statistics_file:
+            self.transfer_statistics = TransferStatistics()
+
+        #: Trace of the execution, see :mod:`viff.trace`. This is
+        #: :const:`None` unless the ``--trace`` option is given.
+        self.tracer = None
+        if self.options.trace:
+            self.tracer = Tracer(self.id, self.options.trace_buffer)
+
+        #: Analysis of the communication rounds, see
+        #: :mod:`viff.rounds`. This is :const:`None` unless the
+        #: ``--analyze-rounds`` option is given.
+        self.round_analyzer = None
+        if self.options.analyze_rounds:
+            self.round_analyzer = RoundAnalyzer()
+        # The round of the data available to the running callback and
+        # the name of the operation which scheduled it.
+        self._round_context = None
+        self._round_label = None
+
+        #: Emulated links to the other players, see :mod:`viff.netem`.
+        #:
+        #: Mapping from Player ID, or :const:`None` for all other
+        #: players, to :class:`~viff.netem.LinkProfile` objects.
+        self.link_profiles = link_profiles(self.options.emulate_network or [])
+
         #: Number of known players.
         #:
         #: Equal to ``len(self.players)``, but storing it here is more
@@ -636,7 +1502,33 @@ class Runtime:
         #: Recursion depth limit by experiment, including security margin.
         self.depth_limit = int(sys.getrecursionlimit() / 50)
         #: Use deferred queues only if the ViffReactor is running.
-        self.using_viff_reactor = isinstance(reactor, viff.reactor.ViffReactor)
+        self.using_viff_reactor = isinstance(reactor,
+                                             viff.reactor.ViffReactorMixin)
+        if self.using_viff_reactor:
+            reactor.reentrant = self.options.recursive_reactor
+        #: Number of calls of :meth:`process_deferred_queue`.
+        self.scheduler_passes = 0
+        #: Number of callbacks run from the queues.
+        self.processed_callbacks = 0
+        #: Longest queue of callbacks seen.
+        self.max_queue_length = 0
+        #: Connections with a full send buffer, see :class:`SendThrottle`.
+        self.throttled = set()
+        #: Compute local operations right away when the values of the
+        #: shares are known, see :func:`share_value`.
+        self.eager = self.options.eager
+        #: Collect outgoing shares in batches, see :meth:`_send_share`.
+        self.batch_shares = self.options.batch_shares
+        self._share_batches = {}
+        #: Number of shares waiting for :meth:`flush_batch`.
+        self.batched_shares = 0
+        self._pending_batch = None
+        #: Pool of worker processes used by :meth:`run_in_worker`.
+        self.worker_pool = None
+        if self.options.worker_processes > 0:
+            self.worker_pool = \
+                multiprocessing.Pool(self.options.worker_processes,
+                                     _init_worker)
 
     def add_player(self, player, protocol):
         self.players[player.id] = player
@@ -653,10 +1545,14 @@ class Runtime:
 
         def close_connections(_):
             print "done."
+            self.stop_workers()
             print "Closing connections...",
-            results = [maybeDeferred(self.port.stopListening)]
+            results = []
+            if self.port is not None:
+                results.append(maybeDeferred(self.port.stopListening))
             for protocol in self.protocols.itervalues():
-                results.append(protocol.lost_connection)
+                for stripe in protocol.stripes:
+                    results.append(stripe.lost_connection)
                 protocol.loseConnection()
             return DeferredList(results)
 
@@ -671,6 +1567,12 @@ class Runtime:
         sync.addCallback(stop_reactor)
         return sync
 
+    def stop_workers(self):
+        """Stop the worker processes used by :meth:`run_in_worker`."""
+        if self.worker_pool is not None:
+            self.worker_pool.terminate()
+            self.worker_pool = None
+
     def abort(self, protocol, exc):
         """Abort the execution due to an exception.
 
@@ -681,6 +1583,7 @@ class Runtime:
         print "*** aborting!"
         for p in self.protocols.itervalues():
             p.loseConnection()
+        self.stop_workers()
         reactor.stop()
         print "*** all protocols disconnected"
 
@@ -694,15 +1597,16 @@ class Runtime:
 
     def increment_pc(self):
         """Increment the program counter."""
-        self.program_counter[-1] += 1
+        pc = self.program_counter
+        self.program_counter = pc[:-1] + (pc[-1] + 1,)
 
     def fork_pc(self):
         """Fork the program counter."""
-        self.program_counter.append(0)
+        self.program_counter += (0,)
 
     def unfork_pc(self):
         """Leave a fork of the program counter."""
-        self.program_counter.pop()
+        self.program_counter = self.program_counter[:-1]
 
     def schedule_callback(self, deferred, func, *args, **kwargs):
         """Schedule a callback on a deferred with the correct program
@@ -718,21 +1622,78 @@ class Runtime:
         :meth:`addCallback`.
         """
         self.increment_pc()
-        saved_pc = self.program_counter[:]
+        # The callback runs in a fork of the current program counter.
+        forked_pc = self.program_counter + (0,)
+        if self.round_analyzer is not None:
+            func = self._track_rounds(deferred, func, sys._getframe(1))
 
         @wrapper(func)
         def callback_wrapper(*args, **kwargs):
             """Wrapper for a callback which ensures a correct PC."""
+            current_pc = self.program_counter
+            self.program_counter = forked_pc
             try:
-                current_pc = self.program_counter[:]
-                self.program_counter[:] = saved_pc
-                self.fork_pc()
                 return func(*args, **kwargs)
             finally:
-                self.program_counter[:] = current_pc
+                self.program_counter = current_pc
 
         return deferred.addCallback(callback_wrapper, *args, **kwargs)
 
+    def _operation_label(self, frame):
+        """Return the names of the methods of this runtime found on
+        the stack from *frame* and out to the running callback.
+
+        The names are joined with ``>``, outermost first, and
+        recursive calls are only named once. This is used by the
+        round analysis, see :mod:`viff.rounds`.
+        """
+        names = []
+        while frame is not None:
+            name = frame.f_code.co_name
+            if name == "track_rounds":
+                break
+            code = frame.f_code
+            if code.co_argcount and code.co_varnames[0] == "self" \
+                    and name not in _ROUND_PLUMBING \
+                    and frame.f_locals["self"] is self \
+                    and (not names or names[-1] != name):
+                names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return ">".join(names)
+
+    def _track_rounds(self, deferred, func, frame):
+        """Wrap *func*, a callback on *deferred*, so that it runs
+        in the round of the data it depends on.
+
+        The round is the latest of the round of *deferred* and the
+        round of the code scheduling the callback. The result of the
+        callback gets the same round, or the round of the
+        :class:`Deferred` it returns.
+        """
+        label = self._operation_label(frame) or self._round_label
+        context = self._round_context
+
+        def track_rounds(*args, **kwargs):
+            current = self._round_context, self._round_label
+            data_round = deepest([getattr(deferred, "_round", None), context])
+            self._round_context, self._round_label = data_round, label
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self._round_context, self._round_label = current
+
+            if isinstance(result, Deferred):
+                def propagate(value):
+                    deferred._round = deepest([getattr(result, "_round",
+                                                       None), data_round])
+                    return value
+                result.addBoth(propagate)
+            else:
+                deferred._round = data_round
+            return result
+        return track_rounds
+
     def schedule_complex_callback(self, deferred, func, *args, **kwargs):
         """Schedule a complex callback, i.e. a callback which blocks a
         long time.
@@ -755,6 +1716,46 @@ class Runtime:
         deferred.addCallback(queue_callback, self, fork)
         return self.schedule_callback(fork, func, *args, **kwargs)
 
+    def run_in_worker(self, func, *args):
+        """Compute ``func(*args)`` in a worker process.
+
+        Returns a :class:`Deferred` which will yield the result. The
+        function and its arguments are pickled, so *func* must be a
+        module level function without side effects, and it cannot use
+        the runtime. Without the ``--worker-processes`` option the
+        function is called right away.
+
+        The computation is purely local, so the program counter is not
+        changed. Callbacks which depend on it must be added using
+        :meth:`schedule_callback` as usual::
+
+            result = self.run_in_worker(fast_pows, bases, exps, n)
+            self.schedule_callback(result, send_values)
+
+        Exceptions raised by *func* are passed to the errback of the
+        deferred. But if the worker process dies, or if the result or
+        the exception cannot be pickled, the pool never reports back
+        and the deferred will stay pending forever.
+        """
+        if self.worker_pool is None:
+            return maybeDeferred(func, *args)
+
+        result = Deferred()
+
+        def done((success, value)):
+            if success:
+                self.handle_deferred_data(result, value)
+            else:
+                result.errback(value)
+
+        def returned(outcome):
+            # This is called in a thread of the pool.
+            reactor.callFromThread(done, outcome)
+
+        self.worker_pool.apply_async(_call_in_worker, (func, args),
+                                     callback=returned)
+        return result
+
     def synchronize(self):
         """Introduce a synchronization point.
 
@@ -771,12 +1772,17 @@ class Runtime:
         return result
 
     def _expect_data(self, peer_id, data_type, deferred):
-        # Convert self.program_counter to a hashable value in order to
-        # use it as a key in self.protocols[peer_id].incoming_data.
-        pc = tuple(self.program_counter)
-        return self._expect_data_with_pc(pc, peer_id, data_type, deferred)
+        return self._expect_data_with_pc(self.program_counter, peer_id,
+                                         data_type, deferred)
 
     def _expect_data_with_pc(self, pc, peer_id, data_type, deferred):
+        if self.round_analyzer is not None:
+            label = self._operation_label(sys._getframe(1))
+            if self._round_label and label:
+                label = self._round_label + ">" + label
+            deferred._round = self.round_analyzer.exchange(
+                self._round_context, label or self._round_label or "?")
+
         key = (pc, data_type)
 
         if key in self.protocols[peer_id].incoming_data:
@@ -790,6 +1796,45 @@ class Runtime:
             # We have not yet received anything from the other side.
             deq = self.protocols[peer_id].waiting_deferreds.setdefault(key, deque())
             deq.append(deferred)
+            if self.tracer is not None:
+                self.tracer.wait_begin(peer_id, pc, data_type)
+
+    def _send_share(self, peer_id, pc, share):
+        """Send *share* to *peer_id* under the program counter *pc*.
+
+        When shares are batched, the share is collected with the other
+        shares for the peer and sent by :meth:`flush_batch`. This
+        happens after the current reactor iteration at the latest.
+        """
+        protocol = self.protocols[peer_id]
+        if self.batch_shares and protocol.share_batches:
+            self._share_batches.setdefault(peer_id, []).append((pc, share))
+            self._schedule_batch()
+        else:
+            protocol.sendShare(pc, share)
+
+    def _schedule_batch(self):
+        self.batched_shares += 1
+        # The VIFF reactor flushes in process_deferred_queue.
+        if not self.using_viff_reactor and self._pending_batch is None:
+            self._pending_batch = reactor.callLater(0, self.flush_batch)
+
+    def flush_batch(self):
+        """Send the shares collected by :meth:`_send_share`.
+
+        The shares for each peer are sorted by program counter and
+        sent with :meth:`ShareExchanger.sendShareBatch`.
+        """
+        if self._pending_batch is not None:
+            if self._pending_batch.active():
+                self._pending_batch.cancel()
+            self._pending_batch = None
+        self.batched_shares = 0
+        batches = self._share_batches
+        self._share_batches = {}
+        for peer_id, shares in batches.iteritems():
+            shares.sort(key=lambda (pc, _): pc)
+            self.protocols[peer_id].sendShareBatch(shares)
 
     def _exchange_shares(self, peer_id, field_element):
         """Exchange shares with another player.
@@ -803,16 +1848,67 @@ class Runtime:
             return Share(self, field_element.field, field_element)
         else:
             share = self._expect_share(peer_id, field_element.field)
-            pc = tuple(self.program_counter)
+            pc = self.program_counter
             self.protocols[peer_id].sendShare(pc, field_element)
             return share
 
     def _expect_share(self, peer_id, field):
         share = Share(self, field)
-        share.addCallback(lambda value: field(long(value, 16)))
+        codec = share_codec(field, self.protocols[peer_id].binary_shares)
+        share.addCallback(codec.decode)
         self._expect_data(peer_id, SHARE, share)
         return share
 
+    def _expect_shares(self, peer_id, field, count):
+        """Expect *count* shares sent with :meth:`ShareExchanger.sendShares`.
+
+        Returns a list of :class:`Share` objects which are triggered
+        when the frames holding them arrive.
+        """
+        protocol = self.protocols[peer_id]
+        codec = share_codec(field, protocol.binary_shares)
+        size = protocol.shares_per_frame(codec)
+        shares = [Share(self, field) for _ in xrange(count)]
+
+        def distribute(data, chunk):
+            for share, element in zip(chunk, codec.decode_list(data)):
+                share.callback(element)
+
+        for i in xrange(0, count, size):
+            d = Deferred()
+            d.addCallback(distribute, shares[i:i + size])
+            self._expect_data(peer_id, SHARES, d)
+            if self.round_analyzer is not None:
+                for share in shares[i:i + size]:
+                    share._round = d._round
+        return shares
+
+    def _expect_vector(self, peer_id, field, size):
+        """Expect a vector of *size* shares sent with
+        :meth:`ShareExchanger.sendShares`.
+
+        Returns a :class:`ShareVector` which is triggered when all the
+        frames holding the shares have arrived.
+        """
+        protocol = self.protocols[peer_id]
+        codec = share_codec(field, protocol.binary_shares)
+        frame_size = protocol.shares_per_frame(codec)
+
+        chunks = []
+        for i in xrange(0, size, frame_size):
+            d = Deferred()
+            d.addCallback(codec.decode_list)
+            self._expect_data(peer_id, SHARES, d)
+            chunks.append(d)
+
+        vector = ShareVector(self, field, size=size)
+        if self.round_analyzer is not None:
+            vector._round = deepest([d._round for d in chunks])
+        result = gatherResults(chunks)
+        result.addCallback(lambda chunks: list(chain(*chunks)))
+        result.chainDeferred(vector)
+        return vector
+
     def preprocess(self, program):
         """Generate preprocess material.
 
@@ -906,24 +2002,62 @@ class Runtime:
         """Execute the callbacks of the deferreds in the queue.
 
         If this function is not called via activate_reactor(), also
-        complex callbacks are executed."""
-
-        self.process_queue(self.deferred_queue)
-
-        if self.depth_counter == 0:
-            self.process_queue(self.complex_deferred_queue)
+        complex callbacks are executed.
+
+        Data received by the reactor iterations in
+        :meth:`activate_reactor` is only queued, so this runs until
+        there is no more work, see :meth:`has_pending_callbacks`."""
+
+        self.scheduler_passes += 1
+        if self.tracer is not None:
+            start = self.tracer.now()
+            processed = self.processed_callbacks
+        while True:
+            self.process_queue(self.deferred_queue)
+
+            if self.depth_counter == 0:
+                self.process_queue(self.complex_deferred_queue)
+
+            # Send what became ready as one batch. Nested passes
+            # happen in the middle of the program, so they only flush
+            # large batches.
+            if self.batched_shares and \
+                    (self.depth_counter == 0 or
+                     self.batched_shares >= self.batch_limit):
+                self.flush_batch()
+
+            if not self.has_pending_callbacks():
+                break
+
+        if self.tracer is not None and self.processed_callbacks > processed:
+            self.tracer.complete("scheduler pass", "scheduler", start,
+                                 {"callbacks":
+                                      self.processed_callbacks - processed,
+                                  "depth": self.depth_counter})
+
+    def has_pending_callbacks(self):
+        """Return whether :meth:`process_deferred_queue` has work."""
+        return bool(self.deferred_queue or
+                    (self.depth_counter == 0 and self.complex_deferred_queue))
 
     def process_queue(self, queue):
         """Execute the callbacks of the deferreds in *queue*."""
 
         while queue:
+            if len(queue) > self.max_queue_length:
+                self.max_queue_length = len(queue)
             deferred, data = queue.popleft()
             deferred.callback(data)
+            self.processed_callbacks += 1
 
     def activate_reactor(self):
         """Activate the reactor to do actual communcation.
 
-        This is where the recursion happens."""
+        The reactor sends and receives data, but unless the
+        ``--recursive-reactor`` option is given, the callbacks for the
+        received data are queued for the outermost
+        :meth:`process_deferred_queue` instead of being run here.
+        Otherwise this is where the recursion happens."""
 
         if not self.using_viff_reactor:
             return
@@ -942,17 +2076,77 @@ class Runtime:
                     print "Recursion depth limit reached."
 
             if self.depth_counter < self.depth_limit:
+                if self.tracer is not None:
+                    start = self.tracer.now()
                 reactor.doIteration(0)
+                # Stop producing more data until the network has
+                # caught up with the connections that are throttled.
+                while self.throttled:
+                    reactor.doIteration(0.1)
+                if self.tracer is not None:
+                    self.tracer.complete("reactor iteration", "scheduler",
+                                         start, {"depth": self.depth_counter})
 
             self.depth_counter -= 1
             self.activation_counter = 0
 
+    def max_payload(self):
+        """Return the largest amount of data which can be sent in a
+        single message to all players."""
+        return min([protocol.max_payload
+                    for protocol in self.protocols.itervalues()])
+
     def print_transferred_data(self):
         """Print the amount of transferred data for all connections."""
 
+        for peer_id, latency in sorted(self.connect_latency.iteritems()):
+            print "Connected to peer %d after %.3f seconds" % (peer_id, latency)
+
         for protocol in self.protocols.itervalues():
+            stripes = protocol.stripes
             print "Transfer to peer %d: %d bytes in %d packets" % \
-                  (protocol.peer_id, protocol.sent_bytes, protocol.sent_packets)
+                  (protocol.peer_id, sum([p.sent_bytes for p in stripes]),
+                   sum([p.sent_packets for p in stripes])),
+            if len(stripes) > 1:
+                print "over %d connections" % len(stripes),
+            pauses = sum([p.send_pauses for p in stripes])
+            if pauses:
+                print "paused %d times" % pauses,
+            if protocol.coalesce:
+                print "using %d writes" % sum([p.sent_writes for p in stripes])
+            else:
+                print
+
+        if self.using_viff_reactor:
+            print "Scheduler: %d reactor iterations (%d nested), " \
+                "%d passes, %d callbacks, longest queue %d, max depth %d" % \
+                (reactor.iterations, reactor.nested_iterations,
+                 self.scheduler_passes, self.processed_callbacks,
+                 self.max_queue_length, self.max_depth)
+
+        if self.transfer_statistics is not None:
+            totals = self.transfer_statistics.as_dict()
+            for direction in SENT, RECEIVED:
+                data_types = totals[direction]["data_type"]
+                for name, counter in sorted(data_types.iteritems()):
+                    print "%s %s data: %d bytes in %d packets" % \
+                        (direction.capitalize(), name, counter["bytes"],
+                         counter["packets"])
+
+        if self.options.ssl:
+            now = time.time()
+            for protocol in self.protocols.itervalues():
+                for stripe in protocol.stripes:
+                    description = stripe.tls_description
+                    if description is None:
+                        continue
+                    # The average rate includes idle time, so it is a
+                    # lower bound on the cipher throughput.
+                    rate = stripe.sent_bytes / (now - stripe.connect_time)
+                    print "TLS to peer %d: %s, handshake in %.1f ms, " \
+                        "%.1f KiB/s sent" % (protocol.peer_id, description,
+                                             stripe.handshake_time * 1000,
+                                             rate / 1024)
 
 
 def make_runtime_class(runtime_class=None, mixins=None):
@@ -1025,6 +2219,11 @@ def create_runtime(id, players, threshold, options=None, runtime_class=None):
             players[i + 1].host, port_str = options.host[i].rsplit(":")
             players[i + 1].port = int(port_str)
 
+    if options and options.unix_socket_dir:
+        for player in players.itervalues():
+            player.unix_socket = os.path.join(options.unix_socket_dir,
+                                              "viff-player-%d.sock" % player.id)
+
     if options and options.profile:
         # To collect profiling information we monkey patch reactor.run
         # to do the collecting. It would be nicer to simply start the
@@ -1059,64 +2258,64 @@ def create_runtime(id, players, threshold, options=None, runtime_class=None):
     if options and options.statistics:
         reactor.addSystemEventTrigger("after", "shutdown",
                                       runtime.print_transferred_data)
+    if options and options.statistics_file:
+        reactor.addSystemEventTrigger("after", "shutdown",
+                                      runtime.transfer_statistics.dump,
+                                      options.statistics_file)
+    if options and options.trace:
+        trace_file = options.trace
+        if "%d" in trace_file:
+            trace_file = trace_file % id
+        reactor.addSystemEventTrigger("after", "shutdown",
+                                      runtime.tracer.dump, trace_file)
+    if options and options.analyze_rounds:
+        reactor.addSystemEventTrigger("after", "shutdown",
+                                      runtime.round_analyzer.report)
 
     if options and options.ssl:
-        print "Using SSL"
-        from twisted.internet.ssl import ContextFactory
-        from OpenSSL import SSL
-
-        class SSLContextFactory(ContextFactory):
-            def __init__(self, id):
-                """Create new SSL context factory for *id*."""
-                self.id = id
-                ctx = SSL.Context(SSL.SSLv3_METHOD)
-                # TODO: Make the file names configurable.
-                try:
-                    ctx.use_certificate_file('player-%d.cert' % id)
-                    ctx.use_privatekey_file('player-%d.key' % id)
-                    ctx.check_privatekey()
-                    ctx.load_verify_locations('ca.cert')
-                    ctx.set_verify(SSL.VERIFY_PEER | SSL.VERIFY_FAIL_IF_NO_PEER_CERT,
-                                   lambda conn, cert, errnum, depth, ok: ok)
-                    self.ctx = ctx
-                except SSL.Error, e:
-                    print "SSL errors - did you forget to generate certificates?"
-                    for (lib, func, reason) in e.args[0]:
-                        print "* %s in %s: %s" % (func, lib, reason)
-                    raise SystemExit("Stopping program")
-
-            def getContext(self):
-                return self.ctx
-
-        ctx_factory = SSLContextFactory(id)
-        listen = lambda port: reactor.listenSSL(port, factory, ctx_factory)
-        connect = lambda host, port: reactor.connectSSL(host, port, factory, ctx_factory)
+        # The TLS context is only made when a TCP connection needs it,
+        # so players using Unix domain sockets need no certificates.
+        ctx_factories = []
+
+        def ctx_factory():
+            if not ctx_factories:
+                print "Using SSL"
+                from viff.tls import TLSContextFactory
+                ctx_factories.append(TLSContextFactory(id, options.ssl_cert,
+                                                       options.ssl_key,
+                                                       options.ssl_ca))
+            return ctx_factories[0]
+        listen = lambda port: reactor.listenSSL(port, factory, ctx_factory())
+        connect = lambda host, port: reactor.connectSSL(host, port, factory,
+                                                        ctx_factory())
     else:
         print "Not using SSL"
         listen = lambda port: reactor.listenTCP(port, factory)
         connect = lambda host, port: reactor.connectTCP(host, port, factory)
 
+    # Players with a Unix domain socket are reached through it. The
+    # socket is only accessible by the user running the player, and
+    # SSL is not used on it since the traffic never leaves the host.
+    unix_socket = players[id].unix_socket
+    if unix_socket:
+        address = "socket %s" % unix_socket
+        listen = lambda port: reactor.listenUNIX(unix_socket, factory,
+                                                 mode=0600, wantPID=True)
+    else:
+        address = "port %d" % players[id].port
+
     port = players[id].port
     runtime.port = None
-    delay = 2
-    while runtime.port is None:
-        # We keep trying to listen on the port, but with an
-        # exponentially increasing delay between each attempt.
-        try:
-            runtime.port = listen(port)
-        except CannotListenError, e:
-            if options and options.no_socket_retry:
-                raise
-            delay *= 1 + rand.random()
-            print "Error listening on port %d: %s" % (port, e.socketError[1])
-            print "Will try again in %d seconds" % delay
-            time.sleep(delay)
-    print "Listening on port %d" % port
+    factory.start_listening(lambda: listen(port), address)
 
     for peer_id, player in players.iteritems():
         if peer_id > id:
             print "Will connect to %s" % player
-            connect(player.host, player.port)
+            for _ in range(runtime.options.connections):
+                if player.unix_socket:
+                    reactor.connectUNIX(player.unix_socket, factory)
+                else:
+                    connect(player.host, player.port)
 
     if runtime.using_viff_reactor:
         # Process the deferred queue after every reactor iteration.
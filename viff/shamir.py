@@ -82,6 +82,45 @@ def share(secret, threshold, num_players):
 
     return shares
 
+
+@fake(lambda s, t, n: [(s[0].field(i+1), s) for i in range(n)])
+def share_vector(secrets, threshold, num_players):
+    """Shamir share a list of secrets.
+
+    Every secret is shared with its own random polynomial, but the
+    shares are grouped by player: the return value is a list of
+    ``(player id, shares)`` pairs where *shares* holds one share per
+    secret. This is the layout needed for sending all the shares for
+    a player in a single message.
+
+    >>> from field import GF
+    >>> Zp = GF(47)
+    >>> secrets = [Zp(1), Zp(2), Zp(3)]
+    >>> shares = share_vector(secrets, 2, 5)
+    >>> recombine_vector(shares[2:]) == secrets
+    True
+    """
+    assert threshold >= 0 and threshold < num_players, "Threshold out of range"
+
+    field = secrets[0].field
+    modulus = long(field.modulus)
+    coefs = [[secret] + [rand.randint(0, modulus-1) for _ in range(threshold)]
+             for secret in secrets]
+
+    shares = []
+    for i in range(1, num_players+1):
+        cur_point = field(i)
+        cur_shares = []
+        for coef in coefs:
+            # Horner's rule, like in share.
+            cur_share = coef[threshold]
+            for j in range(threshold-1, -1, -1):
+                cur_share = coef[j] + cur_share * cur_point
+            cur_shares.append(cur_share)
+        shares.append((cur_point, cur_shares))
+
+    return shares
+
 #: Cached recombination vectors.
 #:
 #: The recombination vector used by `recombine` depends only on the
@@ -110,7 +149,13 @@ def recombine(shares, x_recomb=0):
     {3}
     """
     xs, ys = zip(*shares)
-    key = xs + (x_recomb, )
+    vector = _recombination_vector(xs, x_recomb)
+    return sum(map(operator.mul, ys, vector))
+
+
+def _recombination_vector(xs, x_recomb):
+    """Return the (cached) recombination vector for the points *xs*."""
+    key = tuple(xs) + (x_recomb, )
     try:
         vector = _recombination_vectors[key]
     except KeyError:
@@ -120,7 +165,27 @@ def recombine(shares, x_recomb=0):
                        for k, x_k in enumerate(xs) if k != i]
             vector.append(reduce(operator.mul, factors))
         _recombination_vectors[key] = vector
-    return sum(map(operator.mul, ys, vector))
+    return vector
+
+
+@fake(lambda s, x=0: s[0][1])
+def recombine_vector(shares, x_recomb=0):
+    """Recombines a list of ``(xi, [yi1, yi2, ...])`` pairs.
+
+    This works like :func:`recombine`, but each player contributes a
+    list of shares and a list of secrets is returned. The
+    recombination vector is computed only once for all the secrets.
+
+    >>> from field import GF
+    >>> Zp = GF(19)
+    >>> shares = [(Zp(i), [7 * Zp(i) + 3, Zp(i) + 1]) for i in range(1, 3)]
+    >>> recombine_vector(shares)
+    [{3}, {1}]
+    """
+    xs = [x for x, _ in shares]
+    vector = _recombination_vector(xs, x_recomb)
+    return [sum(map(operator.mul, ys, vector))
+            for ys in zip(*[y for _, y in shares])]
 
 
 def verify_sharing(shares, degree):
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Statistics on the data transferred between players. The
+:class:`~viff.runtime.ShareExchanger` records every frame it sends
+and receives in a :class:`TransferStatistics` object when the
+``--statistics`` or ``--statistics-file`` option is given.
+
+The frames are counted by data type, by peer, and by the first
+components of their program counter. The first component is the
+computation ID and the second tells which top-level operation a frame
+belongs to, so it is possible to see how much of the traffic is spent
+on, say, preprocessing compared to the online phase:
+
+>>> from viff.constants import SHARE, ECHO
+>>> stats = TransferStatistics()
+>>> stats.record(SENT, 2, SHARE, (0, 3, 1, 4), 20)
+>>> stats.record(SENT, 3, SHARE, (0, 3, 2), 20)
+>>> stats.record(SENT, 2, ECHO, (0, 5), 100)
+>>> totals = stats.as_dict()["sent"]
+>>> sorted(totals["data_type"]["SHARE"].items())
+[('bytes', 40), ('packets', 2)]
+>>> sorted(totals["peer"]["2"].items())
+[('bytes', 120), ('packets', 2)]
+>>> sorted(totals["pc_prefix"])
+['0.3', '0.5']
+
+Received frames also record when the first and the last frame in each
+group arrived, in seconds since the statistics were created.
+"""
+
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from viff import constants
+
+#: Direction of frames sent to a peer.
+SENT = "sent"
+#: Direction of frames received from a peer.
+RECEIVED = "received"
+
+#: Names of the data types defined in :mod:`viff.constants`.
+DATA_TYPE_NAMES = dict([(getattr(constants, name), name)
+                        for name in ["SHARE", "ECHO", "READY", "SEND",
+                                     "PAILLIER", "TEXT", "INCONSISTENTHASH",
+                                     "OK", "HASH", "SIGNAL", "SHARES",
+                                     "SHARE_BATCH"]])
+
+
+class TransferStatistics(object):
+    """Counters for the frames sent and received by a player."""
+
+    def __init__(self, prefix_length=2):
+        """Create empty statistics.
+
+        Program counters are grouped by their first *prefix_length*
+        components.
+        """
+        self.prefix_length = prefix_length
+        self.start_time = time.time()
+        # Maps direction to a mapping from (kind, key) to a list of
+        # packets, bytes, and for received frames the time of the
+        # first and last frame.
+        self.counters = {SENT: {}, RECEIVED: {}}
+
+    def record(self, direction, peer_id, data_type, program_counter, size):
+        """Record a frame of *size* bytes in *direction*.
+
+        The *direction* is :const:`SENT` or :const:`RECEIVED`.
+        """
+        counters = self.counters[direction]
+        if direction == RECEIVED:
+            now = time.time() - self.start_time
+        else:
+            now = None
+        prefix = program_counter[:self.prefix_length]
+        for key in (("data_type", data_type), ("peer", peer_id),
+                    ("pc_prefix", prefix)):
+            try:
+                counter = counters[key]
+            except KeyError:
+                counters[key] = [1, size, now, now]
+            else:
+                counter[0] += 1
+                counter[1] += size
+                counter[3] = now
+
+    def as_dict(self):
+        """Return the statistics as nested dictionaries.
+
+        The result maps ``"sent"`` and ``"received"`` to dictionaries
+        which map ``"data_type"``, ``"peer"``, and ``"pc_prefix"`` to
+        the counters for each data type, peer, and program counter
+        prefix. All keys are strings, so the result can be stored as
+        JSON. The data types are named as in :mod:`viff.constants`
+        and the program counter prefixes are written with dots.
+        """
+        result = {}
+        for direction, counters in self.counters.iteritems():
+            groups = {"data_type": {}, "peer": {}, "pc_prefix": {}}
+            for (kind, key), counter in counters.iteritems():
+                if kind == "data_type":
+                    name = DATA_TYPE_NAMES.get(key, str(key))
+                elif kind == "pc_prefix":
+                    name = ".".join(map(str, key))
+                else:
+                    name = str(key)
+                entry = {"packets": counter[0], "bytes": counter[1]}
+                if direction == RECEIVED:
+                    entry["first"] = counter[2]
+                    entry["last"] = counter[3]
+                groups[kind][name] = entry
+            result[direction] = groups
+        return result
+
+    def dump(self, filename):
+        """Write the statistics to *filename* as JSON."""
+        output = open(filename, "w")
+        try:
+            json.dump(self.as_dict(), output, indent=2, sort_keys=True)
+        finally:
+            output.close()
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
@@ -24,6 +24,7 @@ import operator
 from random import Random
 
 from twisted.internet.defer import gatherResults, Deferred, DeferredList
+from twisted.trial.unittest import TestCase
 
 from viff.test.util import protocol
 from viff.constants import TEXT
@@ -36,7 +37,7 @@ from viff.bedoza.bedoza import BeDOZaShare
 from viff.bedoza.keylist import BeDOZaKeyList
 from viff.bedoza.bedoza_triple import TripleGenerator, ModifiedPaillier
 from viff.bedoza.shares import PartialShare, PartialShareContents
-from viff.bedoza.util import _send, _convolute, _convolute_gf_elm
+from viff.bedoza.util import _send, _convolute, _convolute_gf_elm, fast_pows
 from viff.bedoza.add_macs import add_macs
 from viff.bedoza.share_generators import ShareGenerator, PartialShareGenerator
 from viff.bedoza.share import generate_partial_share_contents
@@ -182,6 +183,44 @@ class ModifiedPaillierTest(BeDOZaTestCase):
         runtime.schedule_callback(received, verify)
         return received
 
+    @protocol
+    def test_modified_paillier_can_decrypt_all_encrypted(self, runtime):
+        paillier = ModifiedPaillier(runtime, Random(613307))
+        n = runtime.players[runtime.id].pubkey['n']
+        vals = [0, 1, -1, 73423, (n - 1) / 2, -(n - 1) / 2]
+        result = paillier.encrypt_all(vals)
+        result.addCallback(paillier.decrypt_all)
+        result.addCallback(self.assertEquals, vals)
+        return result
+
+    @protocol
+    def test_encrypt_all_draws_randomness_like_encrypt(self, runtime):
+        vals = [5, -7, 11]
+        paillier = ModifiedPaillier(runtime, Random(72341))
+        expected = [paillier.encrypt(val, player_id=2) for val in vals]
+        paillier = ModifiedPaillier(runtime, Random(72341))
+        result = paillier.encrypt_all(vals, player_id=2)
+        result.addCallback(self.assertEquals, expected)
+        return result
+
+
+class FastPowsTest(TestCase):
+    """Test the exponentiations done in worker processes."""
+
+    def test_round_trip(self):
+        # RSA with p = 61 and q = 53, so e * d = 1 modulo (p-1)*(q-1).
+        n, e, d = 3233, 17, 2753
+        values = [0, 1, 65, 1234, 3232]
+        encrypted = fast_pows(values, [e] * len(values), n)
+        self.assertEquals(encrypted, [pow(v, e, n) for v in values])
+        self.assertEquals(fast_pows(encrypted, [d] * len(values), n),
+                          values)
+
+    def test_types(self):
+        result = fast_pows([2**100], [3], 2**521 - 1)
+        self.assertEquals(result, [2**300 % (2**521 - 1)])
+        self.assertTrue(isinstance(result[0], long))
+
 
 def partial_share(random, runtime, Zp, val, paillier=None):
     if not paillier:
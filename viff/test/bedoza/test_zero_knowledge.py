@@ -21,7 +21,10 @@ from random import Random
 
 from gmpy import mpz
 
+from twisted.trial.unittest import TestCase
+
 from viff.field import GF
+from viff.wire import encode_integers, decode_integers
 from viff.bedoza.modified_paillier import ModifiedPaillier
 from viff.bedoza.zero_knowledge import ZKProof
 from viff.bedoza.util import rand_int_signed
@@ -90,14 +93,28 @@ class BeDOZaZeroKnowledgeTest(BeDOZaTestCase):
         x_mul_E = zk._vec_mul_E(x)
         self.assertEquals([v for v in [0, 2, -1, -3, 0]], x_mul_E)
 
+    def test_serialize_proof(self):
+        s, k, prover_id = 2, 1, 1
+        c = [None] * s
+        zk = ZKProof(s, prover_id, k, RuntimeStub(), c)
+        zk.d = [mpz(1), mpz(2), mpz(3)]
+        zk.Z = [mpz(-4), mpz(5), mpz(2**70)]
+        zk.W = [mpz(7), mpz(8), mpz(9)]
+        other = ZKProof(s, prover_id, k, RuntimeStub(), c)
+        other._deserialize_proof(zk._serialize_proof())
+        self.assertEquals(zk.d, other.d)
+        self.assertEquals(zk.Z, other.Z)
+        self.assertEquals(zk.W, other.W)
+        self.assertEquals(map(repr, zk.d), map(repr, other.d))
+
     @protocol
     def test_broadcast(self, runtime):
         s, k, prover_id = 0, 2, 1
         c = []
         zk = ZKProof(s, prover_id, k, runtime, c)
-        res = zk._broadcast([5, 6, 7])
+        res = zk._broadcast(encode_integers([5, 6, 7]))
         def verify(res):
-            self.assertEquals(eval(res), [5, 6, 7])
+            self.assertEquals(decode_integers(res), [5, 6, 7])
         runtime.schedule_callback(res, verify)
         return res
 
@@ -183,4 +200,32 @@ class BeDOZaZeroKnowledgeTest(BeDOZaTestCase):
 # TODO: Test succeeding proof.
 # TODO: Test failing proof.
 
+
+class ProofSerializationTest(TestCase):
+    """Test the encoding of proofs, which needs no Paillier keys."""
+
+    def test_round_trip(self):
+        s, k, prover_id = 3, 1, 2
+        c = [None] * s
+        zk = ZKProof(s, prover_id, k, RuntimeStub(), c)
+        random = Random(47113)
+        zk.d = [mpz(random.getrandbits(4096)) for _ in range(zk.m)]
+        zk.Z = [rand_int_signed(random, 2**1000) for _ in range(zk.m)]
+        zk.W = [mpz(random.getrandbits(4096)) for _ in range(zk.m)]
+        serialized = zk._serialize_proof()
+        self.assertEquals(decode_integers(serialized), zk.d + zk.Z + zk.W)
+        other = ZKProof(s, prover_id, k, RuntimeStub(), c)
+        other._deserialize_proof(serialized)
+        self.assertEquals((other.d, other.Z, other.W), (zk.d, zk.Z, zk.W))
+
+    def test_smaller_than_repr(self):
+        s, k, prover_id = 3, 1, 1
+        c = [None] * s
+        zk = ZKProof(s, prover_id, k, RuntimeStub(), c)
+        zk.d = zk.W = [mpz(2**4096 - 1)] * zk.m
+        zk.Z = [-(2**1000)] * zk.m
+        self.assertTrue(len(zk._serialize_proof()) * 2 <
+                        len(repr(zk.d + zk.Z + zk.W)))
+
+
 skip_if_missing_packages(BeDOZaZeroKnowledgeTest)
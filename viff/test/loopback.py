@@ -101,6 +101,12 @@ class _LoopbackTransport(object):
     disconnecting = False
     producer = None
 
+    # A streaming producer is paused when more than this number of
+    # bytes are waiting to be written, and resumed when they have all
+    # been written, like with a real transport.
+    bufferSize = 2**16
+    producerPaused = False
+
     # ITransport
 
     def __init__(self, q):
@@ -112,6 +118,11 @@ class _LoopbackTransport(object):
     def close(self):
         self.q.disconnect = True
         self._cancel_pending()
+        # Like a real transport, tell the producer that no more data
+        # will be written.
+        if self.producer is not None:
+            self.producerPaused = False
+            self.producer.stopProducing()
 
     def _cancel_pending(self):
         if self._pending is not None and self._pending.active():
@@ -150,6 +161,10 @@ class _LoopbackTransport(object):
         cut = rand.randint(0, len(self._buffer))
         chunk, self._buffer = self._buffer[:cut], self._buffer[cut:]
 
+        if not self._buffer and self.producerPaused:
+            self.producerPaused = False
+            self.producer.resumeProducing()
+
         # Schedule another go after a random delay.
         self._schedule_write()
 
@@ -158,12 +173,21 @@ class _LoopbackTransport(object):
 
     def write(self, bytes):
         self._buffer += bytes
+        self._check_buffer()
         self._schedule_write()
 
     def writeSequence(self, iovec):
         self._buffer += ''.join(iovec)
+        self._check_buffer()
         self._schedule_write()
 
+    def _check_buffer(self):
+        if self.producer is not None and self.streamingProducer \
+                and not self.producerPaused and not self.q.disconnect \
+                and len(self._buffer) > self.bufferSize:
+            self.producerPaused = True
+            self.producer.pauseProducing()
+
     def loseConnection(self):
         self._will_disconnect = True
         self._schedule_write()
@@ -185,6 +209,7 @@ class _LoopbackTransport(object):
     def unregisterProducer(self):
         assert self.producer is not None
         self.producer = None
+        self.producerPaused = False
 
     def _pollProducer(self):
         if self.producer is not None and not self.streamingProducer:
@@ -102,6 +102,26 @@ class AppsTest(TestCase):
         result.addCallback(check_outputs)
         return result
 
+    def test_millionaires_unix(self):
+        """Test apps/millionaires.py with Unix domain sockets."""
+        socket_dir = path.abspath(self.mktemp())
+        os.makedirs(socket_dir)
+        m1 = execute("millionaires.py", "--unix-socket-dir", socket_dir,
+                     "trial-1.ini")
+        m2 = execute("millionaires.py", "--unix-socket-dir", socket_dir,
+                     "trial-2.ini")
+        m3 = execute("millionaires.py", "--unix-socket-dir", socket_dir,
+                     "trial-3.ini")
+
+        def check_outputs(outputs):
+            for i, o in enumerate(outputs):
+                self.assertIn("I am Millionaire %d" % (i+1) , o)
+                self.assertIn("Listening on socket", o)
+
+        result = gatherResults([m1, m2, m3])
+        result.addCallback(check_outputs)
+        return result
+
     def test_share_open(self):
         """Test apps/share-open.py."""
 
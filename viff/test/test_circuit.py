@@ -0,0 +1,141 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.circuit."""
+
+from twisted.trial.unittest import TestCase
+
+from viff.field import GF256
+from viff.circuit import record, INPUT, MUL, OPEN
+from viff.test.util import RuntimeTestCase, protocol
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.circuit']
+
+
+def inner_product(rt, field):
+    xs = rt.input([1, 2, 3], field)
+    ys = rt.input([1, 2, 3], field)
+    total = xs[0] * ys[0] + xs[1] * ys[1] + xs[2] * ys[2]
+    rt.open(total - 1)
+    rt.open(xs[0] - xs[1], receivers=[1])
+
+
+class CircuitTest(TestCase):
+
+    def test_layers(self):
+        circuit = record(inner_product, GF256)
+        self.assertEquals(circuit.depth, 3)
+        inputs, products, opens = circuit.layers
+        self.assertEquals([len(indices) for key, indices in inputs.inputs],
+                          [2, 2, 2])
+        self.assertEquals(len(products.muls[0][1]), 3)
+        # The difference is opened together with the multiplications.
+        self.assertEquals([key for key, indices in products.opens],
+                          [(GF256, (1,))])
+        self.assertEquals([key for key, indices in opens.opens],
+                          [(GF256, None)])
+        kinds = [circuit.gates[i][0] for i in circuit.outputs]
+        self.assertEquals(kinds, [OPEN, OPEN])
+
+    def test_program_counters(self):
+        circuit = record(inner_product, GF256)
+        pcs = [gate[1] for gate in circuit.gates]
+        self.assertEquals(pcs, sorted(set(pcs)))
+
+    def test_inputs(self):
+        circuit = record(inner_product, GF256)
+        self.assertEquals(circuit.inputs(1), 2)
+        self.assertEquals(circuit.inputs(4), 0)
+
+    def test_pow(self):
+        circuit = record(lambda rt: rt.open(rt.input([1], GF256) ** 254))
+        kinds = [gate[0] for gate in circuit.gates]
+        self.assertEquals(kinds.count(INPUT), 1)
+        self.assertEquals(kinds.count(MUL), 13)
+
+    def test_opened_values_are_results(self):
+        def use_opened(rt):
+            a = rt.input([1], GF256)
+            rt.open(a) * a
+        self.assertRaises(AssertionError, record, use_opened)
+
+
+class CircuitRunTest(RuntimeTestCase):
+    """Test evaluation of recorded circuits."""
+
+    @protocol
+    def test_inner_product(self, runtime):
+        circuit = record(inner_product, self.Zp)
+        id = runtime.id
+        result = circuit.run(runtime, [id, 10 * id])
+
+        def check((total, difference)):
+            self.assertEquals(total, 10 * (1 + 4 + 9) - 1)
+            if id == 1:
+                self.assertEquals(difference, self.Zp(-1))
+            else:
+                self.assertEquals(difference, None)
+
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_run_twice(self, runtime):
+        circuit = record(lambda rt: rt.open(rt.input([2], self.Zp) ** 3 + 2))
+        inputs = {1: [], 2: [4], 3: []}[runtime.id]
+        first = circuit.run(runtime, inputs)
+        second = circuit.run(runtime, inputs)
+
+        def check(results):
+            self.assertEquals(results, [[66], [66]])
+
+        result = first.addCallback(lambda a: second.addCallback(
+                lambda b: [a, b]))
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_mixed_fields(self, runtime):
+        def mixed(rt):
+            a = rt.input([1], self.Zp)
+            g = rt.input([1], GF256)
+            b = rt.input([1], self.Zp)
+            rt.open(a)
+            rt.open(g)
+            rt.open(b)
+        circuit = record(mixed)
+        inputs = {1: [5, GF256(7), 9], 2: [], 3: []}[runtime.id]
+        result = circuit.run(runtime, inputs)
+
+        def check(results):
+            self.assertEquals(results, [self.Zp(5), GF256(7), self.Zp(9)])
+
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_aes_inversion(self, runtime):
+        circuit = record(lambda rt: rt.open(rt.input([3], GF256) ** 254))
+        inputs = {1: [], 2: [], 3: [GF256(0x53)]}[runtime.id]
+        result = circuit.run(runtime, inputs)
+
+        def check((inverse,)):
+            self.assertEquals(inverse * GF256(0x53), GF256(1))
+
+        result.addCallback(check)
+        return result
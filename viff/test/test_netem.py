@@ -0,0 +1,89 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.netem."""
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from viff.netem import LinkProfile, ShapedTransport, link_profiles
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.netem']
+
+
+class RecordingTransport(object):
+    """Transport which records the time of each write."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.writes = []
+        self.disconnected = False
+
+    def write(self, data):
+        self.writes.append((self.clock.seconds(), data))
+
+    def loseConnection(self):
+        self.disconnected = True
+
+
+class ShapedTransportTest(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.inner = RecordingTransport(self.clock)
+
+    def shaped(self, **kwargs):
+        return ShapedTransport(self.inner, LinkProfile(**kwargs), self.clock)
+
+    def test_latency(self):
+        transport = self.shaped(rtt=0.1)
+        transport.write("abc")
+        transport.write("def")
+        self.clock.advance(0.04)
+        self.assertEquals(self.inner.writes, [])
+        self.clock.advance(0.01)
+        self.assertEquals(self.inner.writes, [(0.05, "abcdef")])
+
+    def test_bandwidth(self):
+        transport = self.shaped(bandwidth=1000)
+        transport.write("x" * 100)
+        transport.write("y" * 100)
+        self.clock.pump([0.1, 0.1])
+        self.assertEquals(self.inner.writes,
+                          [(0.1, "x" * 100), (0.2, "y" * 100)])
+
+    def test_batch(self):
+        transport = self.shaped(batch=0.01)
+        transport.write("a")
+        self.clock.advance(0.005)
+        transport.write("b")
+        self.clock.advance(0.005)
+        self.assertEquals(self.inner.writes, [(0.01, "ab")])
+
+    def test_lose_connection_after_delivery(self):
+        transport = self.shaped(rtt=0.1)
+        transport.write("abc")
+        transport.loseConnection()
+        self.assertFalse(self.inner.disconnected)
+        self.clock.advance(0.05)
+        self.assertTrue(self.inner.disconnected)
+
+    def test_link_profiles(self):
+        profiles = link_profiles(["rtt=40", "peer=2,rtt=80"])
+        self.assertEquals(profiles[None].rtt, 0.04)
+        self.assertEquals(profiles[2].rtt, 0.08)
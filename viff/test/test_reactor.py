@@ -0,0 +1,93 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.reactor."""
+
+import os
+
+from twisted.trial.unittest import TestCase
+
+from viff.reactor import ViffReactorMixin, reactor_classes, default_kind, \
+    install
+
+
+class ReactorTest(TestCase):
+    """Test the VIFF reactor classes."""
+
+    def _reactor(self, kind):
+        reactor = reactor_classes[kind]()
+        self.addCleanup(reactor.disconnectAll)
+        return reactor
+
+    def _test_loop_call(self, kind):
+        reactor = self._reactor(kind)
+        self.assertTrue(isinstance(reactor, ViffReactorMixin))
+        calls = []
+        depth = [0]
+
+        def loop_call():
+            calls.append(depth[0])
+            if depth[0] == 0:
+                depth[0] += 1
+                reactor.doIteration(0)
+                depth[0] -= 1
+
+        reactor.setLoopCall(loop_call)
+        reactor.callLater(0, calls.append, "timer")
+        reactor.doIteration(0)
+        # The timed call runs first, and the nested iteration does
+        # not enter the loop call again.
+        self.assertEquals(calls[0], "timer")
+        self.assertFalse(1 in calls)
+        self.assertTrue(0 < reactor.nested_iterations < reactor.iterations)
+
+        # A reentrant reactor runs the loop call recursively.
+        del calls[:]
+        reactor.reentrant = True
+        reactor.doIteration(0)
+        self.assertTrue(1 in calls)
+
+    def test_select(self):
+        self._test_loop_call("select")
+
+    def test_poll(self):
+        self._test_loop_call("poll")
+
+    if "poll" not in reactor_classes:
+        test_poll.skip = "Skipped since poll is not available."
+
+    def test_epoll(self):
+        self._test_loop_call("epoll")
+
+    if "epoll" not in reactor_classes:
+        test_epoll.skip = "Skipped since epoll is not available."
+
+    def test_default_kind(self):
+        old = os.environ.pop("VIFF_REACTOR", None)
+        try:
+            self.assertEquals(default_kind(), "select")
+            os.environ["VIFF_REACTOR"] = "poll"
+            self.assertEquals(default_kind(), "poll")
+        finally:
+            if old is None:
+                del os.environ["VIFF_REACTOR"]
+            else:
+                os.environ["VIFF_REACTOR"] = old
+
+    def test_unknown_kind(self):
+        self.assertRaises(ValueError, install, "kqueue-for-windows")
+
@@ -0,0 +1,51 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.rounds."""
+
+from twisted.trial.unittest import TestCase
+
+from viff.rounds import RoundAnalyzer, critical_path
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.rounds']
+
+
+class RoundAnalyzerTest(TestCase):
+
+    def test_parallel_exchanges(self):
+        analyzer = RoundAnalyzer()
+        for i in range(3):
+            analyzer.exchange(None, "open")
+        self.assertEquals(analyzer.rounds(), 1)
+        self.assertEquals(analyzer.messages_per_round(), [3])
+
+    def test_partial_path(self):
+        analyzer = RoundAnalyzer()
+        start = analyzer.exchange(None, "synchronize")
+        node = analyzer.exchange(start, "mul")
+        node = analyzer.exchange(node, "mul")
+        self.assertEquals(critical_path(node, start), ["mul", "mul"])
+
+    def test_as_dict(self):
+        analyzer = RoundAnalyzer()
+        node = analyzer.exchange(None, "mul")
+        node = analyzer.exchange(node, "mul")
+        analyzer.exchange(node, "open")
+        self.assertEquals(analyzer.as_dict(),
+                          {"rounds": 3, "messages": [1, 1, 1],
+                           "critical_path": [("mul", 2), ("open", 1)]})
@@ -24,16 +24,24 @@ performed by L{StressTest}.
 """
 
 import os
+import time
 from random import Random
 import operator
 
+from twisted.trial.unittest import TestCase
 from twisted.internet.defer import gatherResults, Deferred, DeferredList
+from twisted.internet.task import Clock
+from twisted.internet.error import CannotListenError
 
 from viff.field import GF256
-from viff.runtime import Share
-from viff.constants import SHARE
+from viff.config import Player
+from viff.runtime import Runtime, Share, ShareList, ShareVector, share_value, \
+    ShareExchangerFactory
+from viff.constants import SHARE, SHARE_BATCH, TEXT
 from viff.comparison import Toft05Runtime
 from viff.test.util import RuntimeTestCase, BinaryOperatorTestCase, protocol
+from viff.rounds import critical_path, depth
+from viff.netem import ShapedTransport
 
 
 __doctests__ = ['viff.runtime']
@@ -234,6 +242,623 @@ class RuntimeTest(RuntimeTestCase):
         return dls
 
 
+    @protocol
+    def test_connect_latency(self, runtime):
+        peers = [p for p in runtime.players if p != runtime.id]
+        self.assertEquals(sorted(runtime.connect_latency), peers)
+        for latency in runtime.connect_latency.itervalues():
+            self.assertTrue(latency >= 0)
+
+    @protocol
+    def test_send_throttle(self, runtime):
+        peer_id = 3 - runtime.id if runtime.id < 3 else 1
+        protocol = runtime.protocols[peer_id]
+        throttle = protocol.transport.producer
+        self.assertEquals(throttle.protocol, protocol)
+
+        throttle.pauseProducing()
+        self.assertTrue(protocol.send_paused)
+        self.assertEquals(runtime.throttled, set([protocol]))
+        throttle.resumeProducing()
+        self.assertFalse(protocol.send_paused)
+        self.assertEquals(runtime.throttled, set())
+        self.assertEquals(protocol.send_pauses, 1)
+
+    @protocol
+    def test_send_receive_shares(self, runtime):
+        """Test sending a list of shares in a single frame."""
+        values = [self.Zp(runtime.id * 100 + i) for i in range(10)]
+        pc = tuple(runtime.program_counter)
+        for peer_id in runtime.players:
+            runtime.protocols[peer_id].sendShares(pc, values)
+
+        results = []
+        for peer_id in runtime.players:
+            shares = runtime._expect_shares(peer_id, self.Zp, len(values))
+            expected = [self.Zp(peer_id * 100 + i) for i in range(10)]
+            result = gatherResults(shares)
+            result.addCallback(self.assertEquals, expected)
+            results.append(result)
+        return gatherResults(results)
+
+    @protocol
+    def test_send_receive_shares_split(self, runtime):
+        """Test sending more shares than fit in a single frame."""
+        for protocol in runtime.protocols.itervalues():
+            protocol.max_payload = 20
+        values = [self.Zp(runtime.id * 100 + i) for i in range(10)]
+        pc = tuple(runtime.program_counter)
+        for peer_id in runtime.players:
+            runtime.protocols[peer_id].sendShares(pc, values)
+
+        results = []
+        for peer_id in runtime.players:
+            shares = runtime._expect_shares(peer_id, self.Zp, len(values))
+            expected = [self.Zp(peer_id * 100 + i) for i in range(10)]
+            result = gatherResults(shares)
+            result.addCallback(self.assertEquals, expected)
+            results.append(result)
+        return gatherResults(results)
+
+    @protocol
+    def test_open_list(self, runtime):
+        """Test opening a list of shares."""
+        shares = [Share(runtime, self.Zp, self.Zp(i) + runtime.id)
+                  for i in range(5)]
+        opened = runtime.open(shares)
+        self.assertEquals(len(opened), 5)
+        result = gatherResults(opened)
+        result.addCallback(self.assertEquals, [self.Zp(i) for i in range(5)])
+        return result
+
+    @protocol
+    def test_mul_list(self, runtime):
+        """Test elementwise multiplication of lists of shares."""
+        a = [Share(runtime, self.Zp, self.Zp(i)) for i in range(5)]
+        b = [Share(runtime, self.Zp, self.Zp(i + 10)) for i in range(5)]
+        c = runtime.mul(a, b)
+        self.assertEquals(len(c), 5)
+        for share in c:
+            self.assert_type(share, Share)
+        result = gatherResults(runtime.open(c))
+        result.addCallback(self.assertEquals,
+                           [self.Zp(i * (i + 10)) for i in range(5)])
+        return result
+
+    @protocol
+    def test_shamir_share_list(self, runtime):
+        """Test Shamir sharing of lists of numbers."""
+        if runtime.id == 2:
+            a = runtime.shamir_share([2], self.Zp, [1, 2, 3])
+        else:
+            a = runtime.shamir_share([2], self.Zp, [None] * 3)
+        if runtime.id == 2:
+            b, c = runtime.shamir_share([1, 3], self.Zp, [None, None])
+        else:
+            b, c = runtime.shamir_share([1, 3], self.Zp,
+                                        [runtime.id, runtime.id * 10])
+
+        results = []
+        for shares, expected in [(a, [1, 2, 3]), (b, [1, 10]), (c, [3, 30])]:
+            result = gatherResults([runtime.open(share) for share in shares])
+            result.addCallback(self.assertEquals, map(self.Zp, expected))
+            results.append(result)
+        return gatherResults(results)
+
+    @protocol
+    def test_empty_lists(self, runtime):
+        """Test the list operations on empty lists."""
+        self.assertEquals(runtime.open([]), [])
+        self.assertEquals(runtime.mul([], []), [])
+        self.assertEquals(runtime.shamir_share([1], self.Zp, []), [])
+        self.assertEquals(runtime.shamir_share([1, 2], self.Zp, []), [[], []])
+        # The program counters must still agree.
+        a = Share(runtime, self.Zp, self.Zp(3))
+        opened = runtime.open(a * a)
+        opened.addCallback(self.assertEquals, self.Zp(9))
+        return opened
+
+
+class CoalescingTest(RuntimeTestCase):
+    """Test coalescing of outgoing frames."""
+
+    option_overrides = {"coalesce_writes": True}
+
+    @protocol
+    def test_coalesced_open(self, runtime):
+        shares = [Share(runtime, self.Zp, self.Zp(i) + runtime.id)
+                  for i in range(20)]
+        opened = [runtime.open(share) for share in shares]
+
+        def check(results):
+            self.assertEquals(results, [self.Zp(i) for i in range(20)])
+            for peer_id, protocol in runtime.protocols.iteritems():
+                if peer_id != runtime.id:
+                    self.assertTrue(protocol.sent_writes <
+                                    protocol.sent_packets)
+
+        result = gatherResults(opened)
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_max_frames(self, runtime):
+        for protocol in runtime.protocols.itervalues():
+            protocol.coalesce_max_frames = 1
+        shares = [Share(runtime, self.Zp, self.Zp(i) + runtime.id)
+                  for i in range(5)]
+        opened = gatherResults([runtime.open(share) for share in shares])
+        opened.addCallback(self.assertEquals, [self.Zp(i) for i in range(5)])
+        return opened
+
+
+class SchedulerTest(RuntimeTestCase):
+    """Test the scheduling of callbacks."""
+
+    @protocol
+    def test_long_chain(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(2))
+        for _ in range(200):
+            share = share * 1 + share * share - share * share
+        opened = runtime.open(share)
+
+        def check(result):
+            self.assertEquals(result, self.Zp(2))
+            if runtime.using_viff_reactor:
+                # Received data is not processed in nested reactor
+                # iterations, so the recursion stays shallow.
+                self.assertTrue(runtime.max_depth <= 2)
+                self.assertTrue(runtime.processed_callbacks > 0)
+
+        opened.addCallback(check)
+        return opened
+
+
+class SendThrottleTest(RuntimeTestCase):
+    """Test throttling when the send buffers fill up."""
+
+    option_overrides = {"send_buffer_limit": 64}
+
+    @protocol
+    def test_backpressure(self, runtime):
+        buffered = []
+        peers = [protocol for peer_id, protocol in runtime.protocols.iteritems()
+                 if peer_id != runtime.id]
+        for protocol in peers:
+            transport = protocol.transport
+            self.assertEquals(transport.bufferSize, 64)
+
+            def write(data, transport=transport, write=transport.write):
+                write(data)
+                buffered.append(len(transport._buffer))
+            transport.write = write
+
+        shares = [Share(runtime, self.Zp, self.Zp(i)) for i in range(200)]
+        opened = [runtime.open(share) for share in shares]
+
+        def check(results):
+            self.assertEquals(results, [self.Zp(i) for i in range(200)])
+            for protocol in peers:
+                self.assertTrue(protocol.send_pauses > 0)
+            self.assertEquals(runtime.throttled, set())
+            # The runtime waits for the network instead of filling the
+            # send buffers.
+            self.assertTrue(max(buffered) < 4 * 64)
+
+        result = gatherResults(opened)
+        result.addCallback(check)
+        # Keep the connections open until all players have sent their
+        # shares.
+        result.addCallback(lambda _: runtime.synchronize())
+        return result
+
+
+class ShareBatchingTest(RuntimeTestCase):
+    """Test batching of the shares sent by multiplications and openings."""
+
+    option_overrides = {"batch_shares": True}
+
+    @protocol
+    def test_batched_mul(self, runtime):
+        sent = {}
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if peer_id != runtime.id:
+                sent[peer_id] = types = []
+
+                def send_data(pc, data_type, data,
+                              send_data=protocol.sendData, types=types):
+                    types.append(data_type)
+                    send_data(pc, data_type, data)
+                protocol.sendData = send_data
+
+        shares = [Share(runtime, self.Zp, self.Zp(i)) for i in range(20)]
+        products = [share * share for share in shares]
+        opened = [runtime.open(product) for product in products]
+
+        def check(results):
+            self.assertEquals(results, [self.Zp(i * i) for i in range(20)])
+            for types in sent.itervalues():
+                # The shares of the products are sent in batches, the
+                # batch of the openings may not have been sent yet.
+                self.assertIn(SHARE_BATCH, types)
+                self.assertTrue(len(types) < 20)
+
+        result = gatherResults(opened)
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_mixed_fields(self, runtime):
+        a = Share(runtime, self.Zp, self.Zp(3))
+        b = Share(runtime, GF256, GF256(3))
+        opened = [runtime.open(a * a), runtime.open(b * b)]
+        result = gatherResults(opened)
+        result.addCallback(self.assertEquals, [self.Zp(9), GF256(3) * 3])
+        return result
+
+    @protocol
+    def test_batch_size(self, runtime):
+        peers = [protocol for peer_id, protocol in runtime.protocols.iteritems()
+                 if peer_id != runtime.id]
+
+        def products(batch_shares):
+            runtime.batch_shares = batch_shares
+            sent = [protocol.sent_bytes for protocol in peers]
+            shares = [Share(runtime, self.Zp, self.Zp(i)) for i in range(20)]
+            result = gatherResults([share * share for share in shares])
+            result.addCallback(lambda _: [protocol.sent_bytes - before
+                                          for protocol, before
+                                          in zip(peers, sent)])
+            return result
+
+        def batched(unbatched):
+            result = products(True)
+            result.addCallback(lambda sent: [self.assertTrue(b <= u, (b, u))
+                                             for b, u in zip(sent, unbatched)])
+            return result
+
+        result = products(False)
+        result.addCallback(batched)
+        return result
+
+
+class WorkerPoolTest(RuntimeTestCase):
+    """Test computations in worker processes."""
+
+    option_overrides = {"worker_processes": 1}
+
+    @protocol
+    def test_run_in_worker(self, runtime):
+        self.addCleanup(runtime.stop_workers)
+        pc = runtime.program_counter
+        result = runtime.run_in_worker(pow, 3, 100, 7)
+        self.assertEquals(runtime.program_counter, pc)
+        result.addCallback(self.assertEquals, pow(3, 100, 7))
+        return result
+
+    @protocol
+    def test_worker_exception(self, runtime):
+        self.addCleanup(runtime.stop_workers)
+        result = runtime.run_in_worker(divmod, 1, 0)
+        return self.assertFailure(result, ZeroDivisionError)
+
+    @protocol
+    def test_open_after_worker(self, runtime):
+        self.addCleanup(runtime.stop_workers)
+        result = runtime.run_in_worker(pow, 2, 10)
+        share = Share(runtime, self.Zp)
+        result.addCallback(lambda value: share.callback(self.Zp(value)))
+        opened = runtime.open(share)
+        opened.addCallback(self.assertEquals, self.Zp(1024))
+        return opened
+
+
+class StripingTest(RuntimeTestCase):
+    """Test distribution of frames over several connections."""
+
+    option_overrides = {"connections": 3}
+
+    @protocol
+    def test_connections(self, runtime):
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if peer_id != runtime.id:
+                self.assertEquals(len(protocol.stripes), 3)
+                for stripe in protocol.stripes:
+                    self.assertEquals(stripe.peer_id, peer_id)
+                    self.assertTrue(stripe.incoming_data is
+                                    protocol.incoming_data)
+
+    @protocol
+    def test_striped_mul(self, runtime):
+        shares = [Share(runtime, self.Zp, self.Zp(i)) for i in range(20)]
+        products = [runtime.mul(share, share) for share in shares]
+        opened = [runtime.open(product) for product in products]
+
+        def check(results):
+            self.assertEquals(results, [self.Zp(i * i) for i in range(20)])
+            for peer_id, protocol in runtime.protocols.iteritems():
+                if peer_id != runtime.id:
+                    # The program counters are spread over the
+                    # connections.
+                    used = [s for s in protocol.stripes if s.sent_packets]
+                    self.assertTrue(len(used) > 1)
+
+        result = gatherResults(opened)
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_same_program_counter(self, runtime):
+        # Frames with the same program counter keep their order.
+        pc = tuple(runtime.program_counter)
+        for peer_id in runtime.players:
+            for i in range(10):
+                runtime.protocols[peer_id].sendData(pc, TEXT, str(i))
+        results = []
+        for peer_id in runtime.players:
+            for i in range(10):
+                d = Deferred()
+                d.addCallback(self.assertEquals, str(i))
+                runtime._expect_data(peer_id, TEXT, d)
+                results.append(d)
+        return gatherResults(results)
+
+
+class TransferStatisticsTest(RuntimeTestCase):
+    """Test the statistics on transferred data."""
+
+    option_overrides = {"statistics": True}
+
+    @protocol
+    def test_open_statistics(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(runtime.id))
+        opened = runtime.open(share)
+
+        def check(_):
+            totals = runtime.transfer_statistics.as_dict()
+            peers = [str(p) for p in runtime.players if p != runtime.id]
+            self.assertEquals(sorted(totals["sent"]["peer"]), peers)
+            # The share is reconstructed as soon as threshold + 1
+            # shares have arrived, so a peer may not be counted yet.
+            for peer in totals["received"]["peer"]:
+                self.assertTrue(peer in peers)
+
+            sent = sum([runtime.protocols[p].sent_bytes
+                        for p in runtime.players if p != runtime.id])
+            self.assertEquals(totals["sent"]["data_type"]["SHARE"]["bytes"],
+                              sent)
+            received = totals["received"]["data_type"]["SHARE"]
+            self.assertTrue(received["packets"] >= 1)
+            self.assertTrue(0 <= received["first"] <= received["last"])
+
+        opened.addCallback(check)
+        return opened
+
+
+class TraceTest(RuntimeTestCase):
+    """Test the execution trace."""
+
+    option_overrides = {"trace": "trace-%d.json"}
+
+    @protocol
+    def test_open_trace(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(runtime.id))
+        opened = runtime.open(share)
+
+        def check(_):
+            events = runtime.tracer.as_dict()["traceEvents"]
+            peers = [p for p in runtime.players if p != runtime.id]
+            sent = [e["tid"] for e in events if e["name"] == "send"]
+            self.assertEquals(sorted(sent), peers)
+            for event in events:
+                self.assertEquals(event["pid"], runtime.id)
+                if event["name"] == "wait":
+                    self.assertTrue(event["tid"] in peers)
+
+        opened.addCallback(check)
+        return opened
+
+
+class RoundAnalysisTest(RuntimeTestCase):
+    """Test the analysis of the communication rounds."""
+
+    option_overrides = {"analyze_rounds": True}
+
+    @protocol
+    def test_open_rounds(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(runtime.id))
+        opened = runtime.open(share)
+
+        def check(_):
+            analyzer = runtime.round_analyzer
+            self.assertEquals(analyzer.rounds(), 1)
+            self.assertEquals(critical_path(analyzer.deepest), ["open"])
+            self.assertEquals(depth(opened._round), 1)
+
+        opened.addCallback(check)
+        return opened
+
+    @protocol
+    def test_mul_rounds(self, runtime):
+        a, b, c = runtime.shamir_share([1, 2, 3], self.Zp, runtime.id)
+        product = runtime.open(a * b * c)
+
+        def check(_):
+            analyzer = runtime.round_analyzer
+            # One round for the input, one for each multiplication,
+            # and one for opening the result.
+            self.assertEquals(analyzer.rounds(), 4)
+            self.assertEquals(critical_path(analyzer.deepest),
+                              ["shamir_share", "mul", "mul", "open"])
+            self.assertEquals(len(analyzer.messages_per_round()), 4)
+
+        product.addCallback(check)
+        return product
+
+
+class NetworkEmulationTest(RuntimeTestCase):
+    """Test the runtime over an emulated network."""
+
+    emulate_network = ["rtt=100,jitter=5,batch=1"]
+
+    @protocol
+    def test_open_delay(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(runtime.id))
+        # The shares from the peers may have been sent before we
+        # start, and the peers may disconnect before our share is
+        # delivered, so we check when our own share is due on the
+        # emulated link to each peer.
+        start = time.time()
+        opened = runtime.open(share)
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if peer_id != runtime.id:
+                shaped = protocol.transport
+                self.assertTrue(isinstance(shaped, ShapedTransport))
+                self.assertTrue(shaped._queue)
+                # The shares are delayed by half the round-trip time.
+                for due, _ in shaped._queue:
+                    self.assertTrue(due - start >= 0.05)
+        opened.addCallback(self.assertEquals, self.Zp(0))
+        return opened
+
+
+class EagerTest(RuntimeTestCase):
+    """Test local operations on shares with known values."""
+
+    @protocol
+    def test_add_known(self, runtime):
+        a = Share(runtime, self.Zp, self.Zp(3))
+        b = Share(runtime, self.Zp, self.Zp(4))
+        c = a + b
+        self.assertFalse(isinstance(c, ShareList))
+        self.assertEquals(share_value(c), self.Zp(7))
+        self.assertEquals(share_value(c + 1), self.Zp(8))
+        self.assertEquals(share_value(1 - c), self.Zp(-6))
+        self.assertEquals(share_value(c * 2), self.Zp(14))
+        self.assertEquals(share_value(runtime.lin_comb([2, 3], [a, b])),
+                          self.Zp(18))
+
+    @protocol
+    def test_add_pending(self, runtime):
+        a = Share(runtime, self.Zp)
+        b = Share(runtime, self.Zp, self.Zp(4))
+        c = a + b
+        d = c * 2
+        self.assertEquals(share_value(c), None)
+        self.assertEquals(share_value(d), None)
+        a.callback(self.Zp(3))
+        self.assertEquals(share_value(d), self.Zp(14))
+
+    @protocol
+    def test_disabled(self, runtime):
+        runtime.eager = False
+        a = Share(runtime, self.Zp, self.Zp(3))
+        b = Share(runtime, self.Zp, self.Zp(4))
+        c = a + b
+        self.assertTrue(isinstance(c, ShareList))
+        c.addCallback(self.assertEquals, self.Zp(7))
+        return c
+
+
+class ShareVectorTest(RuntimeTestCase):
+    """Test operations on vectors of shares."""
+
+    def _vector(self, runtime, values):
+        return runtime.input_vector([1], self.Zp, values)
+
+    @protocol
+    def test_input_open(self, runtime):
+        if runtime.id == 1:
+            values = range(10)
+        else:
+            values = [None] * 10
+        a = self._vector(runtime, values)
+        self.assertTrue(isinstance(a, ShareVector))
+        opened = runtime.open(a)
+        opened.addCallback(self.assertEquals, [self.Zp(i) for i in range(10)])
+        return opened
+
+    @protocol
+    def test_local_operations(self, runtime):
+        a = ShareVector(runtime, self.Zp, [self.Zp(i) for i in range(5)])
+        b = runtime.input_vector([2], self.Zp, [3] * 5 if runtime.id == 2
+                                 else [None] * 5)
+        c = runtime.lin_comb([2, 1], [a - 1, b + a]) * [1, 2, 3, 4, 5]
+        d = (10 - c)[1:4]
+        expected = [10 - (3 * i + 1) * (i + 1) for i in range(1, 4)]
+        opened = runtime.open(d)
+        opened.addCallback(self.assertEquals, map(self.Zp, expected))
+        return opened
+
+    @protocol
+    def test_mul(self, runtime):
+        a = ShareVector(runtime, self.Zp, [self.Zp(i) for i in range(20)])
+        b = ShareVector(runtime, self.Zp, size=20)
+        c = a * b
+        b.callback([self.Zp(i + 1) for i in range(20)])
+
+        def check(results):
+            self.assertEquals(results[0],
+                              [self.Zp(i * (i + 1)) for i in range(20)])
+            self.assertEquals(results[1], sum([i * (i + 1)
+                                               for i in range(20)]))
+            self.assertEquals(results[2], self.Zp(2 * 3))
+            # Each peer gets one message for the resharing and one
+            # for each of the three openings.
+            for peer_id, protocol in runtime.protocols.iteritems():
+                if peer_id != runtime.id:
+                    self.assertEquals(protocol.sent_packets, 4)
+
+        result = gatherResults([runtime.open(c), runtime.open(c.sum()),
+                                runtime.open(c[2])])
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_empty(self, runtime):
+        a = ShareVector(runtime, self.Zp, [])
+        b = runtime.shamir_share_vector([1], self.Zp, [])
+        c = runtime.input([2], self.Zp, 7 if runtime.id == 2 else None)
+        self.assertEquals(len(b), 0)
+        opened = [runtime.open(a * b), runtime.open(c * a),
+                  runtime.open(a + 1), runtime.open(c)]
+        result = gatherResults(opened)
+        result.addCallback(self.assertEquals, [[], [], [], self.Zp(7)])
+        return result
+
+    @protocol
+    def test_mul_share(self, runtime):
+        a = ShareVector(runtime, self.Zp, [self.Zp(i) for i in range(5)])
+        b = runtime.input([3], self.Zp, 7 if runtime.id == 3 else None)
+        c = a * b
+        d = b * a
+        self.assertTrue(isinstance(c, ShareVector))
+        self.assertTrue(isinstance(d, ShareVector))
+
+        def check(results):
+            expected = [self.Zp(7 * i) for i in range(5)]
+            self.assertEquals(results, [expected, expected])
+
+        result = gatherResults([runtime.open(c), runtime.open(d)])
+        result.addCallback(check)
+        return result
+
+    @protocol
+    def test_add_share(self, runtime):
+        a = ShareVector(runtime, self.Zp, [self.Zp(i) for i in range(5)])
+        b = runtime.input([3], self.Zp, 7 if runtime.id == 3 else None)
+
+        def check(results):
+            self.assertEquals(results,
+                              [[self.Zp(i + 7) for i in range(5)],
+                               [self.Zp(7 + i) for i in range(5)],
+                               [self.Zp(i - 7) for i in range(5)],
+                               [self.Zp(7 - i) for i in range(5)]])
+
+        result = gatherResults([runtime.open(a + b), runtime.open(b + a),
+                                runtime.open(a - b), runtime.open(b - a)])
+        result.addCallback(check)
+        return result
 
 
 class ConvertBitShareTest(RuntimeTestCase):
@@ -255,6 +880,89 @@ class ConvertBitShareTest(RuntimeTestCase):
         return gatherResults(results)
 
 
+class FakeConnector(object):
+
+    def __init__(self):
+        self.attempts = 0
+
+    def connect(self):
+        self.attempts += 1
+
+    def stopConnecting(self):
+        pass
+
+
+class ReconnectTest(TestCase):
+    """Test the retries of failed connections."""
+
+    def setUp(self):
+        self.factory = ShareExchangerFactory(None, {1: None, 2: None},
+                                             Deferred())
+        self.factory.clock = Clock()
+
+    def test_retry(self):
+        connector = FakeConnector()
+        self.factory.clientConnectionFailed(connector, None)
+        self.factory.clock.advance(0.05)
+        self.assertEquals(connector.attempts, 1)
+        self.assertEquals(self.factory.retry_calls, {})
+
+    def test_max_retries(self):
+        self.factory.maxRetries = 2
+        connector = FakeConnector()
+        for _ in range(3):
+            self.factory.clientConnectionFailed(connector, None)
+            self.factory.clock.advance(1)
+        self.assertEquals(connector.attempts, 2)
+
+    def test_stop_trying(self):
+        connector = FakeConnector()
+        self.factory.clientConnectionFailed(connector, None)
+        self.factory.stopTrying()
+        self.assertEquals(self.factory.clock.getDelayedCalls(), [])
+        self.factory.clientConnectionFailed(connector, None)
+        self.factory.clock.advance(1)
+        self.assertEquals(connector.attempts, 0)
+
+
+class ListenRetryTest(TestCase):
+    """Test the retries of failed attempts to listen."""
+
+    def setUp(self):
+        runtime = Runtime(Player(1, "localhost", 9000, None), 1)
+        self.ready = Deferred()
+        self.factory = ShareExchangerFactory(runtime, {1: None, 2: None},
+                                             self.ready)
+        self.factory.clock = Clock()
+        self.attempts = 0
+
+    def listen(self):
+        self.attempts += 1
+        raise CannotListenError("localhost", 9000, "in use")
+
+    def test_retry(self):
+        self.factory.start_listening(self.listen, "port 9000")
+        self.factory.clock.advance(1)
+        self.assertEquals(self.attempts, 2)
+        self.factory.stopTrying()
+        self.assertEquals(self.factory.clock.getDelayedCalls(), [])
+
+    def test_no_socket_retry(self):
+        self.factory.runtime.options.no_socket_retry = True
+        self.assertRaises(CannotListenError, self.factory.start_listening,
+                          self.listen, "port 9000")
+        self.assertEquals(self.factory.clock.getDelayedCalls(), [])
+
+    def test_no_socket_retry_in_retry(self):
+        self.factory.start_listening(self.listen, "port 9000")
+        self.factory.runtime.options.no_socket_retry = True
+        # The error is not raised in the reactor.
+        self.factory.clock.advance(1)
+        self.assertEquals(self.attempts, 2)
+        self.assertEquals(self.factory.clock.getDelayedCalls(), [])
+        return self.assertFailure(self.ready, CannotListenError)
+
+
 if 'STRESS' in os.environ:
 
     class StressTest(RuntimeTestCase):
@@ -127,6 +127,33 @@ class RuntimePrssTest(RuntimeTestCase):
 
         return gather_shares(a_list)
 
+    @protocol
+    def test_prss_share_random_bulk_bit(self, runtime):
+        """Tests the bulk sharing of 0/1 GF256 elements using PRSS."""
+        a_list = runtime.prss_share_random_bulk(GF256, 8, binary=True)
+        self.assertEquals(len(a_list), 8)
+
+        opened = []
+        for a in a_list:
+            self.assert_type(a, Share)
+            opened_a = runtime.open(a)
+            opened_a.addCallback(self.assertIn, [GF256(0), GF256(1)])
+            opened.append(opened_a)
+        return gather_shares(opened)
+
+    @protocol
+    def test_prss_share_random_bulk_int(self, runtime):
+        """Tests the bulk sharing of 0/1 Zp elements using PRSS."""
+        a_list = runtime.prss_share_random_bulk(self.Zp, 8, binary=True)
+
+        opened = []
+        for a in a_list:
+            self.assert_type(a, Share)
+            opened_a = runtime.open(a)
+            opened_a.addCallback(self.assertIn, [self.Zp(0), self.Zp(1)])
+            opened.append(opened_a)
+        return gather_shares(opened)
+
     @protocol
     def test_prss_share_zero_bit(self, runtime):
         """Tests the sharing of a zero GF256 element using PRSS."""
@@ -189,3 +216,24 @@ class RuntimePrssTest(RuntimeTestCase):
         result = gather_shares([runtime.open(bit_p), runtime.open(bit_b)])
         result.addCallback(lambda (a, b): self.assertEquals(a.value, b.value))
         return result
+
+
+class RuntimePrssWorkerTest(RuntimeTestCase):
+    """Tests bulk PRSS with the PRFs evaluated in worker processes."""
+
+    option_overrides = {"worker_processes": 2}
+
+    @protocol
+    def test_prss_share_random_bulk(self, runtime):
+        self.addCleanup(runtime.stop_workers)
+        a_list = runtime.prss_share_random_bulk(self.Zp, 10)
+        b_list = runtime.prss_share_random_bulk(self.Zp, 10, binary=True)
+
+        opened = []
+        for a, b in zip(a_list, b_list):
+            # The shares must be consistent, also with threshold 2t.
+            a_and_b = runtime.open(a * b, threshold=2*runtime.threshold)
+            opened_b = runtime.open(b)
+            opened_b.addCallback(self.assertIn, [self.Zp(0), self.Zp(1)])
+            opened.extend([a_and_b, opened_b])
+        return gather_shares(opened)
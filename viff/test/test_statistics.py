@@ -0,0 +1,52 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.statistics."""
+
+from twisted.trial.unittest import TestCase
+
+from viff.constants import SHARE, ECHO
+from viff.statistics import TransferStatistics, SENT, RECEIVED, json
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.statistics']
+
+
+class TransferStatisticsTest(TestCase):
+
+    def test_prefix_length(self):
+        stats = TransferStatistics(prefix_length=2)
+        stats.record(SENT, 2, SHARE, (1, 2, 3), 10)
+        stats.record(SENT, 2, SHARE, (1, 2, 4), 10)
+        stats.record(SENT, 2, SHARE, (1, 3), 10)
+        prefixes = stats.as_dict()[SENT]["pc_prefix"]
+        self.assertEquals(prefixes["1.2"]["packets"], 2)
+        self.assertEquals(prefixes["1.3"]["packets"], 1)
+
+    def test_unknown_data_type(self):
+        stats = TransferStatistics()
+        stats.record(RECEIVED, 3, 42, (1,), 10)
+        self.assertEquals(stats.as_dict()[RECEIVED]["data_type"]["42"]
+                          ["bytes"], 10)
+
+    def test_dump(self):
+        stats = TransferStatistics()
+        stats.record(SENT, 2, SHARE, (1,), 10)
+        stats.record(RECEIVED, 2, ECHO, (1,), 20)
+        filename = self.mktemp()
+        stats.dump(filename)
+        self.assertEquals(json.load(open(filename)), stats.as_dict())
@@ -0,0 +1,160 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.tls."""
+
+import os
+from optparse import OptionParser
+
+from twisted.trial.unittest import TestCase
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, gatherResults
+
+try:
+    from OpenSSL import SSL, crypto
+    from viff.tls import TLSContextFactory, certificate_path
+    from viff.tls import describe_connection
+except ImportError:
+    SSL = None
+
+from viff.runtime import Runtime, ShareExchangerFactory, FakeTransport
+from viff.config import generate_configs, load_config
+
+
+def make_certificates(path, n):
+    """Write a CA certificate and certificates for players 1 to *n*
+    in the directory *path*, like :file:`apps/generate-certificates.py`.
+
+    Returns the templates for the certificate, key, and CA files.
+    """
+    def create_cert(subject, key, issuer, issuer_key, serial):
+        cert = crypto.X509()
+        cert.set_serial_number(serial)
+        cert.gmtime_adj_notBefore(0)
+        cert.gmtime_adj_notAfter(60 * 60 * 24)
+        cert.get_subject().CN = subject
+        cert.set_issuer((issuer or cert).get_subject())
+        cert.set_pubkey(key)
+        cert.sign(issuer_key, "sha256")
+        return cert
+
+    def save(name, data):
+        fp = open(os.path.join(path, name), "w")
+        fp.write(data)
+        fp.close()
+
+    ca_key = crypto.PKey()
+    ca_key.generate_key(crypto.TYPE_RSA, 2048)
+    ca_cert = create_cert("VIFF Certificate Authority", ca_key,
+                          None, ca_key, 0)
+    save("ca.cert", crypto.dump_certificate(crypto.FILETYPE_PEM, ca_cert))
+    for id in range(1, n + 1):
+        key = crypto.PKey()
+        key.generate_key(crypto.TYPE_RSA, 2048)
+        cert = create_cert("VIFF Player %d" % id, key, ca_cert, ca_key, id)
+        save("player-%d.key" % id,
+             crypto.dump_privatekey(crypto.FILETYPE_PEM, key))
+        save("player-%d.cert" % id,
+             crypto.dump_certificate(crypto.FILETYPE_PEM, cert))
+    return [os.path.join(path, name) for name in
+            "player-%d.cert", "player-%d.key", "ca.cert"]
+
+
+class TLSContextFactoryTest(TestCase):
+    """Test the TLS context factory."""
+
+    def test_certificate_path(self):
+        self.assertEquals(certificate_path("trial-%d.cert", 2),
+                          "trial-2.cert")
+        self.assertEquals(certificate_path("ca.cert", 2), "ca.cert")
+
+    def test_missing_certificate(self):
+        self.assertRaises(SystemExit, TLSContextFactory, 1,
+                          self.mktemp(), self.mktemp(), self.mktemp())
+
+    def test_describe_plain_transport(self):
+        self.assertEquals(describe_connection(FakeTransport()), None)
+
+
+class TLSConnectionTest(TestCase):
+    """Test two runtimes connected over TLS on the loopback interface."""
+
+    timeout = 20
+
+    def setUp(self):
+        path = self.mktemp()
+        os.mkdir(path)
+        files = make_certificates(path, 2)
+        configs = generate_configs(2, 1)
+        self.runtimes = []
+        ready = []
+        for id in 1, 2:
+            _, players = load_config(configs[id])
+            parser = OptionParser()
+            Runtime.add_options(parser)
+            options = parser.get_default_values()
+            options.ssl = True
+            runtime = Runtime(players[id], 1, options)
+            result = Deferred()
+            factory = ShareExchangerFactory(runtime, players, result)
+            ctx_factory = TLSContextFactory(id, *files)
+            if id == 2:
+                self.port = reactor.listenSSL(0, factory, ctx_factory,
+                                              interface="127.0.0.1")
+            else:
+                factory1, ctx_factory1 = factory, ctx_factory
+            self.runtimes.append(runtime)
+            ready.append(result)
+        reactor.connectSSL("127.0.0.1", self.port.getHost().port,
+                           factory1, ctx_factory1)
+        return gatherResults(ready)
+
+    def tearDown(self):
+        return self.port.stopListening()
+
+    def close_connections(self):
+        lost = []
+        for runtime in self.runtimes:
+            for protocol in runtime.protocols.itervalues():
+                lost.append(protocol.lost_connection)
+                protocol.loseConnection()
+        return DeferredList(lost)
+
+    def test_handshake(self):
+        for runtime in self.runtimes:
+            peer_id = 3 - runtime.id
+            protocol = runtime.protocols[peer_id]
+            self.assertEquals(protocol.transport.getPeerCertificate()
+                              .get_serial_number(), peer_id)
+            # The description is kept after the connection is closed.
+            description = protocol.tls_description.split()
+            self.assertTrue(description[0] in ("TLSv1.2", "TLSv1.3"))
+            self.assertTrue("GCM" in description[1] or
+                            "CHACHA20" in description[1])
+        return self.close_connections()
+
+    def test_shutdown(self):
+        # The send throttle is registered as producer by default and
+        # must not keep the connections open.
+        for runtime in self.runtimes:
+            self.assertTrue(runtime.options.send_buffer_limit > 0)
+        return self.close_connections()
+
+
+if SSL is None:
+    TLSContextFactoryTest.skip = "Skipped due to missing OpenSSL module."
+    TLSConnectionTest.skip = "Skipped due to missing OpenSSL module."
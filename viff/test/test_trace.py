@@ -0,0 +1,73 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.trace."""
+
+from twisted.trial.unittest import TestCase
+
+from viff.constants import SHARE
+from viff.trace import Tracer, json
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.trace']
+
+
+class TracerTest(TestCase):
+
+    def test_ring_buffer(self):
+        tracer = Tracer(1, size=3)
+        for i in range(5):
+            tracer.instant("event %d" % i, "test")
+        trace = tracer.as_dict()
+        names = [e["name"] for e in trace["traceEvents"] if e["ph"] == "i"]
+        self.assertEquals(names, ["event 2", "event 3", "event 4"])
+        self.assertEquals(trace["otherData"]["dropped"], 2)
+
+    def test_messages(self):
+        tracer = Tracer(2)
+        tracer.send(3, SHARE, (0, 1), 10)
+        tracer.receive(1, SHARE, (0, 1), 12)
+        events = tracer.as_dict()["traceEvents"]
+        sends = [e for e in events if e["name"] == "send"]
+        self.assertEquals(sends[0]["tid"], 3)
+        self.assertEquals(sends[0]["args"],
+                          {"type": "SHARE", "pc": "0.1", "bytes": 10})
+        threads = [e["args"]["name"] for e in events
+                   if e["name"] == "thread_name"]
+        self.assertEquals(threads, ["runtime", "peer 1", "peer 3"])
+
+    def test_unfinished_wait(self):
+        tracer = Tracer(1)
+        tracer.wait_begin(2, (0, 1), SHARE)
+        tracer.wait_begin(3, (0, 1), SHARE)
+        tracer.wait_end(3, (0, 1), SHARE)
+        # Data which nobody waited for is ignored.
+        tracer.wait_end(2, (0, 2), SHARE)
+        waits = [e for e in tracer.as_dict()["traceEvents"]
+                 if e["name"] == "wait"]
+        self.assertEquals(sorted([(e["tid"], "unfinished" in e["args"])
+                                  for e in waits]),
+                          [(2, True), (3, False)])
+
+    def test_dump(self):
+        tracer = Tracer(1)
+        tracer.complete("open", "operation", tracer.now(), {"pc": "0.1"})
+        filename = self.mktemp()
+        tracer.dump(filename)
+        trace = json.load(open(filename))
+        self.assertEquals(trace["otherData"]["player"], 1)
+        self.assertEquals(trace["traceEvents"][-1]["name"], "open")
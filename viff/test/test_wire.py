@@ -0,0 +1,308 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for viff.wire."""
+
+import struct
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.defer import Deferred, gatherResults
+
+try:
+    from gmpy import mpz
+except ImportError:
+    mpz = None
+
+from viff.field import GF, GF256
+from viff.wire import share_codec, element_width
+from viff.wire import ProgramCounterEncoder, ProgramCounterDecoder
+from viff.wire import encode_integers, decode_integers
+from viff.runtime import Share, ShareExchanger
+from viff.constants import TEXT
+from viff.test.util import RuntimeTestCase, protocol
+
+#: Declare doctests for Trial.
+__doctests__ = ['viff.wire']
+
+
+class BinaryCodecTest(TestCase):
+    """Test the fixed-width binary encoding of field elements."""
+
+    moduli = [2, 3, 256, 257, 65537, 2**31 - 1, 2**61 - 1,
+              30916444023318367583, 2**127 - 1, 2**521 - 1]
+
+    def test_round_trip(self):
+        for modulus in self.moduli:
+            Zp = GF(modulus)
+            codec = share_codec(Zp, True)
+            for value in [0, 1, modulus // 3, modulus - 1]:
+                data = codec.encode(Zp(value))
+                self.assertEquals(len(data), element_width(modulus))
+                self.assertEquals(codec.decode(data), Zp(value))
+
+    def test_big_endian(self):
+        Zp = GF(2**31 - 1)
+        codec = share_codec(Zp, True)
+        self.assertEquals(codec.encode(Zp(0x1020304)), "\x01\x02\x03\x04")
+
+    def test_gf256(self):
+        codec = share_codec(GF256, True)
+        for value in range(256):
+            self.assertEquals(codec.decode(codec.encode(GF256(value))),
+                              GF256(value))
+
+    def test_smaller_than_hex(self):
+        Zp = GF(30916444023318367583)
+        element = Zp(30916444023318367582)
+        binary = share_codec(Zp, True).encode(element)
+        text = share_codec(Zp, False).encode(element)
+        self.assertTrue(2 * len(binary) <= len(text))
+
+    def test_cached(self):
+        Zp = GF(19)
+        self.assertIdentical(share_codec(Zp, True), share_codec(Zp, True))
+        self.assertNotIdentical(share_codec(Zp, True),
+                                share_codec(Zp, False))
+
+
+class IntegerCodecTest(TestCase):
+    """Test the encoding of integers of arbitrary size."""
+
+    def test_round_trip(self):
+        values = [0, 1, -1, 255, 256, -65536, 2**64, -(2**521 - 1),
+                  30916444023318367583]
+        self.assertEquals(decode_integers(encode_integers(values)), values)
+
+    def test_mpz(self):
+        values = [mpz(3)**200, -mpz(7)]
+        self.assertEquals(decode_integers(encode_integers(values)), values)
+
+    if mpz is None:
+        test_mpz.skip = "Skipped due to missing gmpy module."
+
+    def test_smaller_than_decimal(self):
+        values = [2**2048 - 12345] * 10
+        self.assertTrue(len(encode_integers(values)) * 2 <
+                        len(repr(values)))
+
+    def test_empty(self):
+        self.assertEquals(decode_integers(encode_integers([])), [])
+
+    def test_truncated(self):
+        data = encode_integers([2**100, 5])
+        self.assertRaises(ValueError, decode_integers, data[:-1])
+        self.assertRaises(ValueError, decode_integers, data[:5])
+
+    def test_trailing_data(self):
+        data = encode_integers([1, 2])
+        self.assertRaises(ValueError, decode_integers, data + "x")
+
+
+class ProgramCounterCompressionTest(TestCase):
+    """Test the program counter dictionary."""
+
+    def test_round_trip(self):
+        encoder = ProgramCounterEncoder(4)
+        decoder = ProgramCounterDecoder()
+        pcs = [(0, 1), (0, 2), (0, 2, 0, 1), (7, 300, 2**31, 5),
+               (0, 2, 0, 2), (1,), (0, 1)] * 3
+        for pc in pcs:
+            data = encoder.encode(pc)
+            self.assertEquals(decoder.decode(data, 0), (pc, len(data)))
+
+    def test_reuse_ids(self):
+        encoder = ProgramCounterEncoder(2)
+        decoder = ProgramCounterDecoder()
+        # The dictionary only holds two prefixes, so the IDs are
+        # reused when a third prefix is seen.
+        for pc in [(1, 1), (2, 1), (3, 1), (1, 2), (3, 2), (2, 2)]:
+            self.assertEquals(decoder.decode(encoder.encode(pc), 0)[0], pc)
+
+    def test_unknown_prefix(self):
+        decoder = ProgramCounterDecoder()
+        self.assertRaises(ValueError, decoder.decode, "\x02\x01", 0)
+
+    def test_truncated(self):
+        decoder = ProgramCounterDecoder()
+        self.assertRaises(ValueError, decoder.decode, "\x01\x03\x00", 0)
+
+
+class ReceiveBufferTest(TestCase):
+    """Test splitting of incoming data into frames."""
+
+    def setUp(self):
+        self.protocol = ShareExchanger()
+        self.protocol.peer_id = 1
+        self.frames = []
+        self.protocol.frameReceived = self.frame_received
+        pc = (0, 1)
+        self.data = ["a" * 10, "", "b" * 300]
+        self.wire = "".join([self.frame(pc, data) for data in self.data])
+
+    def frame(self, pc, data):
+        return struct.pack("!H", 5 + 4 * len(pc) + len(data)) \
+            + ShareExchanger.header.pack(len(pc), len(data), TEXT) \
+            + struct.pack("!%dI" % len(pc), *pc) + data
+
+    def frame_received(self, buffer, start, end):
+        self.frames.append(buffer[start:end])
+
+    def payloads(self):
+        return [frame[13:] for frame in self.frames]
+
+    def test_single_chunk(self):
+        self.protocol.dataReceived(self.wire)
+        self.assertEquals(self.payloads(), self.data)
+
+    def test_byte_by_byte(self):
+        for byte in self.wire:
+            self.protocol.dataReceived(byte)
+        self.assertEquals(self.payloads(), self.data)
+
+    def test_partial_frame(self):
+        self.protocol.dataReceived(self.wire[:-1])
+        self.assertEquals(self.payloads(), self.data[:2])
+        self.protocol.dataReceived(self.wire[-1:])
+        self.assertEquals(self.payloads(), self.data)
+
+
+class NegotiationTest(RuntimeTestCase):
+    """Test that the wire features are negotiated and used."""
+
+    @protocol
+    def test_negotiated(self, runtime):
+        for protocol in runtime.protocols.itervalues():
+            self.assertTrue(protocol.binary_shares)
+
+    @protocol
+    def test_wide_frames(self, runtime):
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if peer_id != runtime.id:
+                self.assertEquals(protocol.prefixLength, 4)
+        self.assertEquals(runtime.max_payload(),
+                          ShareExchanger.wide_max_payload)
+
+    @protocol
+    def test_pc_compression(self, runtime):
+        pc = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if peer_id != runtime.id:
+                self.assertTrue(protocol.compress_pcs)
+                protocol.sendData(pc, TEXT, "")
+                protocol.sendData(pc[:-1] + (10,), TEXT, "")
+                # One byte of data type, a two-byte reference to the
+                # prefix, and the last component.
+                self.assertEquals(protocol.sent_bytes, 13 + 3)
+        results = []
+        for peer_id in runtime.players:
+            if peer_id != runtime.id:
+                for last in 9, 10:
+                    d = Deferred()
+                    runtime._expect_data_with_pc(pc[:-1] + (last,),
+                                                 peer_id, TEXT, d)
+                    results.append(d)
+        return gatherResults(results)
+
+    @protocol
+    def test_large_frame(self, runtime):
+        data = "x" * 200000
+        pc = tuple(runtime.program_counter)
+        results = []
+        for peer_id in runtime.players:
+            runtime.protocols[peer_id].sendData(pc, TEXT, data)
+        for peer_id in runtime.players:
+            d = Deferred()
+            d.addCallback(self.assertEquals, data)
+            runtime._expect_data(peer_id, TEXT, d)
+            results.append(d)
+        return gatherResults(results)
+
+    @protocol
+    def test_exchange(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(2**64 + 3))
+        opened = runtime.open(share * share)
+        opened.addCallback(self.assertEquals, self.Zp((2**64 + 3)**2))
+        return opened
+
+
+class HexNegotiationTest(RuntimeTestCase):
+    """Test a player that does not support the binary encoding."""
+
+    def runtime_options(self, id):
+        # Player 1 only knows the hexadecimal encoding.
+        return self.make_options(binary_shares=id != 1)
+
+    @protocol
+    def test_fallback(self, runtime):
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if runtime.id == 1 or peer_id == 1:
+                self.assertFalse(protocol.binary_shares)
+            else:
+                self.assertTrue(protocol.binary_shares)
+
+    @protocol
+    def test_exchange(self, runtime):
+        share = Share(runtime, self.Zp, self.Zp(42))
+        opened = runtime.open(share * share)
+        opened.addCallback(self.assertEquals, self.Zp(42 * 42))
+        return opened
+
+
+class NarrowFramesTest(RuntimeTestCase):
+    """Test a player that only supports 16-bit frames."""
+
+    def runtime_options(self, id):
+        return self.make_options(wide_frames=id != 1)
+
+    @protocol
+    def test_fallback(self, runtime):
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if runtime.id == 1 or peer_id == 1:
+                self.assertEquals(protocol.prefixLength, 2)
+            else:
+                self.assertEquals(protocol.prefixLength, 4)
+        self.assertEquals(runtime.max_payload(), ShareExchanger.max_payload)
+
+    @protocol
+    def test_many_shares(self, runtime):
+        shares = [Share(runtime, self.Zp, self.Zp(i)) for i in range(10000)]
+        result = gatherResults(runtime.open(shares))
+        result.addCallback(self.assertEquals,
+                           [self.Zp(i) for i in range(10000)])
+        return result
+
+
+class UncompressedProgramCounterTest(RuntimeTestCase):
+    """Test a player that sends full program counters."""
+
+    def runtime_options(self, id):
+        return self.make_options(pc_compression=id != 1)
+
+    @protocol
+    def test_fallback(self, runtime):
+        for peer_id, protocol in runtime.protocols.iteritems():
+            if runtime.id == 1 or peer_id == 1:
+                self.assertFalse(protocol.compress_pcs)
+            else:
+                self.assertTrue(protocol.compress_pcs)
+
+    @protocol
+    def test_exchange(self, runtime):
+        a, b, c = runtime.shamir_share([1, 2, 3], self.Zp, runtime.id)
+        result = runtime.open(a * b * c)
+        result.addCallback(self.assertEquals, self.Zp(6))
+        return result
@@ -27,9 +27,10 @@ from viff.field import GF
 from viff.config import generate_configs, load_config
 from viff.util import rand
 from viff.test.loopback import loopbackAsync
-from viff.reactor import ViffReactor
+from viff.reactor import ViffReactorMixin
 
 from random import Random
+from optparse import OptionParser
 
 
 def protocol(method):
@@ -105,6 +106,16 @@ class RuntimeTestCase(TestCase):
     #: or to sample the same subsequence from a sequence.
     shared_rand = None
 
+    #: Link descriptions used to emulate a slower network between the
+    #: players, in the format of the ``--emulate-network`` option.
+    #: See :mod:`viff.netem`.
+    emulate_network = None
+
+    #: Options given to the runtimes of all players, as a dictionary
+    #: mapping option names to values. The other options keep their
+    #: default values. See :meth:`runtime_options`.
+    option_overrides = {}
+
     def assert_type(self, var, wanted_type):
         """Assert that C{var} has the type C{wanted_type}."""
         if not isinstance(var, wanted_type):
@@ -114,6 +125,24 @@ class RuntimeTestCase(TestCase):
     def generate_configs(self, *args):
         return generate_configs(*args)
 
+    def make_options(self, **overrides):
+        """Return the default options of :attr:`runtime_class` with
+        the given *overrides* applied."""
+        parser = OptionParser()
+        self.runtime_class.add_options(parser)
+        options = parser.get_default_values()
+        for name, value in overrides.iteritems():
+            setattr(options, name, value)
+        return options
+
+    def runtime_options(self, id):
+        """Return the options for the runtime of player *id*.
+
+        The default is the options given by :attr:`option_overrides`.
+        Override this method to give the players different options.
+        """
+        return self.make_options(**self.option_overrides)
+
     def setUp(self):
         """Configure and connect three Runtimes.
 
@@ -143,7 +172,7 @@ class RuntimeTestCase(TestCase):
             _, players = load_config(configs[id])
             self.create_loopback_runtime(id, players)
 
-        if isinstance(reactor, ViffReactor):
+        if isinstance(reactor, ViffReactorMixin):
             def set_loop_call(runtimes):
                 self.i = 0
 
@@ -151,10 +180,17 @@ class RuntimeTestCase(TestCase):
                 # processed in a more or less fair manner. This is necessary
                 # because we have only one reactor for all parties here.
                 def loop_call():
-                    i = self.i
-                    for j in range(len(runtimes)):
-                        self.i = (self.i + 1) % len(runtimes)
-                        runtimes[(i + j) % len(runtimes)].process_deferred_queue()
+                    # Processing the queue of one party may queue more
+                    # work for the others, so continue until no party
+                    # has more work.
+                    while True:
+                        i = self.i
+                        for j in range(len(runtimes)):
+                            self.i = (self.i + 1) % len(runtimes)
+                            runtimes[(i + j) % len(runtimes)].process_deferred_queue()
+                        if not [r for r in runtimes
+                                if r.has_pending_callbacks()]:
+                            break
 
                 reactor.setLoopCall(loop_call)
 
@@ -193,7 +229,10 @@ class RuntimeTestCase(TestCase):
         # Create a runtime that knows about no other players than itself.
         # It will eventually be returned in result when the factory has
         # determined that all needed protocols are ready.
-        runtime = self.runtime_class(players[id], self.threshold)
+        options = self.runtime_options(id)
+        if self.emulate_network is not None:
+            options.emulate_network = self.emulate_network
+        runtime = self.runtime_class(players[id], self.threshold, options)
         factory = ShareExchangerFactory(runtime, players, result)
         # We add the Deferred passed to ShareExchangerFactory and not
         # the Runtime, since we want everybody to wait until all
@@ -202,27 +241,35 @@ class RuntimeTestCase(TestCase):
 
         for peer_id in players:
             if peer_id != id:
-                protocol = ShareExchanger()
-                protocol.factory = factory
-
-                # Keys for when we are the client and when we are the server.
-                client_key = (id, peer_id)
-                server_key = (peer_id, id)
-                # Store a protocol used when we are the server.
-                self.protocols[server_key] = protocol
-
-                if peer_id > id:
-                    # Make a "connection" to the other player. We are
-                    # the client (because we initiate the connection)
-                    # and the other player is the server.
-                    client = self.protocols[client_key]
-                    server = self.protocols[server_key]
-                    # The loopback connection pumps data back and
-                    # forth, and when both sides has closed the
-                    # connection, then the returned Deferred will
-                    # fire.
-                    sentinel = loopbackAsync(server, client)
-                    self.close_sentinels.append(sentinel)
+                # The player with the lowest ID decides the number of
+                # connections between the two players.
+                connections = \
+                    self.runtime_options(min(id, peer_id)).connections
+
+                for stripe in range(connections):
+                    protocol = ShareExchanger()
+                    protocol.factory = factory
+
+                    # Keys for when we are the client and when we are
+                    # the server.
+                    client_key = (id, peer_id, stripe)
+                    server_key = (peer_id, id, stripe)
+                    # Store a protocol used when we are the server.
+                    self.protocols[server_key] = protocol
+
+                    if peer_id > id:
+                        # Make a "connection" to the other player. We
+                        # are the client (because we initiate the
+                        # connection) and the other player is the
+                        # server.
+                        client = self.protocols[client_key]
+                        server = self.protocols[server_key]
+                        # The loopback connection pumps data back and
+                        # forth, and when both sides has closed the
+                        # connection, then the returned Deferred will
+                        # fire.
+                        sentinel = loopbackAsync(server, client)
+                        self.close_sentinels.append(sentinel)
             else:
                 protocol = SelfShareExchanger(id, SelfShareExchangerFactory(runtime))
                 protocol.transport = FakeTransport()
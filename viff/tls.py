@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""TLS for the connections between players. This module requires
+the OpenSSL bindings from pyOpenSSL and is only imported by
+:func:`~viff.runtime.create_runtime` when SSL is enabled.
+
+Connections use TLS 1.2 or later with ciphers that provide forward
+secrecy and authenticated encryption. The players authenticate each
+other with certificates signed by a common CA. The player ID is stored
+in the serial number of the certificate, see
+:file:`apps/generate-certificates.py`.
+"""
+
+from OpenSSL import SSL, crypto
+from twisted.internet.ssl import ContextFactory
+
+#: Ciphers allowed for TLS 1.2, in order of preference. These are AEAD
+#: ciphers with ephemeral key exchange. TLS 1.3 only has such ciphers
+#: and uses the OpenSSL defaults.
+CIPHERS = "ECDHE+AESGCM:ECDHE+CHACHA20:DHE+AESGCM:DHE+CHACHA20:" \
+    "!aNULL:!eNULL:!MD5:!DSS"
+
+#: Protocol versions which are disabled. The constants are missing in
+#: old versions of pyOpenSSL, so their values are given as fallback.
+_DISABLED_PROTOCOLS = [("OP_NO_SSLv2", 0x01000000),
+                       ("OP_NO_SSLv3", 0x02000000),
+                       ("OP_NO_TLSv1", 0x04000000),
+                       ("OP_NO_TLSv1_1", 0x10000000)]
+
+#: Elliptic curve used for ECDHE with OpenSSL versions that do not
+#: select one automatically.
+_ECDH_CURVE = "prime256v1"
+
+
+def certificate_path(template, id):
+    """Return the path of a certificate or key file for player *id*.
+
+    A ``%d`` in *template* is replaced by the player ID:
+
+    >>> certificate_path("player-%d.cert", 3)
+    'player-3.cert'
+    >>> certificate_path("ca.cert", 3)
+    'ca.cert'
+    """
+    if "%d" in template:
+        return template % id
+    return template
+
+
+class TLSContextFactory(ContextFactory):
+    """Create the TLS context used for all connections of a player.
+
+    The same context is used when accepting and when making
+    connections. Every connection does a full handshake, sessions are
+    not resumed.
+    """
+
+    def __init__(self, id, cert_file="player-%d.cert",
+                 key_file="player-%d.key", ca_file="ca.cert"):
+        """Create new TLS context factory for player *id*.
+
+        The file names may contain ``%d`` which is replaced by *id*.
+        """
+        self.id = id
+        method = getattr(SSL, "TLS_METHOD", SSL.SSLv23_METHOD)
+        ctx = SSL.Context(method)
+        options = 0
+        for name, value in _DISABLED_PROTOCOLS:
+            options |= getattr(SSL, name, value)
+        options |= getattr(SSL, "OP_CIPHER_SERVER_PREFERENCE", 0)
+        options |= getattr(SSL, "OP_NO_COMPRESSION", 0)
+        ctx.set_options(options)
+        ctx.set_cipher_list(CIPHERS)
+        try:
+            ctx.set_tmp_ecdh(crypto.get_elliptic_curve(_ECDH_CURVE))
+        except AttributeError:
+            # Old pyOpenSSL without ECDH support. The DHE ciphers are
+            # still available.
+            pass
+        # OpenSSL needs a session ID context when it verifies client
+        # certificates.
+        ctx.set_session_id("viff-%d" % id)
+        try:
+            ctx.use_certificate_file(certificate_path(cert_file, id))
+            ctx.use_privatekey_file(certificate_path(key_file, id))
+            ctx.check_privatekey()
+            ctx.load_verify_locations(certificate_path(ca_file, id))
+            ctx.set_verify(SSL.VERIFY_PEER | SSL.VERIFY_FAIL_IF_NO_PEER_CERT,
+                           lambda conn, cert, errnum, depth, ok: ok)
+            self.ctx = ctx
+        except SSL.Error, e:
+            print "SSL errors - did you forget to generate certificates?"
+            for (lib, func, reason) in e.args[0]:
+                print "* %s in %s: %s" % (func, lib, reason)
+            raise SystemExit("Stopping program")
+
+    def getContext(self):
+        return self.ctx
+
+
+def describe_connection(transport):
+    """Return a short description of the TLS connection used by
+    *transport*, or :const:`None` if it does not use TLS.
+
+    The description contains the protocol version and the cipher, as
+    far as pyOpenSSL provides this information. It is only available
+    while the connection is open, so the
+    :class:`~viff.runtime.ShareExchanger` records it when the peer is
+    identified.
+    """
+    try:
+        connection = transport.getHandle()
+    except AttributeError:
+        return None
+    if not isinstance(connection, SSL.Connection):
+        return None
+    parts = []
+    for method in "get_protocol_version_name", "get_cipher_name":
+        try:
+            parts.append(getattr(connection, method)())
+        except AttributeError:
+            pass
+    if parts:
+        return " ".join(parts)
+    return "TLS"
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
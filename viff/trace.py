@@ -0,0 +1,196 @@
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Execution traces in the Chrome trace event format. When the
+``--trace`` option is given, the :class:`~viff.runtime.Runtime`
+records what it does in a :class:`Tracer` and writes the trace to a
+file on shutdown. The file can be loaded in ``chrome://tracing`` or
+in the Perfetto UI.
+
+Each player is shown as a process. Thread 0 shows the scheduler
+passes, the reactor iterations, and the operations decorated with
+:func:`viff.util.profile` if the :envvar:`VIFF_TRACE` environment
+variable is set. There is a thread for each peer with the frames sent
+to and received from the peer, and with the time spent waiting for
+data from it:
+
+>>> tracer = Tracer(1)
+>>> start = tracer.now()
+>>> tracer.wait_begin(2, (0, 7), 1)
+>>> tracer.wait_end(2, (0, 7), 1)
+>>> tracer.complete("open", "operation", start, {"pc": "0.7"})
+>>> [event["name"] for event in tracer.as_dict()["traceEvents"]
+...  if event["ph"] == "X"]
+['wait', 'open']
+
+The events are kept in a ring buffer, so only the most recent events
+are exported from long runs. The time stamps are in microseconds since
+the epoch, which makes it possible to compare the traces of players
+running on hosts with synchronized clocks.
+"""
+
+import time
+from collections import deque
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from viff.statistics import DATA_TYPE_NAMES
+
+
+def format_pc(program_counter):
+    """Return *program_counter* written with dots.
+
+    >>> format_pc((0, 3, 1))
+    '0.3.1'
+    """
+    return ".".join(map(str, program_counter))
+
+
+class Tracer(object):
+    """Ring buffer of trace events for a player."""
+
+    def __init__(self, player_id, size=100000):
+        """Create an empty trace for the player with ID *player_id*.
+
+        At most *size* events are kept.
+        """
+        self.player_id = player_id
+        #: The recorded events. Each event is a tuple with the phase,
+        #: name, category, time stamp, duration, thread, and arguments.
+        self.events = deque(maxlen=size)
+        #: Number of events recorded, including those which are no
+        #: longer in the buffer.
+        self.recorded = 0
+        # Maps (peer_id, program counter, data type) to a list with
+        # the times at which we began waiting for that data.
+        self._waits = {}
+
+    def now(self):
+        """Return the current time stamp in microseconds."""
+        return time.time() * 1e6
+
+    def _record(self, phase, name, category, timestamp, duration=None,
+                tid=0, args=None):
+        self.events.append((phase, name, category, timestamp, duration,
+                            tid, args))
+        self.recorded += 1
+
+    def instant(self, name, category, args=None, tid=0):
+        """Record an event without duration."""
+        self._record("i", name, category, self.now(), tid=tid, args=args)
+
+    def complete(self, name, category, start, args=None, tid=0):
+        """Record an event which began at time stamp *start* and ends
+        now."""
+        self._record("X", name, category, start, self.now() - start,
+                     tid, args)
+
+    def send(self, peer_id, data_type, program_counter, size):
+        """Record a frame sent to *peer_id*."""
+        self.instant("send", "network",
+                     {"type": DATA_TYPE_NAMES.get(data_type, data_type),
+                      "pc": format_pc(program_counter), "bytes": size},
+                     tid=peer_id)
+
+    def receive(self, peer_id, data_type, program_counter, size):
+        """Record a frame received from *peer_id*."""
+        self.instant("receive", "network",
+                     {"type": DATA_TYPE_NAMES.get(data_type, data_type),
+                      "pc": format_pc(program_counter), "bytes": size},
+                     tid=peer_id)
+
+    def wait_begin(self, peer_id, program_counter, data_type):
+        """Record that we began waiting for data from *peer_id*."""
+        key = (peer_id, program_counter, data_type)
+        self._waits.setdefault(key, []).append(self.now())
+
+    def wait_end(self, peer_id, program_counter, data_type):
+        """Record that the data we waited for arrived from *peer_id*."""
+        key = (peer_id, program_counter, data_type)
+        starts = self._waits.get(key)
+        if not starts:
+            return
+        start = starts.pop(0)
+        if not starts:
+            del self._waits[key]
+        self.complete("wait", "wait",
+                      start, {"type": DATA_TYPE_NAMES.get(data_type,
+                                                          data_type),
+                              "pc": format_pc(program_counter)},
+                      tid=peer_id)
+
+    def as_dict(self):
+        """Return the trace as a dictionary in the Chrome trace event
+        format.
+
+        Waits which have not ended are included with the duration
+        they have had so far.
+        """
+        pid = self.player_id
+        events = [{"name": "process_name", "ph": "M", "pid": pid,
+                   "args": {"name": "Player %d" % pid}},
+                  {"name": "thread_name", "ph": "M", "pid": pid, "tid": 0,
+                   "args": {"name": "runtime"}}]
+        peers = set()
+        for phase, name, category, ts, dur, tid, args in self.events:
+            event = {"name": name, "cat": category, "ph": phase,
+                     "ts": ts, "pid": pid, "tid": tid}
+            if dur is not None:
+                event["dur"] = dur
+            if phase == "i":
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            events.append(event)
+            if tid:
+                peers.add(tid)
+
+        now = self.now()
+        for (peer_id, program_counter, data_type), starts \
+                in self._waits.iteritems():
+            for start in starts:
+                events.append({"name": "wait", "cat": "wait", "ph": "X",
+                               "ts": start, "dur": now - start,
+                               "pid": pid, "tid": peer_id,
+                               "args": {"pc": format_pc(program_counter),
+                                        "unfinished": True}})
+                peers.add(peer_id)
+
+        for peer_id in sorted(peers):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                           "tid": peer_id,
+                           "args": {"name": "peer %d" % peer_id}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"player": pid,
+                              "dropped": self.recorded - len(self.events)}}
+
+    def dump(self, filename):
+        """Write the trace to *filename* as JSON."""
+        output = open(filename, "w")
+        try:
+            json.dump(self.as_dict(), output)
+        finally:
+            output.close()
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER
@@ -322,20 +322,40 @@ def profile(method):
     In addition to adding this decorator, you must run the programs in
     an environment with :envvar:`VIFF_PROFILE` defined. Otherwise the
     decorator is a no-op and has no runtime overhead.
+
+    If :envvar:`VIFF_TRACE` is defined instead, the method calls are
+    not printed, but recorded in the trace of runtimes which have one,
+    see :mod:`viff.trace`.
     """
-    if not os.environ.get('VIFF_PROFILE'):
+    printing = bool(os.environ.get('VIFF_PROFILE'))
+    if not printing and not os.environ.get('VIFF_TRACE'):
         return method
 
     @wrapper(method)
     def profile_wrapper(self, *args, **kwargs):
-        label = "%s %s" % (method.__name__,
-                           ".".join(map(str, self.program_counter)))
-        begin(None, label)
+        pc = ".".join(map(str, self.program_counter))
+        label = "%s %s" % (method.__name__, pc)
+        tracer = getattr(self, "tracer", None)
+        if tracer is not None:
+            start = tracer.now()
+
+            def record(result):
+                tracer.complete(method.__name__, "operation", start,
+                                {"pc": pc})
+                return result
+        if printing:
+            begin(None, label)
         result = method(self, *args, **kwargs)
         if isinstance(result, Deferred):
-            result.addCallback(end, label)
+            if printing:
+                result.addCallback(end, label)
+            if tracer is not None:
+                result.addBoth(record)
         else:
-            end(None, label)
+            if printing:
+                end(None, label)
+            if tracer is not None:
+                record(None)
         return result
 
     return profile_wrapper
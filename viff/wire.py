@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 VIFF Development Team.
+#
+# This file is part of VIFF, the Virtual Ideal Functionality Framework.
+#
+# VIFF is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License (LGPL) as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# VIFF is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with VIFF. If not, see <http://www.gnu.org/licenses/>.
+
+"""Wire encodings used between players. The
+:class:`~viff.runtime.ShareExchanger` uses the codecs defined here to
+turn field elements into strings and back again, and to compress the
+program counters sent with each message. Protocols which send large
+integers, such as Paillier ciphertexts, use :func:`encode_integers`.
+
+Two encodings exist: the original hexadecimal encoding and a compact
+binary encoding. The binary encoding represents an element as a
+fixed-width big-endian integer, where the width is the number of bytes
+needed for the largest element of the field:
+
+>>> from viff.field import GF, GF256
+>>> Zp = GF(30916444023318367583)
+>>> codec = share_codec(Zp, binary=True)
+>>> codec.width
+9
+>>> data = codec.encode(Zp(1234567890123456789))
+>>> len(data)
+9
+>>> codec.decode(data)
+{1234567890123456789}
+>>> share_codec(GF256, binary=True).encode(GF256(17))
+'\\x11'
+
+Lists of elements from the same field are simply concatenated:
+
+>>> codec = share_codec(GF256, binary=True)
+>>> codec.encode_list([GF256(1), GF256(2), GF256(3)])
+'\\x01\\x02\\x03'
+>>> codec.decode_list('\\x01\\x02\\x03')
+[[1], [2], [3]]
+
+The hexadecimal encoding is used when talking to players that do not
+support the binary encoding:
+
+>>> codec = share_codec(Zp, binary=False)
+>>> codec.encode(Zp(255))
+'0xffL'
+>>> codec.decode('0xffL')
+{255}
+>>> codec.encode_list([Zp(1), Zp(2)])
+'0x1L 0x2L'
+"""
+
+import struct
+from binascii import hexlify, unhexlify
+
+#: Struct format characters used for the leading bytes of an element
+#: whose width is not a multiple of eight bytes. The index is the
+#: number of leftover bytes.
+_LEADING_FORMATS = ["", "B", "H", "BH", "I", "BI", "HI", "BHI"]
+
+#: Bit size of each struct format character used.
+_FORMAT_BITS = {"B": 8, "H": 16, "I": 32, "Q": 64}
+
+
+def element_width(modulus):
+    """Return the number of bytes needed to represent any element
+    modulo *modulus*.
+
+    >>> element_width(256)
+    1
+    >>> element_width(257)
+    2
+    >>> element_width(2**64 + 1)
+    9
+    """
+    return max(1, (long(modulus - 1).bit_length() + 7) // 8)
+
+
+class HexCodec(object):
+    """Encode field elements as hexadecimal strings.
+
+    This is the original VIFF encoding. It is kept for compatibility
+    with players that have not announced support for the binary
+    encoding.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        #: Maximum number of bytes used per element in a list.
+        self.max_size = len(hex(long(field.modulus - 1))) + 1
+
+    def encode(self, element):
+        """Encode *element* as a string."""
+        return hex(element.value)
+
+    def decode(self, string):
+        """Decode *string* into an element of the field."""
+        return self.field(long(string, 16))
+
+    def encode_list(self, elements):
+        """Encode a list of elements as a single string."""
+        return " ".join([hex(element.value) for element in elements])
+
+    def decode_list(self, string):
+        """Decode a string made by :meth:`encode_list`."""
+        field = self.field
+        return [field(long(s, 16)) for s in string.split()]
+
+
+class BinaryCodec(object):
+    """Encode field elements as fixed-width big-endian integers.
+
+    The width is determined by the field modulus and the element is
+    packed with a single precompiled :class:`struct.Struct` which
+    splits it into 64-bit limbs, plus a few smaller limbs for the
+    most significant bytes.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        #: Number of bytes used per element.
+        self.width = element_width(field.modulus)
+        limbs = _LEADING_FORMATS[self.width % 8] + "Q" * (self.width // 8)
+        self.struct = struct.Struct("!" + limbs)
+        # Bit sizes of the limbs, most significant limb first.
+        self._bits = [_FORMAT_BITS[c] for c in limbs]
+        self._masks = [(1 << bits) - 1 for bits in self._bits]
+        self._single = len(limbs) == 1
+        #: Maximum number of bytes used per element in a list.
+        self.max_size = self.width
+
+    def encode(self, element):
+        """Encode *element* as a string of :attr:`width` bytes."""
+        value = long(element.value)
+        if self._single:
+            return self.struct.pack(value)
+        limbs = []
+        for bits, mask in zip(reversed(self._bits), reversed(self._masks)):
+            limbs.append(value & mask)
+            value >>= bits
+        limbs.reverse()
+        return self.struct.pack(*limbs)
+
+    def decode(self, string):
+        """Decode *string* into an element of the field."""
+        if self._single:
+            return self.field(self.struct.unpack(string)[0])
+        value = 0
+        for bits, limb in zip(self._bits, self.struct.unpack(string)):
+            value = (value << bits) | limb
+        return self.field(value)
+
+    def encode_list(self, elements):
+        """Encode a list of elements as a single string.
+
+        The elements are concatenated, so the string takes up
+        ``len(elements) * width`` bytes.
+        """
+        if self._single:
+            fmt = "!%d%s" % (len(elements), self.struct.format[1:])
+            return struct.pack(fmt, *[long(e.value) for e in elements])
+        return "".join([self.encode(element) for element in elements])
+
+    def decode_list(self, string):
+        """Decode a string made by :meth:`encode_list`."""
+        field = self.field
+        if self._single:
+            count = len(string) // self.width
+            fmt = "!%d%s" % (count, self.struct.format[1:])
+            return [field(value) for value in struct.unpack(fmt, string)]
+        width = self.width
+        return [self.decode(string[i:i + width])
+                for i in xrange(0, len(string), width)]
+
+
+#: Cache of codecs. Maps a pair of a field and a boolean indicating
+#: the binary encoding to a codec.
+_codec_cache = {}
+
+
+def share_codec(field, binary):
+    """Return a codec for elements of *field*.
+
+    A :class:`BinaryCodec` is returned if *binary* is true, a
+    :class:`HexCodec` otherwise. Codecs are cached so that repeated
+    calls with the same arguments return the same object.
+    """
+    key = (field, binary)
+    try:
+        return _codec_cache[key]
+    except KeyError:
+        if binary:
+            codec = BinaryCodec(field)
+        else:
+            codec = HexCodec(field)
+        _codec_cache[key] = codec
+        return codec
+
+
+def encode_varint(value):
+    """Encode a non-negative integer using 7 bits per byte.
+
+    The least significant group comes first and the high bit of each
+    byte signals that more bytes follow. Small values take up a
+    single byte:
+
+    >>> encode_varint(1)
+    '\\x01'
+    >>> encode_varint(300)
+    '\\xac\\x02'
+    """
+    if value < 0x80:
+        return chr(value)
+    bytes = []
+    while value >= 0x80:
+        bytes.append(chr((value & 0x7f) | 0x80))
+        value >>= 7
+    bytes.append(chr(value))
+    return "".join(bytes)
+
+
+def decode_varint(string, offset):
+    """Decode an integer encoded by :func:`encode_varint`.
+
+    The integer starts at *offset* in *string*. Returns the integer
+    and the offset of the first byte after it:
+
+    >>> decode_varint('\\x05\\xac\\x02', 1)
+    (300, 3)
+    """
+    value = 0
+    shift = 0
+    try:
+        while True:
+            byte = ord(string[offset])
+            offset += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value, offset
+            shift += 7
+    except IndexError:
+        raise ValueError("Truncated integer")
+
+
+def encode_integer(value):
+    """Encode an integer of arbitrary size.
+
+    The integer is encoded as its length in bytes and sign, followed
+    by the magnitude in big-endian byte order. This works for
+    :class:`long` and :class:`gmpy.mpz` values and takes up less than
+    half the space of the decimal representation:
+
+    >>> encode_integer(0)
+    '\\x00'
+    >>> encode_integer(-1)
+    '\\x03\\x01'
+    >>> encode_integer(65535)
+    '\\x04\\xff\\xff'
+    """
+    value = long(value)
+    if value < 0:
+        sign = 1
+        value = -value
+    else:
+        sign = 0
+    if value == 0:
+        magnitude = ""
+    else:
+        digits = "%x" % value
+        if len(digits) % 2:
+            digits = "0" + digits
+        magnitude = unhexlify(digits)
+    return encode_varint(len(magnitude) << 1 | sign) + magnitude
+
+
+def decode_integer(string, offset):
+    """Decode an integer encoded by :func:`encode_integer`.
+
+    The integer starts at *offset* in *string*. Returns the integer
+    and the offset of the first byte after it:
+
+    >>> decode_integer(encode_integer(-300), 0)
+    (-300L, 3)
+    """
+    tag, offset = decode_varint(string, offset)
+    end = offset + (tag >> 1)
+    if end > len(string):
+        raise ValueError("Truncated integer")
+    if end == offset:
+        value = 0L
+    else:
+        value = long(hexlify(string[offset:end]), 16)
+    if tag & 1:
+        value = -value
+    return value, end
+
+
+def encode_integers(values):
+    """Encode a list of integers of arbitrary size.
+
+    The number of integers comes first, followed by each integer
+    encoded by :func:`encode_integer`:
+
+    >>> decode_integers(encode_integers([1, -2, 2**100]))
+    [1L, -2L, 1267650600228229401496703205376L]
+    """
+    return encode_varint(len(values)) + \
+        "".join([encode_integer(value) for value in values])
+
+
+def decode_integers(string):
+    """Decode a string made by :func:`encode_integers`.
+
+    A :exc:`ValueError` is raised if *string* is invalid.
+    """
+    count, offset = decode_varint(string, 0)
+    values = []
+    for _ in xrange(count):
+        value, offset = decode_integer(string, offset)
+        values.append(value)
+    if offset != len(string):
+        raise ValueError("Trailing data after %d integers" % count)
+    return values
+
+
+def encode_pc_delta(program_counter, previous):
+    """Encode *program_counter* relative to the *previous* one.
+
+    The encoding holds the number of leading components shared with
+    *previous*, the number of remaining components, and the remaining
+    components, all encoded with :func:`encode_varint`. Program
+    counters sent in order mostly differ in the last component:
+
+    >>> encode_pc_delta((0, 5, 3, 2), (0, 5, 3, 1))
+    '\\x03\\x01\\x02'
+    >>> encode_pc_delta((0, 6), ())
+    '\\x00\\x02\\x00\\x06'
+    """
+    common = 0
+    for a, b in zip(program_counter, previous):
+        if a != b:
+            break
+        common += 1
+    rest = program_counter[common:]
+    return encode_varint(common) + encode_varint(len(rest)) + \
+        "".join(map(encode_varint, rest))
+
+
+def decode_pc_delta(string, offset, previous):
+    """Decode a program counter encoded by :func:`encode_pc_delta`.
+
+    Returns the program counter and the offset of the first byte
+    after it. A :exc:`ValueError` is raised on invalid input:
+
+    >>> decode_pc_delta('\\x03\\x01\\x02', 0, (0, 5, 3, 1))
+    ((0, 5, 3, 2), 3)
+    """
+    common, offset = decode_varint(string, offset)
+    if common > len(previous):
+        raise ValueError("Program counter shares %d components with "
+                         "one of length %d" % (common, len(previous)))
+    length, offset = decode_varint(string, offset)
+    rest = []
+    for _ in xrange(length):
+        component, offset = decode_varint(string, offset)
+        rest.append(component)
+    return previous[:common] + tuple(rest), offset
+
+
+class ProgramCounterEncoder(object):
+    """Compress program counters using a dictionary of prefixes.
+
+    A program counter is split into a prefix (all but the last
+    component) and the last component. The first time a prefix is
+    seen it is sent in full together with a short ID, later it is
+    referred to by the ID only. All numbers are encoded with
+    :func:`encode_varint`:
+
+    >>> encoder = ProgramCounterEncoder(16)
+    >>> encoder.encode((0, 5, 3, 1))
+    '\\x01\\x03\\x00\\x05\\x03\\x01'
+    >>> encoder.encode((0, 5, 3, 2))
+    '\\x00\\x02'
+
+    At most *size* prefixes are remembered. When the dictionary is
+    full, the IDs are reused in round-robin order.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._ids = {}
+        self._prefixes = {}
+        self._next_id = 0
+
+    def encode(self, program_counter):
+        """Encode *program_counter*, a non-empty tuple of integers."""
+        prefix = program_counter[:-1]
+        last = encode_varint(program_counter[-1])
+        try:
+            return encode_varint(self._ids[prefix] << 1) + last
+        except KeyError:
+            id = self._next_id
+            self._next_id = (id + 1) % self.size
+            old = self._prefixes.get(id)
+            if old is not None:
+                del self._ids[old]
+            self._ids[prefix] = id
+            self._prefixes[id] = prefix
+            return encode_varint(id << 1 | 1) + encode_varint(len(prefix)) \
+                + "".join(map(encode_varint, prefix)) + last
+
+
+class ProgramCounterDecoder(object):
+    """Decode program counters made by :class:`ProgramCounterEncoder`.
+
+    >>> encoder = ProgramCounterEncoder(16)
+    >>> decoder = ProgramCounterDecoder()
+    >>> decoder.decode(encoder.encode((0, 5, 3, 1)) + "data", 0)
+    ((0, 5, 3, 1), 6)
+    >>> decoder.decode(encoder.encode((0, 5, 3, 2)), 0)
+    ((0, 5, 3, 2), 2)
+
+    The strings must be decoded in the order they were encoded.
+    """
+
+    def __init__(self):
+        self._prefixes = {}
+
+    def decode(self, string, offset):
+        """Decode a program counter starting at *offset* in *string*.
+
+        Returns the program counter and the offset of the first byte
+        after it. A :exc:`ValueError` is raised on invalid input.
+        """
+        tag, offset = decode_varint(string, offset)
+        id = tag >> 1
+        if tag & 1:
+            length, offset = decode_varint(string, offset)
+            prefix = []
+            for _ in xrange(length):
+                component, offset = decode_varint(string, offset)
+                prefix.append(component)
+            prefix = tuple(prefix)
+            self._prefixes[id] = prefix
+        else:
+            try:
+                prefix = self._prefixes[id]
+            except KeyError:
+                raise ValueError("Unknown program counter prefix %d" % id)
+        last, offset = decode_varint(string, offset)
+        return prefix + (last,), offset
+
+
+if __name__ == "__main__":
+    import doctest    #pragma NO COVER
+    doctest.testmod() #pragma NO COVER